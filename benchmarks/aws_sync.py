@@ -0,0 +1,140 @@
+# Copyright 2017 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+    DescribeInstances calls, and time, of a node inventory sync with the
+    AWS driver, against a stubbed EC2 API (pages of 1000 instances, with
+    some latency): listing the lazy collection for the count and again for
+    every lookup (previous implementation), compared with listing it once.
+    Then the same fetch over several regions, one after the other and
+    concurrently.
+
+    Usage: python -m benchmarks.aws_sync
+"""
+
+import logging
+import time
+
+import boto3
+from botocore.awsrequest import AWSResponse
+from mock import patch
+
+from powerfulseal.clouddrivers import AWSDriver
+from powerfulseal.clouddrivers.aws_driver import get_all_ips, create_node_from_server
+from powerfulseal.node import NodeInventory
+
+SIZES = [500, 2000, 5000]
+# nodes looked up in the inventory
+LOOKUPS = 20
+REGIONS = ["us-east-1", "us-west-2", "eu-west-1", "ap-southeast-1"]
+PAGE_SIZE = 1000
+LATENCY = 0.05
+
+
+class StubbedEC2():
+    """ Answers DescribeInstances from memory, counting the calls.
+    """
+
+    def __init__(self, size):
+        self.calls = 0
+        self.instances = [{
+            "InstanceId": "i-%d" % i,
+            "PrivateIpAddress": make_ip(i),
+            "Placement": {"AvailabilityZone": "us-east-1a"},
+            "State": {"Name": "running"},
+        } for i in range(size)]
+
+    def describe_instances(self, params, **kwargs):
+        self.calls += 1
+        time.sleep(LATENCY)
+        start = int(params["body"].get("NextToken", 0))
+        response = {"Reservations": [
+            {"Instances": self.instances[start:start + PAGE_SIZE]},
+        ]}
+        if start + PAGE_SIZE < len(self.instances):
+            response["NextToken"] = str(start + PAGE_SIZE)
+        return AWSResponse(None, 200, {}, None), response
+
+    def connect(self, region=None):
+        conn = boto3.resource(
+            "ec2", region_name=region or REGIONS[0],
+            aws_access_key_id="key", aws_secret_access_key="secret",
+        )
+        conn.meta.client.meta.events.register(
+            "before-call.ec2.DescribeInstances", self.describe_instances)
+        return conn
+
+
+class LegacyAWSDriver(AWSDriver):
+
+    def sync(self):
+        self.remote_servers = self.conn.instances.all()
+        self.amount_of_servers = list(self.conn.instances.all())
+
+    def get_by_ip(self, ip):
+        for server in self.remote_servers:
+            for addr in get_all_ips(server):
+                if addr == ip:
+                    return create_node_from_server(server)
+        return None
+
+
+class SequentialAWSDriver(AWSDriver):
+
+    def sync(self):
+        self.remote_servers = [
+            instance
+            for region in self.conns
+            for instance in self.fetch_instances(region)
+        ]
+
+
+def make_ip(i):
+    return "10.%d.%d.%d" % (i >> 16, (i >> 8) & 255, i & 255)
+
+
+def time_sync(cls, size, regions=None):
+    ec2 = StubbedEC2(size)
+    with patch("powerfulseal.clouddrivers.aws_driver.create_connection_from_config", ec2.connect):
+        driver = cls(regions=regions)
+    # spread the nodes across the instances
+    ips = [make_ip(i) for i in range(0, size, size // LOOKUPS)]
+    inventory = NodeInventory(driver, restrict_to_groups=dict(nodes=ips))
+    start = time.perf_counter()
+    inventory.sync()
+    seconds = time.perf_counter() - start
+    assert len(inventory.get_all_nodes()) == len(ips)
+    return ec2.calls, seconds
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    print("%10s %14s %14s %14s %14s" % (
+        "servers", "legacy calls", "legacy (ms)", "single calls", "single (ms)"))
+    for size in SIZES:
+        legacy_calls, legacy = time_sync(LegacyAWSDriver, size)
+        calls, seconds = time_sync(AWSDriver, size)
+        print("%10d %14d %14.1f %14d %14.1f" % (
+            size, legacy_calls, legacy * 1000, calls, seconds * 1000))
+    print()
+    print("%10s %14s %14s %14s %14s" % (
+        "regions", "seq. calls", "seq. (ms)", "conc. calls", "conc. (ms)"))
+    size = SIZES[-1]
+    sequential_calls, sequential = time_sync(SequentialAWSDriver, size, REGIONS)
+    calls, seconds = time_sync(AWSDriver, size, REGIONS)
+    print("%10d %14d %14.1f %14d %14.1f" % (
+        len(REGIONS), sequential_calls, sequential * 1000, calls, seconds * 1000))
+
+
+if __name__ == "__main__":
+    main()
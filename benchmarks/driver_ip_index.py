@@ -0,0 +1,98 @@
+# Copyright 2017 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+    Time of a node inventory sync, with every server of the cloud in the
+    inventory: scanning all the servers for every IP (previous
+    implementation), compared with the IP index built once per sync.
+
+    Usage: python -m benchmarks.driver_ip_index
+"""
+
+import logging
+import timeit
+from types import SimpleNamespace
+
+from mock import MagicMock
+
+from powerfulseal.clouddrivers import OpenStackDriver
+from powerfulseal.clouddrivers.open_stack_driver import (
+    get_all_ips, create_node_from_server,
+)
+from powerfulseal.node import NodeInventory
+
+SIZES = [500, 2000, 5000]
+REPEAT = 3
+
+
+class StaticDriver(OpenStackDriver):
+
+    def __init__(self, servers):
+        OpenStackDriver.__init__(self, conn=MagicMock())
+        self.servers = servers
+
+    def sync(self):
+        self.remote_servers = self.servers
+
+
+class LegacyDriver(StaticDriver):
+
+    def get_by_ip(self, ip):
+        for server in self.remote_servers:
+            addresses = get_all_ips(server)
+            if not addresses:
+                self.logger.warning("No addresses found: %s", server)
+            else:
+                for addr in addresses:
+                    if addr == ip:
+                        return create_node_from_server(server)
+        return None
+
+
+def make_servers(size):
+    return [
+        SimpleNamespace(
+            id="server-%d" % i,
+            name="server-%d" % i,
+            availability_zone="az-%d" % (i % 3),
+            status="ACTIVE",
+            addresses=dict(private=[dict(addr="10.%d.%d.%d" % (
+                i >> 16, (i >> 8) & 255, i & 255))]),
+        )
+        for i in range(size)
+    ]
+
+
+def time_sync(cls, servers):
+    ips = [get_all_ips(server)[0] for server in servers]
+    inventory = NodeInventory(cls(servers), restrict_to_groups=dict(nodes=ips))
+    # the legacy scan is quadratic, a single run is enough to tell
+    repeat = 1 if cls is LegacyDriver and len(servers) > 1000 else REPEAT
+    seconds = min(timeit.repeat(inventory.sync, number=1, repeat=repeat))
+    assert len(inventory.get_all_nodes()) == len(servers)
+    return seconds
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    print("%10s %14s %14s %8s" % ("servers", "scan (ms)", "index (ms)", "speedup"))
+    for size in SIZES:
+        servers = make_servers(size)
+        legacy = time_sync(LegacyDriver, servers)
+        indexed = time_sync(StaticDriver, servers)
+        print("%10d %14.1f %14.1f %7.1fx" % (
+            size, legacy * 1000, indexed * 1000, legacy / indexed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# Copyright 2017 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+    Time spent applying property filters to candidates, comparing the
+    previous implementation (compiling the regex for every candidate) with
+    the compiled filter pipeline.
+
+    Usage: python -m benchmarks.filter_pipeline
+"""
+
+import re
+import timeit
+
+from powerfulseal.k8s import Pod
+from powerfulseal.policy.action_nodes_pods import ActionNodesPods
+
+SIZES = [10000, 50000]
+REPEAT = 5
+FILTERS = [
+    {"property": {"name": "name", "value": "deployment-[0-9]*1-"}},
+    {"property": {"name": "state", "value": "Running"}},
+    {"property": {"name": "namespace", "value": "namespace-1", "negative": True}},
+    {"property": {"name": "container_ids", "value": "docker://"}},
+]
+
+
+def legacy_match_property(candidate, criterion):
+    name = criterion.get("name")
+    value = getattr(candidate, name)
+    negative = criterion.get("negative", False)
+    expr = re.compile(criterion.get("value"), re.IGNORECASE)
+    if type(value) is not list:
+        value = [value]
+    if negative:
+        return all([
+            not expr.match(str(v))
+            for v in value
+        ])
+    return any([
+        expr.match(str(v))
+        for v in value
+    ])
+
+
+def legacy_filter(candidates):
+    for criterion in FILTERS:
+        candidates = [
+            candidate for candidate in candidates
+            if legacy_match_property(candidate, criterion["property"])
+        ]
+    return candidates
+
+
+def make_pods(size):
+    return [
+        Pod(
+            name="deployment-%d-%08x" % (i % 500, i),
+            namespace="namespace-%d" % (i % 50),
+            state="Running" if i % 10 else "Pending",
+            container_ids=["docker://%064x" % i],
+        )
+        for i in range(size)
+    ]
+
+
+def main():
+    action = ActionNodesPods(name="benchmark", schema={"filters": FILTERS})
+    mapping = action.get_filter_mapping()
+    print("%10s %14s %14s %8s" % ("candidates", "legacy (ms)", "compiled (ms)", "speedup"))
+    for size in SIZES:
+        pods = make_pods(size)
+        assert legacy_filter(pods) == action.filter_mapping(pods, FILTERS, mapping)
+        legacy = min(timeit.repeat(lambda: legacy_filter(pods), number=1, repeat=REPEAT))
+        compiled = min(timeit.repeat(
+            lambda: action.filter_mapping(pods, FILTERS, mapping), number=1, repeat=REPEAT))
+        print("%10d %14.1f %14.1f %7.1fx" % (
+            size, legacy * 1000, compiled * 1000, legacy / compiled))
+
+
+if __name__ == "__main__":
+    main()
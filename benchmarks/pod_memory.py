@@ -0,0 +1,128 @@
+# Copyright 2017 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+    Memory used per pod by the internal Pod representation, comparing the
+    plain dict-backed layout with the slotted one, at different cluster sizes.
+    The slotted pods are built like the inventory does, keeping the raw JSON
+    text of the pod (until its full V1Pod is needed). The dict-backed ones
+    are measured without the V1Pod they used to keep, so the savings are
+    a lower bound.
+
+    Usage: python -m benchmarks.pod_memory
+"""
+
+import gc
+import json
+import tracemalloc
+
+from powerfulseal.k8s.k8s_inventory import make_pod_from_dict
+
+SIZES = [10000, 50000, 100000]
+NAMESPACES = 50
+DEPLOYMENTS = 500
+
+
+class LegacyPod():
+    """ The dict-backed layout, keeping its own copy of every string and dict.
+    """
+
+    def __init__(self, name, namespace, num=None, uid=None, host_ip=None, ip=None,
+                container_ids=None, restart_count=None, state=None, labels=None, annotations=None, meta=None):
+        self.name = name
+        self.namespace = namespace
+        self.num = num
+        self.uid = uid
+        self.host_ip = host_ip
+        self.ip = ip
+        self.container_ids = container_ids or []
+        self.restart_count = restart_count or 0
+        self.state = state
+        self.labels = labels or dict()
+        self.annotations = annotations or dict()
+        self.meta = meta
+
+
+def make_raw_pod(i):
+    deployment = i % DEPLOYMENTS
+    return json.dumps({
+        "metadata": {
+            "name": "deployment-%d-%08x" % (deployment, i),
+            "namespace": "namespace-%d" % (deployment % NAMESPACES),
+            "uid": "%032x" % i,
+            "labels": {
+                "app": "deployment-%d" % deployment,
+                "pod-template-hash": "%010x" % deployment,
+                "team": "team-%d" % (deployment % 7),
+            },
+            "annotations": {
+                "prometheus.io/scrape": "true",
+                "prometheus.io/port": "9090",
+            },
+        },
+        "status": {
+            "phase": "Running",
+            "hostIP": "10.0.0.%d" % (i % 250),
+            "podIP": "172.16.%d.%d" % (i // 250 % 250, i % 250),
+            "containerStatuses": [
+                {"containerID": "docker://%064x" % i, "restartCount": 0},
+            ],
+        },
+    })
+
+
+def make_legacy_pod(num, item, raw):
+    metadata = item["metadata"]
+    status = item["status"]
+    return LegacyPod(
+        num=num,
+        name=metadata["name"],
+        namespace=metadata["namespace"],
+        uid=metadata["uid"],
+        host_ip=status["hostIP"],
+        ip=status["podIP"],
+        container_ids=[x["containerID"] for x in status["containerStatuses"]],
+        restart_count=sum(x["restartCount"] for x in status["containerStatuses"]),
+        state=status["phase"],
+        labels=metadata["labels"],
+        annotations=metadata["annotations"],
+    )
+
+
+def measure(size, make):
+    """ Returns the bytes retained per pod, after building `size` of them.
+    """
+    gc.collect()
+    tracemalloc.start()
+    pods = []
+    for i in range(size):
+        raw = make_raw_pod(i)
+        pods.append(make(i, json.loads(raw), raw))
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del pods
+    return current / size
+
+
+def main():
+    print("%10s %16s %16s %8s" % ("pods", "dict (B/pod)", "slots (B/pod)", "saved"))
+    for size in SIZES:
+        legacy = measure(size, make_legacy_pod)
+        slotted = measure(size, make_pod_from_dict)
+        print("%10d %16.0f %16.0f %7.0f%%" % (
+            size, legacy, slotted, 100 * (1 - slotted / legacy)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# Copyright 2017 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+    Time spent validating policies of 5 and 500 scenarios, comparing the
+    previous implementation (parsing the schema and checking it on every
+    call) with the validator compiled once.
+
+    Usage: python -m benchmarks.policy_validation
+"""
+
+import pkgutil
+import timeit
+
+import jsonschema
+import yaml
+
+from powerfulseal.policy import PolicyRunner
+
+SIZES = [5, 500]
+REPEAT = 5
+
+
+def legacy_is_policy_valid(policy):
+    data = pkgutil.get_data("powerfulseal.policy", "ps-schema.yaml")
+    schema = yaml.safe_load(data)
+    try:
+        jsonschema.validate(policy, schema)
+    except jsonschema.ValidationError:
+        return False
+    return True
+
+
+def make_policy(size):
+    scenarios = []
+    for i in range(size):
+        scenarios.append({
+            "name": "scenario %d" % i,
+            "steps": [
+                {"podAction": {
+                    "matches": [{"labels": {"namespace": "ns-%d" % i, "selector": "app=app-%d" % i}}],
+                    "filters": [
+                        {"property": {"name": "state", "value": "Running"}},
+                        {"randomSample": {"size": 1}},
+                    ],
+                    "actions": [{"kill": {"probability": 0.5}}],
+                }},
+                {"nodeAction": {
+                    "matches": [{"property": {"name": "group", "value": "worker"}}],
+                    "filters": [{"randomSample": {"size": 1}}],
+                    "actions": [{"stop": {"autoRestart": True}}],
+                }},
+                {"wait": {"seconds": 1}},
+            ],
+        })
+    return {
+        "config": {"runStrategy": {"runs": 1}},
+        "scenarios": scenarios,
+    }
+
+
+def main():
+    print("%10s %14s %14s %8s" % ("scenarios", "legacy (ms)", "compiled (ms)", "speedup"))
+    for size in SIZES:
+        policy = make_policy(size)
+        assert legacy_is_policy_valid(policy)
+        assert PolicyRunner.is_policy_valid(policy)
+        legacy = min(timeit.repeat(
+            lambda: legacy_is_policy_valid(policy), number=1, repeat=REPEAT))
+        compiled = min(timeit.repeat(
+            lambda: PolicyRunner.is_policy_valid(policy), number=1, repeat=REPEAT))
+        print("%10d %14.1f %14.1f %7.1fx" % (
+            size, legacy * 1000, compiled * 1000, legacy / compiled))
+
+
+if __name__ == "__main__":
+    main()
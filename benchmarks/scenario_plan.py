@@ -0,0 +1,155 @@
+# Copyright 2017 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+    Per-loop overhead of running scenarios, without the actions themselves
+    (they return straight away): walking the action mapping and parsing
+    the retries of every step, and planning the pod queries, on every
+    loop (previous implementation), compared with the compiled plans.
+
+    Usage: python -m benchmarks.scenario_plan
+"""
+
+import logging
+import timeit
+
+from powerfulseal.policy.filter_pipeline import compile_pod_query
+from powerfulseal.policy.query_planner import plan_pod_filters
+from powerfulseal.policy.scenario import Scenario
+
+SIZES = [50, 500]
+REPEAT = 5
+NUMBER = 10
+FILTERS = [
+    {"property": {"name": "name", "value": "^app-1$"}},
+    {"property": {"name": "state", "value": "Running"}},
+    {"randomSample": {"size": 1}},
+]
+LOGGER = logging.getLogger(__name__)
+
+
+class NoopCollector():
+
+    def add_scenario_counter_metric(self, name, result):
+        pass
+
+
+METRIC_COLLECTOR = NoopCollector()
+
+
+class NoopScenario(Scenario):
+
+    def action_pods(self, schema):
+        compile_pod_query(schema.get("filters", []))
+        return True
+
+    def action_nodes(self, schema):
+        return True
+
+    def action_wait(self, schema):
+        return True
+
+
+class LegacyScenario(NoopScenario):
+
+    def action_pods(self, schema):
+        plan_pod_filters(schema.get("filters", []))
+        return True
+
+    def execute(self):
+        steps = self.schema.get("steps", [])
+        self.logger.info("Starting scenario '%s' (%d steps)", self.name, len(steps))
+        for step in steps:
+            if not self.legacy_execute_step(step):
+                return False
+        self.logger.info("Scenario finished")
+        self.metric_collector.add_scenario_counter_metric(self.name, True)
+        self.cleanup()
+        return True
+
+    def legacy_execute_step(self, step):
+        ret = True
+        for action_name, action_method in self.action_mapping.items():
+            if action_name in step:
+                ret = self.legacy_retry(step.get(action_name), action_method)
+                if not ret:
+                    return ret
+        return ret
+
+    def legacy_retry(self, step_action, action_method):
+        if "retries" in step_action.keys():
+            step_retry = step_action['retries']
+            if 'retriesCount' in step_retry.keys():
+                final_count = step_retry.get('retriesCount', {}).get('count', 1)
+                step_retry.get('retriesCount', {}).get('sleep', 30)
+                counter = 0
+                while counter < final_count:
+                    if action_method(schema=step_action):
+                        return True
+                    counter += 1
+                return False
+        return action_method(schema=step_action)
+
+
+def make_policy(size):
+    return [
+        {
+            "name": "scenario %d" % i,
+            "steps": [
+                {"podAction": {
+                    "matches": [{"namespace": "ns-%d" % i}],
+                    "filters": FILTERS,
+                    "actions": [{"kill": {"probability": 0.5}}],
+                    "retries": {"retriesCount": {"count": 3, "sleep": 1}},
+                }},
+                {"nodeAction": {
+                    "matches": [{"property": {"name": "group", "value": "worker"}}],
+                    "actions": [{"stop": {}}],
+                }},
+                {"wait": {"seconds": 1}},
+            ],
+        }
+        for i in range(size)
+    ]
+
+
+def run_loop(cls, scenarios):
+    for item in scenarios:
+        scenario = cls(
+            name=item.get("name"),
+            schema=item,
+            inventory=None,
+            k8s_inventory=None,
+            driver=None,
+            executor=None,
+            logger=LOGGER,
+            metric_collector=METRIC_COLLECTOR,
+        )
+        assert scenario.execute()
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    print("%10s %14s %14s %8s" % ("scenarios", "legacy (ms)", "compiled (ms)", "speedup"))
+    for size in SIZES:
+        scenarios = make_policy(size)
+        legacy = min(timeit.repeat(
+            lambda: run_loop(LegacyScenario, scenarios), number=NUMBER, repeat=REPEAT)) / NUMBER
+        compiled = min(timeit.repeat(
+            lambda: run_loop(NoopScenario, scenarios), number=NUMBER, repeat=REPEAT)) / NUMBER
+        print("%10d %14.1f %14.1f %7.1fx" % (
+            size, legacy * 1000, compiled * 1000, legacy / compiled))
+
+
+if __name__ == "__main__":
+    main()
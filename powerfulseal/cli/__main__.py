@@ -21,6 +21,7 @@ import coloredlogs
 import textwrap
 import sys
 import os
+import signal
 
 from powerfulseal import makeLogger
 import powerfulseal.version
@@ -32,10 +33,11 @@ from powerfulseal.web.server import start_server, ServerStateLogHandler
 from ..node import NodeInventory
 from ..node.inventory import read_inventory_file_to_dict
 from ..clouddrivers import OpenStackDriver, AWSDriver, NoCloudDriver, AzureDriver, GCPDriver
+from ..clouddrivers.aws_driver import parse_filter as parse_aws_filter, make_filters as make_aws_filters
 from ..execute import SSHExecutor, KubernetesExecutor
-from ..k8s import K8sClient, K8sInventory
+from ..k8s import K8sClient, K8sInventory, PodInformer, DeploymentInformer, ScenarioInformer
 from .pscmd import PSCmd
-from ..policy import PolicyRunner
+from ..policy import PolicyRunner, Waiter
 
 KUBECONFIG_DEFAULT_PATH = "~/.kube/config"
 
@@ -89,6 +91,68 @@ def add_kubernetes_options(parser):
         default="kubernetes",
         choices=["kubernetes", "ssh"]
     )
+    args_kubernetes.add_argument(
+        '--pod-informer',
+        help=(
+            'Keep an in-memory cache of all the pods in the cluster, '
+            'kept up to date with a single watch, instead of listing pods '
+            'on every match'
+        ),
+        default=False,
+        action='store_true',
+    )
+    args_kubernetes.add_argument(
+        '--pod-informer-max-staleness',
+        help=(
+            'If the pod cache hasn\'t heard from the API server for longer '
+            'than this many seconds, list pods from the API instead'
+        ),
+        default=600,
+        type=int
+    )
+    args_kubernetes.add_argument(
+        '--kubernetes-page-size',
+        help=(
+            'Number of objects to fetch per request when listing pods, '
+            'namespaces, deployments and scenarios. 0 lists everything '
+            'in a single request'
+        ),
+        default=500,
+        type=int
+    )
+    args_kubernetes.add_argument(
+        '--watch-scenarios',
+        help=(
+            'Watch the scenario custom resources, instead of listing them '
+            'every time the policy is read'
+        ),
+        default=False,
+        action='store_true',
+    )
+    args_kubernetes.add_argument(
+        '--deployment-selector-ttl',
+        help=(
+            'Number of seconds to cache the label selector of a deployment for, '
+            'when matching pods by deployment without --pod-informer'
+        ),
+        default=60,
+        type=int
+    )
+    args_kubernetes.add_argument(
+        '--kubernetes-max-workers',
+        help='Maximum number of namespaces to list pods and deployments in concurrently',
+        default=8,
+        type=int
+    )
+    args_kubernetes.add_argument(
+        '--kubernetes-all-namespaces-threshold',
+        help=(
+            'When a match covers more namespaces than this, list all namespaces '
+            'in a single request and filter locally instead'
+        ),
+        default=20,
+        type=int
+    )
 
 def add_ssh_options(parser):
     # SSH
@@ -182,6 +246,20 @@ def add_cloud_options(parser):
         default=os.environ.get("OPENSTACK_CLOUD_NAME"),
         help="optional name of the open stack cloud from your config file to use",
     )
+    args.add_argument('--aws-regions',
+        default=os.environ.get("AWS_REGIONS"),
+        help="optional comma-separated list of AWS regions to fetch the instances from, concurrently (default: the configured region)",
+    )
+    args.add_argument('--aws-filter',
+        action='append',
+        default=[],
+        type=parse_aws_filter,
+        help="optional filter on the AWS instances to fetch, as name=value[,value], e.g. tag:team=chaos or vpc-id=vpc-123 (can be repeated)",
+    )
+    args.add_argument('--aws-cluster-name',
+        default=os.environ.get("AWS_CLUSTER_NAME"),
+        help="optional name of the Kubernetes cluster, to only fetch the AWS instances tagged as part of it",
+    )
     args.add_argument('--azure-resource-group-name',
         default=os.environ.get("AZURE_RESORUCE_GROUP_NAME"),
         help="optional name of the Azure vm cluster resource group. Used to determine azure-node-resource-group-name.",
@@ -194,6 +272,14 @@ def add_cloud_options(parser):
         default=os.environ.get("GCP_CONFIG_FILE"),
         help="name of the gcloud config file (in json) to use instead of the default one",
     )
+    args.add_argument('--gcp-regions',
+        default=os.environ.get("GCP_REGIONS"),
+        help="optional comma-separated list of GCP regions to fetch the instances from (default: the region of the gcloud config)",
+    )
+    args.add_argument('--gcp-projects',
+        default=os.environ.get("GCP_PROJECTS"),
+        help="optional comma-separated list of GCP projects to fetch the instances from, concurrently (default: the project of the gcloud config)",
+    )
 
 def add_namespace_options(parser):
     args = parser.add_argument_group('Kubernetes options')
@@ -286,6 +372,12 @@ def check_valid_port(value):
     return parsed
 
 
+def split_list(value):
+    """ Splits a comma-separated list of values, None if there's none.
+    """
+    return [item for item in (value or "").split(",") if item] or None
+
+
 def parse_args(args):
     parser = ArgumentParser(
         config_file_parser_class=YAMLConfigFileParser,
@@ -376,6 +468,14 @@ def parse_args(args):
         default=int(os.environ.get('PORT', '8000')),
         type=check_valid_port
     )
+    web_args.add_argument(
+        '--enable-trigger',
+        help=('Adds POST /api/trigger to the web server, to start the next run '
+              'on demand. It has no authentication or CSRF protection: anything '
+              'able to reach the server (including a web page open in a browser '
+              'on the same network) can start chaos runs'),
+        action='store_true'
+    )
     web_args.add_argument(
         '--accept-proxy-headers',
         help='Set this flag for the webserver to accept X-Forwarded-* headers',
@@ -479,13 +579,32 @@ def main(argv):
     # KUBERNETES
     ##########################################################################
     kube_config = parse_kubeconfig(args)
-    k8s_client = K8sClient(kube_config=kube_config)
+    k8s_client = K8sClient(
+        kube_config=kube_config,
+        page_size=args.kubernetes_page_size,
+        selector_ttl=args.deployment_selector_ttl,
+    )
     operation_mode = args.execution_mode
     # backwards compatibility
     if args.use_pod_delete_instead_of_ssh_kill:
         operation_mode = "kubernetes"
+    pod_informer = None
+    if args.pod_informer:
+        logger.info("Starting the pod informer")
+        pod_informer = PodInformer(
+            k8s_client=k8s_client,
+            max_staleness=args.pod_informer_max_staleness,
+        )
+        pod_informer.start()
+        logger.info("Starting the deployment informer")
+        deployment_informer = DeploymentInformer(k8s_client=k8s_client)
+        deployment_informer.start()
+        k8s_client.deployment_selectors.informer = deployment_informer
     k8s_inventory = K8sInventory(
         k8s_client=k8s_client,
+        pod_informer=pod_informer,
+        max_workers=args.kubernetes_max_workers,
+        all_namespaces_threshold=args.kubernetes_all_namespaces_threshold,
     )
 
     ##########################################################################
@@ -498,7 +617,10 @@ def main(argv):
         )
     elif args.aws:
         logger.info("Building AWS driver")
-        driver = AWSDriver()
+        driver = AWSDriver(
+            regions=split_list(args.aws_regions),
+            filters=make_aws_filters(args.aws_filter, args.aws_cluster_name),
+        )
     elif args.azure:
         logger.info("Building Azure driver")
         driver = AzureDriver(
@@ -507,7 +629,11 @@ def main(argv):
         )
     elif args.gcp:
         logger.info("Building GCP driver")
-        driver = GCPDriver(config=args.gcp_config_file)
+        driver = GCPDriver(
+            config=args.gcp_config_file,
+            regions=split_list(args.gcp_regions),
+            projects=split_list(args.gcp_projects),
+        )
     else:
         logger.info("No cloud driver - some functionality disabled")
         driver = NoCloudDriver()
@@ -599,13 +725,33 @@ def main(argv):
         metric_collector = DatadogCollector()
     else:
         logger.info("Using stdout metrics collector")
+    if pod_informer is not None:
+        pod_informer.metric_collector = metric_collector
+
+    # SIGTERM (e.g. the pod being deleted) cuts all the waits short, and
+    # the running scenarios clean up before exiting
+    waiter = Waiter()
+    def stop(signum, frame):
+        logger.info("Received signal %s, stopping", signum)
+        waiter.stop()
+    signal.signal(signal.SIGTERM, stop)
 
     ##########################################################################
     # AUTONOMOUS MODE
     ##########################################################################
     if args.mode == 'autonomous':
 
-        runner = PolicyRunner(args.policy_file, k8s_client, logger)
+        scenario_informer = None
+        if args.watch_scenarios and k8s_client.has_scenarios_crd():
+            logger.info("Starting the scenario informer")
+            scenario_informer = ScenarioInformer(k8s_client=k8s_client)
+            scenario_informer.start()
+        runner = PolicyRunner(args.policy_file, k8s_client, logger,
+            metric_collector=metric_collector,
+            scenario_informer=scenario_informer,
+            waiter=waiter,
+        )
+        runner.start_policy_watch()
 
         # run the metrics server if requested
         if not args.headless:
@@ -617,6 +763,7 @@ def main(argv):
                 read_policy_fn=runner.read_policy,
                 accept_proxy_headers=args.accept_proxy_headers,
                 logger=server_log_handler,
+                trigger_fn=waiter.trigger if args.enable_trigger else None,
             )
         else:
             logger.info("NOT starting the UI server")
@@ -647,6 +794,7 @@ def main(argv):
             max_seconds_between_runs=args.max_seconds_between_runs,
             namespace=args.kubernetes_namespace,
             metric_collector=metric_collector,
+            waiter=waiter,
         )
         logger.info("STARTING LABEL MODE")
         label_runner.run()
@@ -181,24 +181,24 @@ class PSCmd(cmd.Cmd):
         Brings up a subset of machines
         """
         cmd = Command(line)
-        for node in self.find_nodes(cmd.get(0)):
+        nodes = list(self.find_nodes(cmd.get(0)))
+        for node in nodes:
             print("Starting %s" % (node))
-            try:
-                self.driver.start(node)
-            except Exception as e:
-                print(e)
+        for error in self.driver.start_many(nodes):
+            if error is not None:
+                print(error)
 
     def do_stop(self, line):
         """
         Brings down a subset of machines
         """
         cmd = Command(line)
-        for node in self.find_nodes(cmd.get(0)):
+        nodes = list(self.find_nodes(cmd.get(0)))
+        for node in nodes:
             print("Stopping %s" % (node))
-            try:
-                self.driver.stop(node)
-            except Exception as e:
-                print(e)
+        for error in self.driver.stop_many(nodes):
+            if error is not None:
+                print(error)
 
     def do_delete(self, line):
         """
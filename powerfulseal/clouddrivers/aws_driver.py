@@ -1,14 +1,38 @@
+from concurrent.futures import ThreadPoolExecutor
 from powerfulseal import makeLogger
 import boto3
 from . import AbstractDriver
 from ..node import Node, NodeState
 
+# tag set by Kubernetes on the instances of a cluster (to "owned" or "shared")
+CLUSTER_TAG = "kubernetes.io/cluster/%s"
+# instance ids per stop/start/terminate call
+MAX_INSTANCE_IDS = 1000
 
-def create_connection_from_config():
+
+def create_connection_from_config(region=None):
     """ Creates a new aws api connection """
-    conn = boto3.resource('ec2')
+    conn = boto3.resource('ec2', region_name=region)
     return conn
 
+def parse_filter(text):
+    """ Parses a DescribeInstances filter, written `name=value1,value2`
+        (e.g. `tag:team=chaos` or `vpc-id=vpc-123`).
+    """
+    name, sep, values = text.partition("=")
+    if not name or not sep or not values:
+        raise ValueError("Invalid AWS filter %r, expected name=value[,value]" % text)
+    return dict(Name=name, Values=values.split(","))
+
+def make_filters(filters=None, cluster_name=None):
+    """ Returns the DescribeInstances filters scoping the fetched instances:
+        the parsed filters, plus the cluster tag if a cluster is given.
+    """
+    output = list(filters or [])
+    if cluster_name:
+        output.append(dict(Name="tag-key", Values=[CLUSTER_TAG % cluster_name]))
+    return output
+
 def get_all_ips(instance):
     """ Returns the public and private ip addresses of an AWS EC2 instances
     """
@@ -42,45 +66,110 @@ def create_node_from_server(server):
 class AWSDriver(AbstractDriver):
     """
         Concrete implementation of the AWS cloud driver.
+
+        Every sync fetches the instances once (DescribeInstances, following
+        its pages), scoped by the filters, from every region concurrently.
     """
 
-    def __init__(self, cloud=None, conn=None, logger=None):
+    def __init__(self, cloud=None, conn=None, logger=None, regions=None, filters=None):
         self.logger = logger or makeLogger(__name__)
-        self.conn = create_connection_from_config()
+        # region -> connection, None being the default region
+        self.conns = {
+            region: create_connection_from_config(region)
+            for region in regions or [None]
+        }
+        self.conn = next(iter(self.conns.values()))
+        self.filters = filters or []
+        self.instance_regions = {}
         self.instances = []
 
+    def fetch_instances(self, region):
+        """ Lists the instances of a region, materialized.
+        """
+        collection = self.conns[region].instances
+        if self.filters:
+            return list(collection.filter(Filters=self.filters))
+        return list(collection.all())
+
     def sync(self):
         """ Downloads a fresh set of nodes form the API.
         """
         self.logger.debug("Synchronizing remote nodes")
-        self.remote_servers = self.conn.instances.all()
-        self.amount_of_servers = list(self.conn.instances.all())
-        self.logger.info("Fetched %s remote servers" % len(self.amount_of_servers))
+        regions = list(self.conns)
+        if len(regions) == 1:
+            fetched = [self.fetch_instances(regions[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=len(regions)) as executor:
+                fetched = list(executor.map(self.fetch_instances, regions))
+        remote_servers = []
+        instance_regions = {}
+        for region, instances in zip(regions, fetched):
+            for instance in instances:
+                instance_regions[instance.id] = region
+            remote_servers.extend(instances)
+        self.instance_regions = instance_regions
+        self.remote_servers = remote_servers
+        self.logger.info("Fetched %s remote servers" % len(self.remote_servers))
 
-    def get_by_ip(self, ip):
-        """ Retrieve an instance of Node by its IP.
+    def get_connection(self, node):
+        """ The connection to the region of a node.
         """
-        for server in self.remote_servers:
-            addresses = get_all_ips(server)
-            if not addresses:
-                self.logger.warning("No ip addresses found: %s", server)
-            else:
-                for addr in addresses:
-                    if addr == ip:
-                        return create_node_from_server(server)
-        return None
+        region = self.instance_regions.get(node.id)
+        return self.conns.get(region, self.conn)
+
+    def get_server_addresses(self, server):
+        return get_all_ips(server)
+
+    def create_node(self, server, address):
+        return create_node_from_server(server)
 
     def stop(self, node):
         """ Stop a Node.
         """
-        self.conn.instances.filter(InstanceIds=(node.id.split())).stop()
+        self.get_connection(node).instances.filter(InstanceIds=(node.id.split())).stop()
 
     def start(self, node):
         """ Start a Node.
         """
-        self.conn.instances.filter(InstanceIds=(node.id.split())).start()
+        self.get_connection(node).instances.filter(InstanceIds=(node.id.split())).start()
 
     def delete(self, node):
         """ Delete a Node permanently.
         """
-        self.conn.instances.filter(InstanceIds=(node.id.split())).terminate()
+        self.get_connection(node).instances.filter(InstanceIds=(node.id.split())).terminate()
+
+    def run_batched(self, operation, nodes):
+        """ Calls an EC2 operation (e.g. stop_instances) with the ids of
+            many nodes at once: one call per region (and MAX_INSTANCE_IDS).
+            A failed call fails all its nodes.
+        """
+        nodes = list(nodes)
+        errors = [None] * len(nodes)
+        by_region = {}
+        for i, node in enumerate(nodes):
+            by_region.setdefault(self.instance_regions.get(node.id), []).append(i)
+        for indexes in by_region.values():
+            client = self.get_connection(nodes[indexes[0]]).meta.client
+            for start in range(0, len(indexes), MAX_INSTANCE_IDS):
+                chunk = indexes[start:start + MAX_INSTANCE_IDS]
+                try:
+                    getattr(client, operation)(InstanceIds=[nodes[i].id for i in chunk])
+                except Exception as e:
+                    for i in chunk:
+                        errors[i] = e
+        return errors
+
+    def stop_many(self, nodes):
+        """ Stop Nodes, in batches.
+        """
+        return self.run_batched("stop_instances", nodes)
+
+    def start_many(self, nodes):
+        """ Start Nodes, in batches.
+        """
+        return self.run_batched("start_instances", nodes)
+
+    def delete_many(self, nodes):
+        """ Delete Nodes permanently, in batches.
+        """
+        return self.run_batched("terminate_instances", nodes)
@@ -1,5 +1,6 @@
 import os
 import sys
+import time
 from powerfulseal import makeLogger
 from . import AbstractDriver
 from ..node import Node, NodeState
@@ -10,6 +11,10 @@ from azure.mgmt.resource import ResourceManagementClient
 from azure.mgmt.network import NetworkManagementClient
 from azure.mgmt.compute import ComputeManagementClient
 
+# how long to wait before looking for the node resource group again,
+# when it wasn't found
+RESOURCE_GROUP_RETRY_SECONDS = 600
+
 def create_connection_from_config():
     """ Creates a new Azure api connection """
     resource_client = None
@@ -49,6 +54,11 @@ def server_state(compute_client, server):
 
     return ret_state
 
+def get_resource_group(resource_id):
+    """ Returns the resource group of an ARM resource id.
+    """
+    return resource_id.split('/')[4]
+
 def create_node_from_server(compute_client,server,int_ip, ext_ip):
     return Node(
         id=server.id,
@@ -70,36 +80,34 @@ class AzureDriver(AbstractDriver):
         self.remote_servers = []
         self.cluster_rg = cluster_rg_name
         self.cluster_node_rg = cluster_node_rg_name
+        self.cluster_node_rg_checked = None
+        # NIC id -> ip configurations, public ip id -> address (lowercase
+        # ids), listed in bulk on every sync
         self.ipconfig_cache = {}
+        self.public_ip_cache = {}
 
     def get_all_ips(self, instance, network_client):
-        """ Returns the private and public ip addresses of an Azure instances
+        """ Returns the private and public ip addresses of an Azure instances.
+            The NICs and public IPs are looked up in the ones listed by the
+            last sync, and only fetched one by one when missing.
         """
         output = []
         for interface in instance.network_profile.network_interfaces:
             if_name = " ".join(interface.id.split('/')[-1:])
-            rg = "".join(interface.id.split('/')[4])
+            rg = get_resource_group(interface.id)
 
             try:
-                thing = self.ipconfig_cache.get(if_name)
+                thing = self.ipconfig_cache.get(interface.id.lower())
                 if thing is None:
                     thing = network_client.network_interfaces.get(
                         rg, if_name).ip_configurations
-                    self.ipconfig_cache[if_name] = thing
+                    self.ipconfig_cache[interface.id.lower()] = thing
                 for x in thing:
                     private_ip = x.private_ip_address
                     public_ip = None
-                    """print('\nifdata: ',rg,if_name,x.private_ip_address,x.public_ip_address)"""
                     """ Have to extract public IP from public IP class structure...if present """
                     if x.public_ip_address is not None:
-                        public_ip_id = x.public_ip_address.id
-                        public_ip_name = " ".join(public_ip_id.split('/')[-1:])
-                        try:
-                            public_ip_return = network_client.public_ip_addresses.get(
-                                rg, public_ip_name)
-                            public_ip = public_ip_return.ip_address
-                        except:
-                            """ Ignore the exception.  return no additional values """
+                        public_ip = self.get_public_ip(x.public_ip_address.id, network_client)
 
                     temp_pair = (private_ip, public_ip)
                     output.append(temp_pair)
@@ -109,6 +117,53 @@ class AzureDriver(AbstractDriver):
 
         return output
 
+    def get_public_ip(self, public_ip_id, network_client):
+        """ Returns the address of a public IP, None if it can't be found.
+        """
+        if public_ip_id.lower() in self.public_ip_cache:
+            return self.public_ip_cache[public_ip_id.lower()]
+        public_ip_name = " ".join(public_ip_id.split('/')[-1:])
+        try:
+            public_ip = network_client.public_ip_addresses.get(
+                get_resource_group(public_ip_id), public_ip_name).ip_address
+        except:
+            """ Ignore the exception.  return no additional values """
+            return None
+        self.public_ip_cache[public_ip_id.lower()] = public_ip
+        return public_ip
+
+    def list_network(self, servers):
+        """ Lists the NICs of the resource groups the servers' NICs are in,
+            then the public IPs of the resource groups they use: a couple of
+            calls per resource group, rather than one or two per NIC.
+        """
+        ipconfigs = {}
+        public_ips = {}
+        nic_rgs = {
+            get_resource_group(interface.id).lower()
+            for server in servers
+            for interface in server.network_profile.network_interfaces
+        }
+        for rg in sorted(nic_rgs):
+            try:
+                for nic in self.network_client.network_interfaces.list(rg):
+                    ipconfigs[nic.id.lower()] = nic.ip_configurations
+            except Exception:
+                self.logger.exception("Error listing the network interfaces of %s", rg)
+        public_ip_rgs = {
+            get_resource_group(ipconfig.public_ip_address.id).lower()
+            for nic_ipconfigs in ipconfigs.values()
+            for ipconfig in nic_ipconfigs or []
+            if ipconfig.public_ip_address is not None
+        }
+        for rg in sorted(public_ip_rgs):
+            try:
+                for public_ip in self.network_client.public_ip_addresses.list(rg):
+                    public_ips[public_ip.id.lower()] = public_ip.ip_address
+            except Exception:
+                self.logger.exception("Error listing the public IPs of %s", rg)
+        return ipconfigs, public_ips
+
     def getResourceGroups(self):
         """ Find nodeResourceGroup for the cluster.
             This can be determined by finding the resource groups that are managed_by 
@@ -118,6 +173,11 @@ class AzureDriver(AbstractDriver):
         self.logger.debug("++ Azure cluster_node_rg: %s", self.cluster_node_rg)
 
         if self.cluster_node_rg is None:
+            # it's kept once found, but not finding it lists all the
+            # resource groups: only look again every so often
+            if (self.cluster_node_rg_checked is not None
+                    and time.monotonic() - self.cluster_node_rg_checked < RESOURCE_GROUP_RETRY_SECONDS):
+                return
             if self.cluster_rg is not None:
                 """ get the nodeResouceGroup for the cluster ResourceGroup """
                 crg = self.resource_client.resource_groups.get(self.cluster_rg)
@@ -139,6 +199,7 @@ class AzureDriver(AbstractDriver):
                     querying aks by kubernetes cluster name.
                 """
                 self.logger.warning("Azure Cluster Resource Group is not specified.  Please specify as an argument.")
+            self.cluster_node_rg_checked = time.monotonic()
 
 
     def sync(self):
@@ -148,29 +209,28 @@ class AzureDriver(AbstractDriver):
         """only get the resource group for the current cluster 
         """
         self.getResourceGroups()
-        self.remote_servers = []
         if self.cluster_node_rg is not None:
-            self.remote_servers = list(self.compute_client.virtual_machines.list(self.cluster_node_rg))
+            remote_servers = list(self.compute_client.virtual_machines.list(self.cluster_node_rg))
         else:
             self.logger.warning("No Azure cluster node resource group was found, the node list may be incorrect.")
-            self.remote_servers = list(self.compute_client.virtual_machines.list_all())
+            remote_servers = list(self.compute_client.virtual_machines.list_all())
 
+        self.ipconfig_cache, self.public_ip_cache = self.list_network(remote_servers)
+        # assigned once the network is listed, which resets the IP index
+        self.remote_servers = remote_servers
         self.logger.info("Fetched %s remote servers" % len(self.remote_servers))
 
-    def get_by_ip(self, ip):
-        """ Retrieve an instance of Node by its IP.
+    def get_server_addresses(self, server):
+        return self.get_all_ips(server, self.network_client)
+
+    def get_address_ips(self, address):
+        """ Addresses are (private ip, public ip) pairs.
         """
-        for server in self.remote_servers:
-            addresses = self.get_all_ips(server, self.network_client)
-            if not addresses:
-                self.logger.warning("No ip addresses found: %s", server.__dict__)
-            else:
-                """ returns first node """
-                for addr in addresses:
-                    if addr[0] == ip or addr[1] == ip:
-                        new_node=create_node_from_server(compute_client=self.compute_client, server=server, int_ip=addr[0], ext_ip=addr[1])
-                        return new_node
-        return None
+        return address
+
+    def create_node(self, server, address):
+        int_ip, ext_ip = address
+        return create_node_from_server(compute_client=self.compute_client, server=server, int_ip=int_ip, ext_ip=ext_ip)
 
     def stop(self, node):
         """ Stop a Node.
@@ -189,3 +249,39 @@ class AzureDriver(AbstractDriver):
         """
         async_vm_delete = self.compute_client.virtual_machines.delete(self.cluster_node_rg, node.name)
         async_vm_delete.wait()
+
+    def run_async(self, begin, nodes):
+        """ Begins a long running operation (e.g. begin_power_off) on every
+            node, and then waits for all of them.
+        """
+        nodes = list(nodes)
+        errors = [None] * len(nodes)
+        pollers = [None] * len(nodes)
+        for i, node in enumerate(nodes):
+            try:
+                pollers[i] = begin(self.cluster_node_rg, node.name)
+            except Exception as e:
+                errors[i] = e
+        for i, poller in enumerate(pollers):
+            if poller is None:
+                continue
+            try:
+                poller.wait()
+            except Exception as e:
+                errors[i] = e
+        return errors
+
+    def stop_many(self, nodes):
+        """ Stop Nodes, all at once.
+        """
+        return self.run_async(self.compute_client.virtual_machines.begin_power_off, nodes)
+
+    def start_many(self, nodes):
+        """ Start Nodes, all at once.
+        """
+        return self.run_async(self.compute_client.virtual_machines.begin_start, nodes)
+
+    def delete_many(self, nodes):
+        """ Delete Nodes permanently, all at once.
+        """
+        return self.run_async(self.compute_client.virtual_machines.delete, nodes)
@@ -14,6 +14,10 @@
 
 
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+# nodes stopped, started or deleted at once by the default *_many methods
+MAX_CONCURRENT_OPERATIONS = 16
 
 
 class AbstractDriver(ABC):
@@ -21,19 +25,81 @@ class AbstractDriver(ABC):
         Abstract class representing a cloud driver.
         All concrete drivers should implement this.
 
+        sync() sets `remote_servers`, and get_by_ip() looks the servers up
+        in an IP -> server index, built from get_server_addresses() the
+        first time it's needed after every sync.
+
+        stop_many(), start_many() and delete_many() act on several nodes
+        at once: concurrently by default, in batched calls where the
+        cloud supports it.
+
         NOTE: node.extIp should be an accessible IP.
               It should the same as node.ip if there is
               no separate public IP.
     """
 
+    _remote_servers = ()
+    _ip_index = None
+
+    @property
+    def remote_servers(self):
+        return self._remote_servers
+
+    @remote_servers.setter
+    def remote_servers(self, servers):
+        self._remote_servers = servers
+        self._ip_index = None
+
     @abstractmethod
     def sync(self):
         pass  # pragma: no cover
 
     @abstractmethod
-    def get_by_ip(self, ip):
+    def get_server_addresses(self, server):
+        """ Returns the addresses of a server, as passed to
+            get_address_ips() and create_node().
+        """
+        pass  # pragma: no cover
+
+    def get_address_ips(self, address):
+        """ Returns the IPs an address matches. By default, addresses are
+            plain IPs.
+        """
+        return (address,)
+
+    @abstractmethod
+    def create_node(self, server, address):
+        """ Translates a server, found by one of its addresses, into a Node.
+        """
         pass  # pragma: no cover
 
+    def build_ip_index(self):
+        """ Maps every IP of the remote servers to (server, address). Like
+            a scan of the servers would, the first server with an IP wins.
+        """
+        index = dict()
+        for server in self.remote_servers:
+            addresses = self.get_server_addresses(server)
+            if not addresses:
+                self.logger.warning("No ip addresses found: %s", server)
+                continue
+            for address in addresses:
+                for ip in self.get_address_ips(address):
+                    if ip and ip not in index:
+                        index[ip] = (server, address)
+        return index
+
+    def get_by_ip(self, ip):
+        """ Retrieve an instance of Node by its IP.
+        """
+        if self._ip_index is None:
+            self._ip_index = self.build_ip_index()
+        match = self._ip_index.get(ip)
+        if match is None:
+            return None
+        server, address = match
+        return self.create_node(server, address)
+
     @abstractmethod
     def stop(self, node):
         pass  # pragma: no cover
@@ -45,3 +111,38 @@ class AbstractDriver(ABC):
     @abstractmethod
     def delete(self, node):
         pass  # pragma: no cover
+
+    def run_many(self, fn, nodes):
+        """ Calls fn on every node, concurrently. Returns the exception
+            raised for every node (None if it succeeded), in order.
+        """
+        def call(node):
+            try:
+                fn(node)
+            except Exception as e:
+                return e
+            return None
+        nodes = list(nodes)
+        if len(nodes) <= 1:
+            return [call(node) for node in nodes]
+        workers = min(len(nodes), MAX_CONCURRENT_OPERATIONS)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(call, nodes))
+
+    def stop_many(self, nodes):
+        """ Stops Nodes. Returns the error of every node, None if it
+            succeeded, in order.
+        """
+        return self.run_many(self.stop, nodes)
+
+    def start_many(self, nodes):
+        """ Starts Nodes. Returns the error of every node, None if it
+            succeeded, in order.
+        """
+        return self.run_many(self.start, nodes)
+
+    def delete_many(self, nodes):
+        """ Deletes Nodes permanently. Returns the error of every node,
+            None if it succeeded, in order.
+        """
+        return self.run_many(self.delete, nodes)
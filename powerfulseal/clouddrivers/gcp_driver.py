@@ -1,4 +1,5 @@
 import json
+from concurrent.futures import ThreadPoolExecutor
 from powerfulseal import makeLogger
 import subprocess
 import sys
@@ -37,6 +38,9 @@ def get_all_ips(instance):
     return ip_list
 
 
+# requests per batch, the most the API accepts
+MAX_BATCH_REQUESTS = 1000
+
 # https://cloud.google.com/compute/docs/instances/instance-life-cycle
 MAPPING_STATES_STATUS = {
     "RUNNING": NodeState.UP,
@@ -69,29 +73,28 @@ def create_node_from_server(server):
     )
 
 
-def get_zones_of_region(compute, region, project):
-    """ Returns the name of the zones inside a region.
+def get_zone_region(zone):
+    """ Returns the region of a zone (us-central1 for us-central1-a).
     """
-    list_of_zones = []
+    return zone.rsplit('-', 1)[0]
+
 
-    request = compute.zones().list(project=project)
+def list_all_instances(compute, project, regions=None):
+    """ List Compute instances of a project, in all its zones at once
+        (following the pages), optionally only in some regions.
+    """
+    instances = []
+    request = compute.instances().aggregatedList(project=project)
     while request is not None:
         response = request.execute()
-
-        for zone in response['items']:
-            # Check if the zone is inside our region
-            if region in zone['description']:
-                list_of_zones.append(zone['description'])
-
-        request = compute.zones().list_next(
+        for scope, scoped_list in response.get('items', {}).items():
+            zone = scope.rsplit('/', 1)[-1]
+            if regions and get_zone_region(zone) not in regions:
+                continue
+            instances.extend(scoped_list.get('instances', []))
+        request = compute.instances().aggregatedList_next(
             previous_request=request, previous_response=response)
-    return list_of_zones
-
-def list_instances(compute, project, zone):
-    """ List Compute instances inside a zone.
-    """
-    result = compute.instances().list(project=project, zone=zone).execute()
-    return result['items'] if 'items' in result else None
+    return instances
 
 
 def read_default_config():
@@ -107,11 +110,15 @@ def read_default_config():
 class GCPDriver(AbstractDriver):
     """
         Concrete implementation of the GCP cloud driver.
+
+        Every sync lists the instances of each project in one aggregated
+        list (one request per page, rather than one per zone), and the
+        projects concurrently.
     """
 
-    def __init__(self, cloud=None, conn=None, logger=None, config=None):
+    def __init__(self, cloud=None, conn=None, logger=None, config=None,
+                 regions=None, projects=None):
         self.logger = logger or makeLogger(__name__)
-        self.conn = create_connection_from_config()
         self.remote_servers = []
         try:
             if not config:
@@ -129,55 +136,120 @@ class GCPDriver(AbstractDriver):
             self.logger.error("gcloud config file isn't valid")
             self.logger.info("Exiting")
             sys.exit(0)
+        self.regions = regions or [self.region]
+        self.projects = projects or [self.project]
+        # API clients aren't thread-safe, so there's one per project
+        self.conns = {
+            project: create_connection_from_config()
+            for project in self.projects
+        }
+        self.conn = self.conns[self.projects[0]]
+        self.instance_projects = {}
+
+    def fetch_instances(self, project):
+        return list_all_instances(self.conns[project], project, self.regions)
 
     def sync(self):
         """ Downloads a fresh set of nodes from the API.
         """
         self.logger.debug("Synchronizing remote nodes")
-        self.remote_servers = []
-        self.zones = get_zones_of_region(self.conn, self.region, self.project)
-        if self.zones is not None:
-            for zone in self.zones:
-                instances = list_instances(self.conn, self.project, zone)
-                if instances is not None:
-                    for instance in instances:
-                        self.remote_servers.append(instance)
+        if len(self.projects) == 1:
+            fetched = [self.fetch_instances(self.projects[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=len(self.projects)) as executor:
+                fetched = list(executor.map(self.fetch_instances, self.projects))
+        remote_servers = []
+        instance_projects = {}
+        for project, instances in zip(self.projects, fetched):
+            for instance in instances:
+                instance_projects[instance['id']] = project
+            remote_servers.extend(instances)
+        self.instance_projects = instance_projects
+        # assigned once complete, which resets the IP index
+        self.remote_servers = remote_servers
         self.logger.info("Fetched %s remote servers" %
                          len(self.remote_servers))
 
-    def get_by_ip(self, ip):
-        """ Retrieve an instance of Node by its IP.
+    def get_project(self, node):
+        """ The project of a node.
         """
-        for server in self.remote_servers:
-            addresses = get_all_ips(server)
-            if not addresses:
-                self.logger.warning("No ip addresses found: %s", server)
-            else:
-                for addr in addresses:
-                    if addr == ip:
-                        return create_node_from_server(server)
-        return None
+        return self.instance_projects.get(node.id, self.projects[0])
+
+    def get_server_addresses(self, server):
+        return get_all_ips(server)
+
+    def create_node(self, server, address):
+        return create_node_from_server(server)
 
     def stop(self, node):
         """ Stop a Node.
         """
-        self.conn.instances().stop(
-            project=self.project,
+        project = self.get_project(node)
+        self.conns[project].instances().stop(
+            project=project,
             zone=node.az,
             instance=node.name).execute()
 
     def start(self, node):
         """ Start a Node.
         """
-        self.conn.instances().start(
-            project=self.project,
+        project = self.get_project(node)
+        self.conns[project].instances().start(
+            project=project,
             zone=node.az,
             instance=node.name).execute()
 
     def delete(self, node):
         """ Delete a Node permanently.
         """
-        self.conn.instances().delete(
-            project=self.project,
+        project = self.get_project(node)
+        self.conns[project].instances().delete(
+            project=project,
             zone=node.az,
             instance=node.name).execute()
+
+    def run_batched(self, method, nodes):
+        """ Calls an instances method (e.g. stop) on many nodes at once,
+            in batch requests: one per project (and MAX_BATCH_REQUESTS).
+        """
+        nodes = list(nodes)
+        errors = [None] * len(nodes)
+
+        def callback(request_id, response, exception):
+            if exception is not None:
+                errors[int(request_id)] = exception
+
+        by_project = {}
+        for i, node in enumerate(nodes):
+            by_project.setdefault(self.get_project(node), []).append(i)
+        for project, indexes in by_project.items():
+            conn = self.conns[project]
+            for start in range(0, len(indexes), MAX_BATCH_REQUESTS):
+                chunk = indexes[start:start + MAX_BATCH_REQUESTS]
+                batch = conn.new_batch_http_request(callback=callback)
+                for i in chunk:
+                    batch.add(getattr(conn.instances(), method)(
+                        project=project,
+                        zone=nodes[i].az,
+                        instance=nodes[i].name), request_id=str(i))
+                try:
+                    batch.execute()
+                except Exception as e:
+                    for i in chunk:
+                        errors[i] = e
+        return errors
+
+    def stop_many(self, nodes):
+        """ Stop Nodes, in batches.
+        """
+        return self.run_batched("stop", nodes)
+
+    def start_many(self, nodes):
+        """ Start Nodes, in batches.
+        """
+        return self.run_batched("start", nodes)
+
+    def delete_many(self, nodes):
+        """ Delete Nodes permanently, in batches.
+        """
+        return self.run_batched("delete", nodes)
@@ -40,18 +40,28 @@ class NoCloudDriver(AbstractDriver):
             MESSAGE_IM_NO_CLOUD_DRIVER, "sync"
         )
 
-    def get_by_ip(self, ip):
+    def get_server_addresses(self, server):
+        """ There are no servers to index.
+        """
+        return []
+
+    def create_node(self, server, address):
         """ Creates a Node instance for given IP.
         """
         return Node(
-            id="fake-{ip}".format(ip=ip),
-            ip=ip,
-            extIp=ip,
+            id="fake-{ip}".format(ip=address),
+            ip=address,
+            extIp=address,
             az="nope",
-            name="local-{ip}".format(ip=ip),
+            name="local-{ip}".format(ip=address),
             state=NodeState.UNKNOWN
         )
 
+    def get_by_ip(self, ip):
+        """ Makes up a Node for any IP, without looking it up.
+        """
+        return self.create_node(None, ip)
+
     def stop(self, node):
         """ Noop
         """
@@ -80,18 +80,11 @@ class OpenStackDriver(AbstractDriver):
         self.remote_servers = list(self.conn.compute.servers())
         self.logger.info("Fetched %s remote servers" % len(self.remote_servers))
 
-    def get_by_ip(self, ip):
-        """ Retreive an instance of Node by its IP.
-        """
-        for server in self.remote_servers:
-            addresses = get_all_ips(server)
-            if not addresses:
-                self.logger.warning("No addresses found: %s", server)
-            else:
-                for addr in addresses:
-                    if addr == ip:
-                        return create_node_from_server(server)
-        return None
+    def get_server_addresses(self, server):
+        return get_all_ips(server)
+
+    def create_node(self, server, address):
+        return create_node_from_server(server)
 
     def stop(self, node):
         """ Stop a Node.
@@ -16,4 +16,6 @@
 
 from .k8s_client import K8sClient
 from .k8s_inventory import K8sInventory
+from .informer import Informer, PodInformer, DeploymentInformer, ScenarioInformer
+from .deployment_cache import DeploymentSelectorCache
 from .pod import Pod
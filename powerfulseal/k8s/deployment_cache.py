@@ -0,0 +1,104 @@
+# Copyright 2017 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+
+from kubernetes.client.rest import ApiException
+
+HTTP_STATUS_NOT_FOUND = 404
+
+
+class DeploymentSelectorCache():
+    """ Caches the label selector of deployments, keyed by
+        (namespace, name), so that matching pods by deployment doesn't
+        need to read the deployment every time.
+
+        With a deployment informer, the deployments come from its store,
+        and a cached selector is reused for as long as the deployment's
+        resourceVersion doesn't change; deployments gone from the store are
+        dropped. Without one, or while its store isn't usable (not synced,
+        or stale), a selector is read from the API at most once every `ttl`
+        seconds.
+    """
+
+    def __init__(self, k8s_client, ttl=60, informer=None):
+        self.k8s_client = k8s_client
+        self.ttl = ttl
+        self.informer = informer
+        # (namespace, name) -> (resourceVersion, selector, expiry)
+        self.entries = dict()
+        self.lock = threading.Lock()
+
+    def make_selector(self, deployment):
+        return self.k8s_client.dict_to_selector(
+            deployment.spec.selector.match_labels)
+
+    def get_from_informer(self, key):
+        deployment = self.informer.get(*key)
+        if deployment is None:
+            with self.lock:
+                self.entries.pop(key, None)
+            raise ApiException(status=HTTP_STATUS_NOT_FOUND,
+                reason="Deployment %s/%s not found" % key)
+        version = deployment.metadata.resource_version
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        selector = self.make_selector(deployment)
+        with self.lock:
+            self.entries[key] = (version, selector, None)
+        self.prune()
+        return selector
+
+    def prune(self):
+        """ Drops the selectors of the deployments gone from the informer's
+            store (the ones read from the API expire on their own).
+        """
+        with self.lock:
+            keys = [key for key, entry in self.entries.items() if entry[0] is not None]
+        gone = [key for key in keys if self.informer.get(*key) is None]
+        if gone:
+            with self.lock:
+                for key in gone:
+                    self.entries.pop(key, None)
+
+    def get_from_api(self, key):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is not None and entry[0] is None and now < entry[2]:
+            return entry[1]
+        selector = self.make_selector(self.k8s_client.get_deployment(*key))
+        with self.lock:
+            self.entries[key] = (None, selector, now + self.ttl)
+        return selector
+
+    def get(self, namespace, name):
+        """ Returns the label selector of a deployment.
+        """
+        key = (namespace, name)
+        if self.informer is not None and self.informer.is_usable():
+            return self.get_from_informer(key)
+        return self.get_from_api(key)
+
+    def invalidate(self, namespace=None, name=None):
+        """ Drops a single deployment, or everything.
+        """
+        with self.lock:
+            if namespace is None:
+                self.entries.clear()
+            else:
+                self.entries.pop((namespace, name), None)
@@ -0,0 +1,311 @@
+# Copyright 2017 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import functools
+import threading
+import time
+
+import kubernetes.watch
+from kubernetes.client.rest import ApiException
+
+from powerfulseal import makeLogger
+from .selector import parse_selector, match_requirements, match_fields
+from .k8s_client import K8S_CRD_GROUP, K8S_CRD_VERSION, K8S_CRD_PLURAL
+
+HTTP_STATUS_GONE = 410
+# not allowed to list or watch: retrying won't help
+HTTP_STATUS_FORBIDDEN = (401, 403)
+
+
+class Informer():
+    """ Keeps a local store of Kubernetes objects current, using a single
+        LIST followed by a long-lived WATCH from the returned resourceVersion.
+
+        If the watch expires (410 Gone), the store is rebuilt with a fresh
+        LIST. Other errors are retried from the same resourceVersion, with an
+        exponential backoff, so the store goes stale instead of being
+        rebuilt over and over. If the service account isn't allowed to list
+        or watch (401/403), the informer disables itself, and the callers
+        fall back to the API.
+    """
+
+    def __init__(self, list_fn, kind="objects", watch_timeout=300,
+                 retry_delay=5, max_retry_delay=300, max_staleness=600,
+                 metric_collector=None, logger=None):
+        self.list_fn = list_fn
+        self.kind = kind
+        self.watch_timeout = watch_timeout
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.max_staleness = max_staleness
+        self.metric_collector = metric_collector
+        self.logger = logger or makeLogger(__name__, kind)
+        self.resource_version = None
+        self.store = dict()
+        self.lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._synced = threading.Event()
+        self._watch = None
+        self._thread = None
+        self._last_heard = None
+        self._needs_resync = False
+        self.disabled = False
+
+    def start(self):
+        """ Does the initial LIST synchronously, and starts watching
+            in a background thread.
+        """
+        try:
+            self.resync(reason="initial")
+        except ApiException as e:
+            if e.status not in HTTP_STATUS_FORBIDDEN:
+                raise
+            self.disable(e)
+            return
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._watch is not None:
+            self._watch.stop()
+
+    def disable(self, error):
+        """ Stops the informer for good, and makes it unusable.
+        """
+        self.logger.error(
+            "Not allowed to list and watch %s (%s %s), disabling the informer. "
+            "Check that the service account has the list and watch verbs",
+            self.kind, error.status, error.reason)
+        self.disabled = True
+        self._synced.clear()
+        self._last_heard = None
+        self.stop()
+
+    def has_synced(self):
+        return self._synced.is_set()
+
+    def staleness(self):
+        """ Seconds since the store last heard from the API server.
+        """
+        if self._last_heard is None:
+            return float("inf")
+        return time.monotonic() - self._last_heard
+
+    def is_usable(self):
+        """ Only serve from memory if the store was synced and isn't stale.
+        """
+        return self.has_synced() and self.staleness() <= self.max_staleness
+
+    @staticmethod
+    def get_metadata_field(obj, field, raw_field):
+        """ Reads a metadata field from either a model or a raw dict.
+        """
+        if isinstance(obj, dict):
+            return obj.get("metadata", {}).get(raw_field)
+        return getattr(obj.metadata, field)
+
+    def make_key(self, obj):
+        return (
+            self.get_metadata_field(obj, "namespace", "namespace"),
+            self.get_metadata_field(obj, "name", "name"),
+        )
+
+    @staticmethod
+    def read_list(resp):
+        """ Returns the items and resourceVersion of a LIST response,
+            either a model or a dict (for custom objects).
+        """
+        if isinstance(resp, dict):
+            return resp.get("items", []), resp.get("metadata", {}).get("resourceVersion")
+        return resp.items, resp.metadata.resource_version
+
+    def resync(self, reason):
+        """ Rebuilds the store from a full LIST.
+        """
+        self.logger.info("Resyncing %s (%s)", self.kind, reason)
+        items, resource_version = self.read_list(self.list_fn())
+        store = dict()
+        for item in items:
+            store[self.make_key(item)] = item
+        with self.lock:
+            self.store = store
+            self.resource_version = resource_version
+        self._last_heard = time.monotonic()
+        self._synced.set()
+        self.logger.info("Resynced %d %s at resourceVersion %s",
+            len(store), self.kind, self.resource_version)
+
+    def handle_event(self, event):
+        """ Applies a single watch event to the store.
+        """
+        event_type = event.get("type")
+        if event_type == "BOOKMARK":
+            metadata = event.get("raw_object", {}).get("metadata", {})
+            with self.lock:
+                self.resource_version = metadata.get("resourceVersion", self.resource_version)
+            self._last_heard = time.monotonic()
+            return
+        obj = event.get("object")
+        key = self.make_key(obj)
+        with self.lock:
+            if event_type == "DELETED":
+                self.store.pop(key, None)
+            else:
+                self.store[key] = obj
+            self.resource_version = self.get_metadata_field(
+                obj, "resource_version", "resourceVersion") or self.resource_version
+        self._last_heard = time.monotonic()
+
+    def watch(self):
+        """ Streams watch events until the server closes the connection.
+        """
+        self._watch = kubernetes.watch.Watch()
+        for event in self._watch.stream(
+            self.list_fn,
+            resource_version=self.resource_version,
+            timeout_seconds=self.watch_timeout,
+            allow_watch_bookmarks=True,
+        ):
+            self.handle_event(event)
+            if self._stopped.is_set():
+                break
+        # a clean end of the stream means we were up to date until now
+        self._last_heard = time.monotonic()
+
+    def get_retry_delay(self, failures):
+        """ The delay before retrying after a number of failures in a row.
+        """
+        return min(self.retry_delay * 2 ** (failures - 1), self.max_retry_delay)
+
+    def run(self):
+        """ Watches forever, resyncing only when the watch can't be resumed.
+        """
+        failures = 0
+        while not self._stopped.is_set():
+            try:
+                if self._needs_resync:
+                    self.resync(reason="gone")
+                    self._needs_resync = False
+                self.watch()
+                failures = 0
+            except ApiException as e:
+                if e.status == HTTP_STATUS_GONE:
+                    self.logger.info("Watch for %s expired (410 Gone)", self.kind)
+                    self._needs_resync = True
+                    continue
+                if e.status in HTTP_STATUS_FORBIDDEN:
+                    self.disable(e)
+                    return
+                failures += 1
+                self.logger.exception("Error watching %s", self.kind)
+                self._stopped.wait(self.get_retry_delay(failures))
+            except Exception:
+                failures += 1
+                self.logger.exception("Error watching %s", self.kind)
+                self._stopped.wait(self.get_retry_delay(failures))
+
+    def list(self):
+        with self.lock:
+            return list(self.store.values())
+
+
+class PodInformer(Informer):
+    """ Informer for all the pods in the cluster. Answers namespace and
+        label selector queries from memory.
+    """
+
+    def __init__(self, k8s_client, **kwargs):
+        Informer.__init__(self,
+            list_fn=k8s_client.client_corev1api.list_pod_for_all_namespaces,
+            kind="pods",
+            **kwargs
+        )
+
+    def resync(self, reason):
+        Informer.resync(self, reason)
+        if self.metric_collector is not None:
+            self.metric_collector.add_pod_cache_resync_metric(reason)
+        self.report_staleness()
+
+    def report_staleness(self):
+        if self.metric_collector is not None:
+            self.metric_collector.add_pod_cache_staleness_metric(self.staleness())
+
+    @staticmethod
+    def get_fields(pod):
+        """ The pod fields supported in field selectors.
+        """
+        return {
+            "metadata.name": pod.metadata.name,
+            "metadata.namespace": pod.metadata.namespace,
+            "spec.nodeName": pod.spec.node_name if pod.spec else None,
+            "status.phase": pod.status.phase if pod.status else None,
+        }
+
+    def list_pods(self, namespace="", selector=None, field_selector=None):
+        """ Returns the pods in a namespace (all namespaces for ""),
+            matching a label selector and a field selector.
+        """
+        self.report_staleness()
+        requirements = parse_selector(selector)
+        field_requirements = parse_selector(field_selector)
+        with self.lock:
+            items = list(self.store.items())
+        return [
+            pod for (ns, _), pod in sorted(items, key=lambda x: x[0])
+            if (not namespace or ns == namespace)
+            and match_requirements(requirements, pod.metadata.labels)
+            and (not field_requirements or match_fields(field_requirements, self.get_fields(pod)))
+        ]
+
+
+class DeploymentInformer(Informer):
+    """ Informer for all the deployments in the cluster.
+    """
+
+    def __init__(self, k8s_client, **kwargs):
+        Informer.__init__(self,
+            list_fn=k8s_client.client_appsv1api.list_deployment_for_all_namespaces,
+            kind="deployments",
+            **kwargs
+        )
+
+    def get(self, namespace, name):
+        with self.lock:
+            return self.store.get((namespace, name))
+
+
+class ScenarioInformer(Informer):
+    """ Informer for the scenario custom resources, in all namespaces.
+    """
+
+    def __init__(self, k8s_client, **kwargs):
+        Informer.__init__(self,
+            list_fn=functools.partial(
+                k8s_client.client_customObjectsApi.list_cluster_custom_object,
+                K8S_CRD_GROUP,
+                K8S_CRD_VERSION,
+                K8S_CRD_PLURAL,
+            ),
+            kind="scenarios",
+            **kwargs
+        )
+
+    def list_scenarios(self):
+        """ Returns the scenario custom resources, sorted by namespace/name.
+        """
+        with self.lock:
+            items = list(self.store.items())
+        return [scenario for _, scenario in sorted(items, key=lambda x: x[0])]
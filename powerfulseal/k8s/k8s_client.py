@@ -14,20 +14,53 @@
 # limitations under the License.
 
 
+import json
+import time
+
 from powerfulseal import makeLogger
 import kubernetes.client
 import kubernetes.config
 from kubernetes.client.rest import ApiException
+from .stream import stream_list
+from .deployment_cache import DeploymentSelectorCache
+from .selector import join_selectors
 
 K8S_CRD_GROUP = "powerfulseal.io"
 K8S_CRD_VERSION = "v1"
 K8S_CRD_PLURAL = "scenarios"
+K8S_CRD_NAME = "%s.%s" % (K8S_CRD_PLURAL, K8S_CRD_GROUP)
+
+DEFAULT_PAGE_SIZE = 500
+HTTP_STATUS_GONE = 410
+HTTP_STATUS_FORBIDDEN = 403
+HTTP_STATUS_NOT_FOUND = 404
+
+
+def object_key(obj):
+    """ The key objects are sorted by in a LIST (namespace/name),
+        for both models and raw dicts.
+    """
+    if isinstance(obj, dict):
+        metadata = obj.get("metadata", {})
+        return "%s/%s" % (metadata.get("namespace") or "", metadata.get("name"))
+    return "%s/%s" % (obj.metadata.namespace or "", obj.metadata.name)
+
+
+def get_expired_continue(e):
+    """ When a continue token expires, the API server might send back
+        a token to carry on with an inconsistent list.
+    """
+    try:
+        return json.loads(e.body)["metadata"]["continue"] or None
+    except Exception:
+        return None
 
 class K8sClient():
     """ Higher level Kubernetes client.
     """
 
-    def __init__(self, kube_config=None, logger=None):
+    def __init__(self, kube_config=None, page_size=DEFAULT_PAGE_SIZE,
+                 selector_ttl=60, crd_cache_ttl=300, logger=None):
         if isinstance(kube_config, str):
             kubernetes.config.load_kube_config(config_file=kube_config)
         elif isinstance(kube_config, dict):
@@ -37,6 +70,11 @@ class K8sClient():
             kubernetes.config.load_incluster_config()
 
         self.kube_config = kube_config
+        self.page_size = page_size
+        self.deployment_selectors = DeploymentSelectorCache(self, ttl=selector_ttl)
+        self.crd_cache_ttl = crd_cache_ttl
+        self._crd_exists = None
+        self._crd_checked = None
         self.client_corev1api = kubernetes.client.CoreV1Api()
         self.client_appsv1api = kubernetes.client.AppsV1Api()
         self.client_extensionsApi = kubernetes.client.ApiextensionsV1Api()
@@ -62,6 +100,71 @@ class K8sClient():
         if payload:
             return ",".join(self.make_selector(*item) for item in payload.items())
 
+    def get_deployment_selector(self, namespace, name):
+        """ Returns the label selector of a deployment, from the cache.
+        """
+        return self.deployment_selectors.get(namespace, name)
+
+    def paginate(self, list_page, key=object_key):
+        """ Generator over all the items of a LIST, fetched page by page
+            with limit/continue, so that only one page is held in memory.
+
+            list_page(limit, _continue) returns (items, get_continue),
+            key(item) the namespace/name key the items are sorted by.
+
+            If the continue token expires mid-list, carries on with the
+            inconsistent token sent back by the server, or restarts the list
+            and skips the items already returned (they come sorted by key).
+        """
+        token = None
+        last_key = None
+        skip_until = None
+        while True:
+            try:
+                items, get_continue = list_page(
+                    limit=self.page_size or None,
+                    _continue=token,
+                )
+                for item in items:
+                    item_key = key(item)
+                    if skip_until is not None and item_key <= skip_until:
+                        continue
+                    last_key = item_key
+                    yield item
+                token = get_continue()
+            except ApiException as e:
+                if e.status != HTTP_STATUS_GONE or token is None:
+                    raise
+                token = get_expired_continue(e)
+                if token is None:
+                    self.logger.warning("Continue token expired, restarting the list")
+                    skip_until = last_key
+                else:
+                    self.logger.warning("Continue token expired, continuing with an inconsistent list")
+                continue
+            if not token:
+                return
+
+    def paginate_models(self, list_fn, *args, **kwargs):
+        """ Paginates a list call returning a model (V1PodList etc).
+        """
+        def list_page(limit, _continue):
+            resp = list_fn(*args, limit=limit, _continue=_continue, **kwargs)
+            return resp.items, lambda: resp.metadata._continue
+        return self.paginate(list_page)
+
+    def paginate_raw(self, list_fn, *args, **kwargs):
+        """ Paginates a list call, decoding each page from raw JSON
+            as it streams in. Yields (dict, json text) for every item.
+        """
+        def list_page(limit, _continue):
+            resp = list_fn(*args, limit=limit, _continue=_continue,
+                _preload_content=False, **kwargs)
+            stream, items = stream_list(resp)
+            return items, lambda: stream.metadata.get("continue")
+        for item, raw in self.paginate(list_page, key=lambda item: object_key(item[0])):
+            yield item, raw
+
     def get_nodes_groups(self):
         """ Returns an inventory of nodes which form the Kubernetes cluster.
             Returns a dict of group name -> list of nodes.
@@ -98,10 +201,18 @@ class K8sClient():
         """
             https://github.com/kubernetes-incubator/client-python/blob/master/kubernetes/docs/
             CoreV1Api.md#list_namespace
+            Fetches all the pages; iter_namespaces streams them instead.
+        """
+        return list(self.iter_namespaces())
+
+    def iter_namespaces(self):
+        """
+            Same as list_namespaces, but yields the namespaces as the pages
+            come in (errors are raised while iterating).
         """
         try:
-            resp = self.client_corev1api.list_namespace()
-            return resp.items
+            for item in self.paginate_models(self.client_corev1api.list_namespace):
+                yield item
         except ApiException as e:
             self.logger.exception(e)
             raise
@@ -119,13 +230,23 @@ class K8sClient():
         """
             https://github.com/kubernetes-incubator/client-python/blob/master/kubernetes/docs/
             ExtensionsV1beta1Api.md#list_namespaced_deployment
+            Fetches all the pages; iter_deployments streams them instead.
+        """
+        return list(self.iter_deployments(namespace, labels=labels, selector=selector))
+
+    def iter_deployments(self, namespace, labels=None, selector=None):
+        """
+            Same as list_deployments, but yields the deployments as the pages
+            come in (errors are raised while iterating).
         """
         try:
             selector = self.selector_or_labels(labels, selector)
-            return self.client_appsv1api.list_namespaced_deployment(
+            for item in self.paginate_models(
+                self.client_appsv1api.list_namespaced_deployment,
                 namespace=namespace,
                 label_selector=selector,
-            ).items
+            ):
+                yield item
         except ApiException as e:
             self.logger.exception(e)
             raise
@@ -173,21 +294,54 @@ class K8sClient():
             self.logger.exception(e)
             raise
 
-    def list_pods(self, namespace, labels=None, deployment_name=None, selector=None):
+    def list_pods(self, namespace, labels=None, deployment_name=None, selector=None,
+                  field_selector=None):
         """
             https://github.com/kubernetes-incubator/client-python/blob/master/kubernetes/docs/
             CoreV1Api.md#list_namespaced_pod
-            If deployment_name is provided, it will ignore selector, and use the deployment's
+            If deployment_name is provided, the deployment's selector is used,
+            combined with the selector (if any)
+            The seal itself uses list_pods_raw; this returns V1Pod models,
+            as it always did, for custom drivers and scripts.
         """
         try:
             selector = self.selector_or_labels(labels, selector)
             if deployment_name:
-                deployment = self.get_deployment(namespace, deployment_name)
-                selector = self.dict_to_selector(deployment.spec.selector.match_labels)
-            return self.client_corev1api.list_namespaced_pod(
+                selector = join_selectors(
+                    self.get_deployment_selector(namespace, deployment_name),
+                    selector,
+                )
+            return list(self.paginate_models(
+                self.client_corev1api.list_namespaced_pod,
                 namespace=namespace,
                 label_selector=selector,
-            ).items
+                field_selector=field_selector,
+            ))
+        except ApiException as e:
+            self.logger.exception(e)
+            raise
+
+    def list_pods_raw(self, namespace, labels=None, deployment_name=None, selector=None,
+                      field_selector=None):
+        """
+            Same as list_pods, but skips the V1Pod deserialization: the raw JSON
+            response is decoded as it streams in.
+            Yields a (dict, json text) pair for every pod.
+        """
+        try:
+            selector = self.selector_or_labels(labels, selector)
+            if deployment_name:
+                selector = join_selectors(
+                    self.get_deployment_selector(namespace, deployment_name),
+                    selector,
+                )
+            for item in self.paginate_raw(
+                self.client_corev1api.list_namespaced_pod,
+                namespace=namespace,
+                label_selector=selector,
+                field_selector=field_selector,
+            ):
+                yield item
         except ApiException as e:
             self.logger.exception(e)
             raise
@@ -224,34 +378,53 @@ class K8sClient():
             self.logger.exception(e)
             raise
 
-    def get_scenarios(self, namespaces="", labels=None, selector=None):
+    def has_scenarios_crd(self):
+        """ Checks whether the scenarios CRD is installed. The answer is
+            cached for crd_cache_ttl seconds.
         """
-            https://github.com/kubernetes-incubator/client-python/blob/master/kubernetes/docs/
-            ExtensionsV1beta1Api.md#list_namespaced_deployment
+        now = time.monotonic()
+        if self._crd_checked is not None and now - self._crd_checked < self.crd_cache_ttl:
+            return self._crd_exists
+        try:
+            self.client_extensionsApi.read_custom_resource_definition(K8S_CRD_NAME)
+            exists = True
+        except ApiException as e:
+            if e.status != HTTP_STATUS_NOT_FOUND:
+                raise
+            exists = False
+        self._crd_exists, self._crd_checked = exists, now
+        return exists
+
+    def list_scenarios(self, namespaces=""):
+        """
+            https://github.com/kubernetes-client/python/blob/master/kubernetes/docs/
+            CustomObjectsApi.md#list_namespaced_custom_object
+            Returns the scenario custom resources (metadata and spec).
         """
         try:
-            crds = self.client_extensionsApi.list_custom_resource_definition().to_dict()['items']
-            crd = None
-            for x in crds:
-                if x['spec']['names']['plural'].lower() == K8S_CRD_PLURAL and \
-                        x['spec']['group'].lower() == K8S_CRD_GROUP:
-                    crd = x
-            if crd == None:
+            if not self.has_scenarios_crd():
                 return []
 
-            scenarios = self.client_customObjectsApi.list_namespaced_custom_object(
-                K8S_CRD_GROUP,
-                K8S_CRD_VERSION,
-                namespaces,
-                K8S_CRD_PLURAL)
-            out = []
-            for scenario in scenarios['items']:
-                out.append(scenario['spec'])
+            def list_page(limit, _continue):
+                resp = self.client_customObjectsApi.list_namespaced_custom_object(
+                    K8S_CRD_GROUP,
+                    K8S_CRD_VERSION,
+                    namespaces,
+                    K8S_CRD_PLURAL,
+                    limit=limit,
+                    _continue=_continue)
+                return resp['items'], lambda: resp.get('metadata', {}).get('continue')
+            out = list(self.paginate(list_page))
             self.logger.debug("Read %d scenarios from CRDS", len(out))
             return out
         except ApiException as e:
-            if e.status == 403:
+            if e.status == HTTP_STATUS_FORBIDDEN:
                 self.logger.info("No permission to list powerfulseal CRDs. Ignoring.")
                 return []
             self.logger.exception(e)
             raise
+
+    def get_scenarios(self, namespaces="", labels=None, selector=None):
+        """ Returns the specs of the scenario custom resources.
+        """
+        return [scenario['spec'] for scenario in self.list_scenarios(namespaces)]
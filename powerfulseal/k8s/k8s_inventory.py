@@ -14,8 +14,11 @@
 # limitations under the License.
 
 from powerfulseal import makeLogger
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import threading
 from .pod import Pod
+from .selector import join_selectors
 import re
 
 
@@ -27,15 +30,81 @@ def get_status(status):
     except:
         return status.phase
 
+
+def get_raw_status(status):
+    # same as get_status, for a pod decoded from raw JSON
+    try:
+        reasons = [x["state"]["waiting"]["reason"] for x in status["containerStatuses"]]
+        return ','.join(reasons)
+    except:
+        return status.get("phase")
+
+
+def make_pod_from_dict(num, item, raw=None):
+    """ Translates a pod decoded from raw JSON into the internal Pod
+        representation, keeping only the fields we use.
+    """
+    metadata = item.get("metadata", {})
+    status = item.get("status", {})
+    spec = item.get("spec", {})
+    container_statuses = status.get("containerStatuses") or []
+    return Pod(
+        num=num,
+        name=metadata.get("name"),
+        namespace=metadata.get("namespace"),
+        uid=metadata.get("uid"),
+        host_ip=status.get("hostIP"),
+        ip=status.get("podIP"),
+        container_ids=[x.get("containerID") for x in container_statuses],
+        restart_count=sum(x.get("restartCount", 0) for x in container_statuses),
+        state=get_raw_status(status),
+        labels=metadata.get("labels"),
+        annotations=metadata.get("annotations"),
+        node_name=spec.get("nodeName"),
+        raw=raw,
+    )
+
+
+def make_pod(num, item):
+    """ Translates a V1Pod into the internal Pod representation.
+    """
+    container_ids = []
+    restart_count = []
+    if item.status.container_statuses:
+        for status in item.status.container_statuses:
+            container_ids.append(status.container_id)
+            restart_count.append(status.restart_count)
+    return Pod(
+        num=num,
+        name=item.metadata.name,
+        namespace=item.metadata.namespace,
+        uid=item.metadata.uid,
+        host_ip=item.status.host_ip,
+        ip=item.status.pod_ip,
+        container_ids=container_ids,
+        restart_count=sum(restart_count),
+        state=get_status(item.status),
+        labels=item.metadata.labels,
+        annotations=item.metadata.annotations,
+        node_name=item.spec.node_name if item.spec else None,
+        meta=item,
+    )
+
+
 class K8sInventory():
     """ Kubernetes inventory - deal with namespaces, deployments and pods.
         Also manages cache.
     """
 
-    def __init__(self, k8s_client, logger=None):
+    def __init__(self, k8s_client, pod_informer=None, max_workers=8,
+                 all_namespaces_threshold=20, logger=None):
         self.k8s_client = k8s_client
+        self.pod_informer = pod_informer
+        self.max_workers = max_workers
+        self.all_namespaces_threshold = all_namespaces_threshold
         self._cache_namespaces = []
         self._cache_last = None
+        self._cache_lock = threading.Lock()
         self.logger = logger or makeLogger(__name__)
         self.last_pods = []
 
@@ -77,78 +146,129 @@ class K8sInventory():
         namespaces = sorted(list(set(namespaces)))
         return namespaces
 
-    def find_namespaces(self):
-        """ Returns all namespaces.
+    def plan_namespaces(self, namespaces):
+        """ Decides how to list objects in a set of namespaces: one LIST
+            per namespace, or a single all-namespaces LIST filtered locally,
+            once there are more namespaces than the threshold.
+            Returns (namespaces to list, namespaces to keep or None).
         """
-        if self._cache_last is not None and self.is_fresh(self._cache_last):
-            self.logger.debug("Using cached namespaces")
-            return self._cache_namespaces
-        self.logger.debug("Reading kubernetes namespaces")
-        namespaces = []
-        try:
-            for item in self.k8s_client.list_namespaces():
-                namespaces.append(item.metadata.name)
-        except Exception as e:
-            self.logger.exception(e)
-        self._cache_namespaces = namespaces
-        self._cache_last = datetime.now()
-        return namespaces
+        if "" in namespaces or len(namespaces) <= self.all_namespaces_threshold:
+            return namespaces, None
+        self.logger.debug("Listing %d namespaces with a single LIST", len(namespaces))
+        return [""], namespaces
 
-    def find_deployments(self, namespace=None, labels=None):
-        """ Find deployments for a namespace (default to "default" namespace).
+    def map_namespaces(self, fn, namespaces):
+        """ Calls fn(namespace) for every namespace on a bounded thread pool,
+            and concatenates the results in the order of the namespaces.
+            A namespace failing is logged, and doesn't affect the others.
         """
-        deployments = []
-        for ns in self.preprocess_namespace(namespace):
+        def safe_fn(namespace):
             try:
-                for item in self.k8s_client.list_deployments(
-                    namespace=ns,
-                    labels=labels,
-                ):
-                    deployments.append(item.metadata.name)
+                return list(fn(namespace))
             except Exception as e:
                 self.logger.exception(e)
-        return deployments
+                return []
+        if len(namespaces) <= 1 or self.max_workers <= 1:
+            results = [safe_fn(ns) for ns in namespaces]
+        else:
+            workers = min(self.max_workers, len(namespaces))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(safe_fn, namespaces))
+        return [item for result in results for item in result]
 
-    def find_pods(self, namespace, selector=None, deployment_name=None):
-        """ Find pods in a namespace, for a deployment or selector.
+    @staticmethod
+    def keep_namespaces(items, namespaces, get_namespace):
+        """ Filters the result of an all-namespaces LIST down to the planned
+            namespaces, ordered like per-namespace LISTs would be.
+        """
+        order = dict((ns, i) for i, ns in enumerate(namespaces))
+        items = [item for item in items if get_namespace(item) in order]
+        return sorted(items, key=lambda item: order[get_namespace(item)])
+
+    def find_namespaces(self):
+        """ Returns all namespaces.
         """
-        pods = []
-        for ns in self.preprocess_namespace(namespace):
+        with self._cache_lock:
+            if self._cache_last is not None and self.is_fresh(self._cache_last):
+                self.logger.debug("Using cached namespaces")
+                return self._cache_namespaces
+            self.logger.debug("Reading kubernetes namespaces")
+            namespaces = []
             try:
-                for pod in self.k8s_client.list_pods(
-                    namespace=ns,
-                    selector=selector,
-                    deployment_name=deployment_name,
-                ):
-                    pods.append(pod)
+                for item in self.k8s_client.list_namespaces():
+                    namespaces.append(item.metadata.name)
             except Exception as e:
                 self.logger.exception(e)
-        pod_objects = []
-        if pods is not None:
-            for i, item in enumerate(pods):
-                        container_ids = []
-                        restart_count = []
-                        if item.status.container_statuses:
-                            for status in item.status.container_statuses:
-                                container_ids.append(status.container_id)
-                                restart_count.append(status.restart_count)
-
-                        pod_objects.append(Pod(
-                            num=i,
-                            name=item.metadata.name,
-                            namespace=item.metadata.namespace,
-                            uid=item.metadata.uid,
-                            host_ip=item.status.host_ip,
-                            ip=item.status.pod_ip,
-                            container_ids=container_ids,
-                            restart_count=sum(restart_count),
-                            state=get_status(item.status),
-                            labels=item.metadata.labels,
-                            annotations=item.metadata.annotations,
-                            meta=item,
-                        ))
-        self.last_pods = pod_objects
-        return pod_objects
+            self._cache_namespaces = namespaces
+            self._cache_last = datetime.now()
+            return namespaces
+
+    def find_deployments(self, namespace=None, labels=None):
+        """ Find deployments for a namespace (default to "default" namespace).
+        """
+        namespaces, keep = self.plan_namespaces(self.preprocess_namespace(namespace))
+        items = self.map_namespaces(
+            lambda ns: self.k8s_client.list_deployments(namespace=ns, labels=labels),
+            namespaces,
+        )
+        if keep is not None:
+            items = self.keep_namespaces(items, keep, lambda item: item.metadata.namespace)
+        return [item.metadata.name for item in items]
+
+    def list_pods(self, namespace, selector=None, deployment_name=None, field_selector=None):
+        """ Lists pods in a single namespace, from the pod informer if it's
+            available and fresh enough, or from the API otherwise.
+        """
+        if self.pod_informer is not None and self.pod_informer.is_usable():
+            if deployment_name:
+                selector = join_selectors(
+                    self.k8s_client.get_deployment_selector(namespace, deployment_name),
+                    selector,
+                )
+            return [
+                make_pod(None, item)
+                for item in self.pod_informer.list_pods(
+                    namespace=namespace,
+                    selector=selector,
+                    field_selector=field_selector,
+                )
+            ]
+        if self.pod_informer is not None:
+            self.logger.warning("Pod cache not usable, listing pods from the API")
+        return [
+            make_pod_from_dict(None, item, raw)
+            for item, raw in self.k8s_client.list_pods_raw(
+                namespace=namespace,
+                selector=selector,
+                deployment_name=deployment_name,
+                field_selector=field_selector,
+            )
+        ]
+
+    def find_pods(self, namespace, selector=None, deployment_name=None, field_selector=None):
+        """ Find pods in a namespace, for a deployment or selector,
+            optionally narrowed down by a field selector.
+        """
+        namespaces = self.preprocess_namespace(namespace)
+        keep = None
+        # a deployment is looked up by name in every namespace
+        if not deployment_name:
+            namespaces, keep = self.plan_namespaces(namespaces)
+        pods = self.map_namespaces(
+            lambda ns: self.list_pods(
+                namespace=ns,
+                selector=selector,
+                deployment_name=deployment_name,
+                field_selector=field_selector,
+            ),
+            namespaces,
+        )
+        if keep is not None:
+            pods = self.keep_namespaces(pods, keep, lambda pod: pod.namespace)
+        for i, pod in enumerate(pods):
+            pod.num = i
+        self.last_pods = pods
+        return pods
 
     def get_all_pods(self):
         """
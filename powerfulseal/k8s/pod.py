@@ -13,28 +13,113 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import sys
+import weakref
+from types import SimpleNamespace
 
+import kubernetes.client
+
+_api_client = None
+
+
+class FrozenDict(dict):
+    """ Read-only dict, so that it can be safely shared between pods.
+    """
+    __slots__ = ("__weakref__",)
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("FrozenDict is read-only")
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+_shared_dicts = weakref.WeakValueDictionary()
+EMPTY = FrozenDict()
+
+
+def share_dict(payload):
+    """ Returns a read-only copy of a labels/annotations dict, with interned
+        strings. Pods with identical labels (like all the replicas of a
+        deployment) end up sharing the same instance.
+    """
+    if not payload:
+        return EMPTY
+    if isinstance(payload, FrozenDict):
+        return payload
+    key = tuple(sorted(
+        (sys.intern(k), sys.intern(v) if isinstance(v, str) else v)
+        for k, v in payload.items()
+    ))
+    shared = _shared_dicts.get(key)
+    if shared is None:
+        shared = FrozenDict(key)
+        _shared_dicts[key] = shared
+    return shared
+
+
+def intern(value):
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+def deserialize_pod(raw):
+    """ Builds a V1Pod model from its raw JSON text.
+    """
+    global _api_client
+    if _api_client is None:
+        _api_client = kubernetes.client.ApiClient()
+    return _api_client.deserialize(SimpleNamespace(data=raw), "V1Pod")
 
 
 class Pod():
     """ Internal representation of a pod. Use to easily manipulate them
         internally.
+
+        Uses slots, and shares namespaces, states, host IPs and label maps
+        between pods, to keep the memory footprint low on large clusters.
     """
+    __slots__ = (
+        "name", "namespace", "num", "uid", "host_ip", "ip", "container_ids",
+        "restart_count", "state", "labels", "annotations", "node_name", "_meta", "raw",
+    )
 
     def __init__(self, name, namespace, num=None, uid=None, host_ip=None, ip=None,
-                container_ids=None, restart_count=None, state=None, labels=None, annotations=None, meta=None):
+                container_ids=None, restart_count=None, state=None, labels=None, annotations=None, meta=None,
+                raw=None, node_name=None):
         self.name = name
-        self.namespace = namespace
+        self.namespace = intern(namespace)
         self.num = num
         self.uid = uid
-        self.host_ip = host_ip
+        self.host_ip = intern(host_ip)
         self.ip = ip
         self.container_ids = container_ids or []
         self.restart_count = restart_count or 0
-        self.state = state
-        self.labels = labels or dict()
-        self.annotations = annotations or dict()
-        self.meta = meta
+        self.state = intern(state)
+        self.labels = share_dict(labels)
+        self.annotations = share_dict(annotations)
+        self.node_name = intern(node_name)
+        self._meta = meta
+        self.raw = raw
+
+    @property
+    def meta(self):
+        """ The full V1Pod. Pods decoded from raw JSON only build it
+            the first time it's accessed.
+        """
+        if self._meta is None and self.raw is not None:
+            self._meta = deserialize_pod(self.raw)
+            self.raw = None
+        return self._meta
+
+    @meta.setter
+    def meta(self, value):
+        self._meta = value
+        self.raw = None
 
     def __str__(self):
         return (
@@ -0,0 +1,103 @@
+# Copyright 2017 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+
+# key in (a,b) / key notin (a,b)
+SET_REQUIREMENT = re.compile(r"^\s*([^\s!=]+)\s+(in|notin)\s+\((.*)\)\s*$")
+
+
+def split_selector(selector):
+    """ Splits a selector on top-level commas (ignoring the ones in sets).
+    """
+    parts = []
+    depth = 0
+    current = ""
+    for char in selector:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        if char == "," and depth == 0:
+            parts.append(current)
+            current = ""
+        else:
+            current += char
+    parts.append(current)
+    return [part.strip() for part in parts if part.strip()]
+
+
+def join_selectors(*selectors):
+    """ Combines selectors (all of them need to match), skipping empty ones.
+    """
+    return ",".join(selector for selector in selectors if selector)
+
+
+def parse_selector(selector):
+    """ Parses a kubernetes label selector into a list of
+        (key, operator, values) requirements.
+        https://kubernetes.io/docs/concepts/overview/working-with-objects/labels/
+    """
+    requirements = []
+    for part in split_selector(selector or ""):
+        match = SET_REQUIREMENT.match(part)
+        if match:
+            key, op, values = match.groups()
+            values = set(v.strip() for v in values.split(",") if v.strip())
+            requirements.append((key, op, values))
+        elif "!=" in part:
+            key, value = part.split("!=", 1)
+            requirements.append((key.strip(), "!=", {value.strip()}))
+        elif "==" in part:
+            key, value = part.split("==", 1)
+            requirements.append((key.strip(), "=", {value.strip()}))
+        elif "=" in part:
+            key, value = part.split("=", 1)
+            requirements.append((key.strip(), "=", {value.strip()}))
+        elif part.startswith("!"):
+            requirements.append((part[1:].strip(), "!exists", set()))
+        else:
+            requirements.append((part, "exists", set()))
+    return requirements
+
+
+def match_requirements(requirements, labels):
+    """ Checks whether a set of labels satisfies all the requirements.
+    """
+    labels = labels or {}
+    for key, op, values in requirements:
+        present = key in labels
+        if op == "exists" and not present:
+            return False
+        if op == "!exists" and present:
+            return False
+        if op in ("=", "in") and (not present or labels[key] not in values):
+            return False
+        if op in ("!=", "notin") and present and labels[key] in values:
+            return False
+    return True
+
+
+def match_selector(selector, labels):
+    """ Checks whether a set of labels satisfies a label selector string.
+    """
+    return match_requirements(parse_selector(selector), labels)
+
+
+def match_fields(requirements, fields):
+    """ Checks whether an object's fields (a dict of field path -> value)
+        satisfy a parsed field selector.
+    """
+    fields = dict((key, "" if value is None else value) for key, value in fields.items())
+    return match_requirements(requirements, fields)
@@ -0,0 +1,129 @@
+# Copyright 2017 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import codecs
+import json
+import re
+
+WHITESPACE = re.compile(r"\s*")
+DECODER = json.JSONDecoder()
+CHUNK_SIZE = 64 * 1024
+
+
+class ListStream():
+    """ Incrementally decodes a Kubernetes list response
+        (`{"metadata": {...}, "items": [...]}`) from a stream of byte chunks.
+
+        Iterating yields a (dict, json text) pair for every item, as soon as
+        it's been received, so that only one item at a time is held in memory.
+        Other top-level keys (like `metadata`) are kept in `fields`.
+    """
+
+    def __init__(self, chunks, key="items"):
+        self.chunks = iter(chunks)
+        self.key = key
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.fields = dict()
+
+    @property
+    def metadata(self):
+        return self.fields.get("metadata", {})
+
+    def fill(self):
+        """ Reads the next chunk into the buffer, dropping what was consumed.
+            Returns False if there is nothing more to read.
+        """
+        if self.eof:
+            return False
+        try:
+            text = self.decoder.decode(next(self.chunks))
+        except StopIteration:
+            self.eof = True
+            text = self.decoder.decode(b"", final=True)
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """ Skips whitespace and returns the next character.
+        """
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                raise ValueError("Unexpected end of the JSON stream")
+
+    def expect(self, chars):
+        char = self.peek()
+        if char not in chars:
+            raise ValueError("Expected one of %r, got %r" % (chars, char))
+        self.pos += 1
+        return char
+
+    def decode_value(self):
+        """ Decodes the next JSON value, reading more chunks if needed.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = DECODER.raw_decode(self.buffer, self.pos)
+                # a number at the very end of the buffer might not be complete
+                if end < len(self.buffer) or self.eof:
+                    start, self.pos = self.pos, end
+                    return value, self.buffer[start:end]
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.fill()
+
+    def __iter__(self):
+        self.expect("{")
+        if self.peek() == "}":
+            return
+        while True:
+            key, _ = self.decode_value()
+            self.expect(":")
+            if key == self.key:
+                self.expect("[")
+                if self.peek() == "]":
+                    self.pos += 1
+                else:
+                    while True:
+                        yield self.decode_value()
+                        if self.expect(",]") == "]":
+                            break
+            else:
+                self.fields[key], _ = self.decode_value()
+            if self.expect(",}") == "}":
+                return
+
+
+def stream_list(resp, chunk_size=CHUNK_SIZE):
+    """ Streams the items of a list response requested with
+        `_preload_content=False`. Returns the ListStream (its metadata is
+        available once the items were read) and a generator of its items,
+        releasing the connection at the end.
+    """
+    stream = ListStream(resp.stream(chunk_size))
+    def items():
+        try:
+            for item in stream:
+                yield item
+        finally:
+            resp.release_conn()
+    return stream, items()
@@ -62,3 +62,39 @@ class AbstractCollector(ABC):
     @abstractmethod
     def add_scenario_counter_metric(self, name, result):
         pass  # pragma: nocover
+
+    @abstractmethod
+    def add_pod_cache_staleness_metric(self, seconds):
+        pass  # pragma: nocover
+
+    @abstractmethod
+    def add_pod_cache_resync_metric(self, reason):
+        pass  # pragma: nocover
+
+    @abstractmethod
+    def add_api_calls_saved_metric(self, scenario, count):
+        pass  # pragma: nocover
+
+    @abstractmethod
+    def add_policy_cache_metric(self, hit):
+        pass  # pragma: nocover
+
+    @abstractmethod
+    def add_invalid_scenarios_metric(self, count):
+        pass  # pragma: nocover
+
+    @abstractmethod
+    def add_scheduling_drift_metric(self, scenario, seconds):
+        pass  # pragma: nocover
+
+    @abstractmethod
+    def add_step_attempts_metric(self, scenario, step, attempts):
+        pass  # pragma: nocover
+
+    @abstractmethod
+    def add_wait_for_metric(self, scenario, condition, seconds, met):
+        pass  # pragma: nocover
+
+    @abstractmethod
+    def add_cleanup_metric(self, scenario, action, seconds, result):
+        pass  # pragma: nocover
@@ -16,6 +16,22 @@ FILTERED_TO_EMPTY_SET_METRIC_NAME = 'powerfulseal.empty_filter_total'
 PROBABILITY_FILTER_NOT_PASSED_METRIC_NAME = 'powerfulseal.probability_filter_not_passed_total'
 MATCHED_TO_EMPTY_SET_METRIC_NAME = 'powerfulseal.empty_match_total'
 MATCHED_TO_EMPTY_SET = ['source:']
+POD_CACHE_STALENESS_METRIC_NAME = 'powerfulseal.pod_cache_staleness_seconds'
+POD_CACHE_RESYNCS_METRIC_NAME = 'powerfulseal.pod_cache_resyncs_total'
+POD_CACHE_RESYNCS = ['reason:']
+API_CALLS_SAVED_METRIC_NAME = 'powerfulseal.api_calls_saved_total'
+API_CALLS_SAVED = ['scenario:']
+POLICY_CACHE_METRIC_NAME = 'powerfulseal.policy_cache_total'
+POLICY_CACHE = ['result:']
+INVALID_SCENARIOS_METRIC_NAME = 'powerfulseal.invalid_scenarios'
+SCHEDULING_DRIFT_METRIC_NAME = 'powerfulseal.scheduling_drift_seconds'
+SCHEDULING_DRIFT = ['scenario:']
+STEP_ATTEMPTS_METRIC_NAME = 'powerfulseal.step_attempts'
+STEP_ATTEMPTS = ['scenario:', 'step:']
+WAIT_FOR_METRIC_NAME = 'powerfulseal.wait_for_seconds'
+WAIT_FOR = ['scenario:', 'condition:', 'met:']
+CLEANUP_METRIC_NAME = 'powerfulseal.cleanup_seconds'
+CLEANUP = ['scenario:', 'action:', 'result:']
 
 
 def name_tags(names, tags):
@@ -61,3 +77,37 @@ class DatadogCollector(AbstractCollector):
         res = "success" if result else "fail"
         statsd.increment(SCENARIO_RUNS_METRIC_NAME, tags=name_tags(
             SCENARIO_RUNS, [name, res]))
+
+    def add_pod_cache_staleness_metric(self, seconds):
+        statsd.gauge(POD_CACHE_STALENESS_METRIC_NAME, seconds)
+
+    def add_pod_cache_resync_metric(self, reason):
+        statsd.increment(POD_CACHE_RESYNCS_METRIC_NAME, tags=name_tags(
+            POD_CACHE_RESYNCS, [reason]))
+
+    def add_api_calls_saved_metric(self, scenario, count):
+        statsd.increment(API_CALLS_SAVED_METRIC_NAME, count, tags=name_tags(
+            API_CALLS_SAVED, [scenario]))
+
+    def add_policy_cache_metric(self, hit):
+        statsd.increment(POLICY_CACHE_METRIC_NAME, tags=name_tags(
+            POLICY_CACHE, ["hit" if hit else "miss"]))
+
+    def add_invalid_scenarios_metric(self, count):
+        statsd.gauge(INVALID_SCENARIOS_METRIC_NAME, count)
+
+    def add_scheduling_drift_metric(self, scenario, seconds):
+        statsd.histogram(SCHEDULING_DRIFT_METRIC_NAME, seconds, tags=name_tags(
+            SCHEDULING_DRIFT, [scenario]))
+
+    def add_step_attempts_metric(self, scenario, step, attempts):
+        statsd.histogram(STEP_ATTEMPTS_METRIC_NAME, attempts, tags=name_tags(
+            STEP_ATTEMPTS, [scenario, step]))
+
+    def add_wait_for_metric(self, scenario, condition, seconds, met):
+        statsd.histogram(WAIT_FOR_METRIC_NAME, seconds, tags=name_tags(
+            WAIT_FOR, [scenario, condition, str(met).lower()]))
+
+    def add_cleanup_metric(self, scenario, action, seconds, result):
+        statsd.histogram(CLEANUP_METRIC_NAME, seconds, tags=name_tags(
+            CLEANUP, [scenario, action, result]))
@@ -13,7 +13,7 @@
 # limitations under the License.
 
 
-from prometheus_client import Counter
+from prometheus_client import Counter, Gauge, Histogram
 
 from powerfulseal.metriccollectors import AbstractCollector
 from powerfulseal.metriccollectors.collector import NODE_SOURCE, POD_SOURCE
@@ -59,6 +59,52 @@ SCENARIO_RUNS_TOTAL = Counter(SCENARIO_RUNS_METRIC_NAME,
                            'Counter of runs of scenarios (both success and failure)',
                            ['name', 'result'])
 
+POD_CACHE_STALENESS_METRIC_NAME = 'seal_pod_cache_staleness_seconds'
+POD_CACHE_STALENESS = Gauge(POD_CACHE_STALENESS_METRIC_NAME,
+                            'Seconds since the pod cache last heard from the API server')
+
+POD_CACHE_RESYNCS_METRIC_NAME = 'seal_pod_cache_resyncs_total'
+POD_CACHE_RESYNCS = Counter(POD_CACHE_RESYNCS_METRIC_NAME,
+                            'Number of full relists of the pod cache',
+                            ['reason'])
+
+API_CALLS_SAVED_METRIC_NAME = 'seal_api_calls_saved_total'
+API_CALLS_SAVED = Counter(API_CALLS_SAVED_METRIC_NAME,
+                          'Number of API calls saved by skipping matching, when filters rejected a run early',
+                          ['scenario'])
+
+POLICY_CACHE_METRIC_NAME = 'seal_policy_cache_total'
+POLICY_CACHE = Counter(POLICY_CACHE_METRIC_NAME,
+                       'Number of policy reads served from the cache (hit) or read and validated again (miss)',
+                       ['result'])
+
+INVALID_SCENARIOS_METRIC_NAME = 'seal_invalid_scenarios'
+INVALID_SCENARIOS = Gauge(INVALID_SCENARIOS_METRIC_NAME,
+                          'Number of scenario custom resources skipped because they are not valid')
+
+SCHEDULING_DRIFT_METRIC_NAME = 'seal_scheduling_drift_seconds'
+SCHEDULING_DRIFT = Histogram(SCHEDULING_DRIFT_METRIC_NAME,
+                             'Delay between the planned and the actual start of scheduled scenarios',
+                             ['scenario'])
+
+STEP_ATTEMPTS_METRIC_NAME = 'seal_step_attempts'
+STEP_ATTEMPTS = Histogram(STEP_ATTEMPTS_METRIC_NAME,
+                          'Number of attempts of steps with retries',
+                          ['scenario', 'step'],
+                          buckets=(1, 2, 3, 5, 8, 13, 21, float("inf")))
+
+WAIT_FOR_METRIC_NAME = 'seal_wait_for_seconds'
+WAIT_FOR = Histogram(WAIT_FOR_METRIC_NAME,
+                     'Time waited by waitFor steps, until their condition held or they timed out',
+                     ['scenario', 'condition', 'met'],
+                     buckets=(1, 5, 10, 30, 60, 120, 300, 600, float("inf")))
+
+CLEANUP_METRIC_NAME = 'seal_cleanup_seconds'
+CLEANUP = Histogram(CLEANUP_METRIC_NAME,
+                    'Time taken by cleanup actions',
+                    ['scenario', 'action', 'result'],
+                    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, float("inf")))
+
 
 class PrometheusCollector(AbstractCollector):
     def __init__(self):
@@ -95,3 +141,30 @@ class PrometheusCollector(AbstractCollector):
     def add_scenario_counter_metric(self, name, result):
         res = "success" if result else "fail"
         SCENARIO_RUNS_TOTAL.labels(name, res).inc()
+
+    def add_pod_cache_staleness_metric(self, seconds):
+        POD_CACHE_STALENESS.set(seconds)
+
+    def add_pod_cache_resync_metric(self, reason):
+        POD_CACHE_RESYNCS.labels(reason).inc()
+
+    def add_api_calls_saved_metric(self, scenario, count):
+        API_CALLS_SAVED.labels(scenario).inc(count)
+
+    def add_policy_cache_metric(self, hit):
+        POLICY_CACHE.labels("hit" if hit else "miss").inc()
+
+    def add_invalid_scenarios_metric(self, count):
+        INVALID_SCENARIOS.set(count)
+
+    def add_scheduling_drift_metric(self, scenario, seconds):
+        SCHEDULING_DRIFT.labels(scenario).observe(seconds)
+
+    def add_step_attempts_metric(self, scenario, step, attempts):
+        STEP_ATTEMPTS.labels(scenario, step).observe(attempts)
+
+    def add_wait_for_metric(self, scenario, condition, seconds, met):
+        WAIT_FOR.labels(scenario, condition, str(met).lower()).observe(seconds)
+
+    def add_cleanup_metric(self, scenario, action, seconds, result):
+        CLEANUP.labels(scenario, action, result).observe(seconds)
@@ -51,3 +51,32 @@ class StdoutCollector(AbstractCollector):
 
     def add_scenario_counter_metric(self, name, result):
         logger.debug("Scenario %s result: %s", name, result)
+
+    def add_pod_cache_staleness_metric(self, seconds):
+        logger.debug("Pod cache staleness: %s seconds", seconds)
+
+    def add_pod_cache_resync_metric(self, reason):
+        logger.debug("Pod cache resynced - reason: %s", reason)
+
+    def add_api_calls_saved_metric(self, scenario, count):
+        logger.debug("Scenario %s skipped matching - API calls saved: %s", scenario, count)
+
+    def add_policy_cache_metric(self, hit):
+        logger.debug("Policy cache %s", "hit" if hit else "miss")
+
+    def add_invalid_scenarios_metric(self, count):
+        logger.debug("Invalid scenario custom resources skipped: %s", count)
+
+    def add_scheduling_drift_metric(self, scenario, seconds):
+        logger.debug("Scenario %s started %s seconds after its planned time", scenario, seconds)
+
+    def add_step_attempts_metric(self, scenario, step, attempts):
+        logger.debug("Step %s of scenario %s took %s attempts", step, scenario, attempts)
+
+    def add_wait_for_metric(self, scenario, condition, seconds, met):
+        logger.debug("Scenario %s waited %s seconds for %s (%s)", scenario, seconds,
+            condition, "met" if met else "timed out")
+
+    def add_cleanup_metric(self, scenario, action, seconds, result):
+        logger.debug("Cleanup %s of scenario %s took %s seconds (%s)", action, scenario,
+            seconds, result)
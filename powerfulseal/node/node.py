@@ -14,6 +14,7 @@
 # limitations under the License.
 
 
+import sys
 from enum import IntEnum
 
 
@@ -33,7 +34,7 @@ class Node(object):
     """
         Basic class representing a machine in the cluster
     """
-
+    __slots__ = ("id", "name", "ip", "extIp", "az", "groups", "no", "state")
 
     def __init__(self, id, name=None, ip=None, extIp=None, az=None,
             groups=None, no=None, state=None):
@@ -41,7 +42,7 @@ class Node(object):
         self.name = name
         self.ip = ip
         self.extIp = extIp
-        self.az = az
+        self.az = sys.intern(az) if isinstance(az, str) else az
         self.groups = groups or []
         self.no = no
         if state is None:
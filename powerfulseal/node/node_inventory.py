@@ -16,6 +16,7 @@
 
 from powerfulseal import makeLogger
 import ipaddress
+import threading
 from .node import Node, NodeState
 
 class NodeInventory():
@@ -29,6 +30,8 @@ class NodeInventory():
         self.nodes_by_id = {}
         self.nodes_by_ip = {}
         self.azs = set()
+        # scenarios running concurrently can sync at the same time
+        self.lock = threading.Lock()
 
     def get_all_nodes(self, sort_key="no"):
         nodes = self.nodes_by_id.values()
@@ -94,24 +97,29 @@ class NodeInventory():
         """
             Update the nodes based on the values returned from the driver
         """
+        with self.lock:
+            self._sync(driver)
+
+    def _sync(self, driver=None):
         self.logger.debug("Sync Nodes")
         driver = driver or self.driver
         driver.sync()
         counter = 0
-        self.groups = {}
-        self.nodes_by_id = {}
-        self.nodes_by_ip = {}
-        self.azs = set()
+        # build the new state aside, so that readers never see it half-done
+        groups = {}
+        nodes_by_id = {}
+        nodes_by_ip = {}
+        azs = set()
 
         for group, ips in sorted(self.local_ips.items()):
-            self.groups[group] = []
+            groups[group] = []
 
             # different groups can have the same IPs,
             # so we need to match to the same nodes
             for ip in ips:
                 self.logger.debug("IP processing: %s", ip)
                 # see if we have a matching node in the cached list of nodes
-                node = self.nodes_by_ip.get(ip)
+                node = nodes_by_ip.get(ip)
                 if node is None:
                     # node is not in cached list (or the list is empty), check the clouddriver
                     node = driver.get_by_ip(ip)
@@ -126,11 +134,11 @@ class NodeInventory():
                         self.logger.debug("Couldn't match to any cloud node: %s", ip)
                     continue
 
-                self.nodes_by_id[node.id] = node
-                self.nodes_by_ip[ip] = node
-                self.groups[group].append(node)
+                nodes_by_id[node.id] = node
+                nodes_by_ip[ip] = node
+                groups[group].append(node)
                 node.groups.append(group)
-                self.azs.add(node.az)
+                azs.add(node.az)
 
                 self.logger.debug("Node added: %s", node)
 
@@ -138,6 +146,11 @@ class NodeInventory():
                 node.no = counter
                 counter += 1
 
+        self.groups = groups
+        self.nodes_by_id = nodes_by_id
+        self.nodes_by_ip = nodes_by_ip
+        self.azs = azs
+
     def get_azs(self):
         return sorted(list(self.azs))
 
@@ -15,3 +15,4 @@
 
 
 from .policy_runner import PolicyRunner
+from .waiter import Waiter
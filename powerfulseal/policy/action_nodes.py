@@ -15,6 +15,7 @@
 
 from powerfulseal.metriccollectors.collector import NODE_SOURCE
 from .action_nodes_pods import ActionNodesPods
+from .filter_pipeline import compile_property
 
 
 class ActionNodes(ActionNodesPods):
@@ -24,8 +25,9 @@ class ActionNodes(ActionNodesPods):
     """
 
     def __init__(self, name, schema, inventory, driver,
-                 executor, logger=None, metric_collector=None):
-        ActionNodesPods.__init__(self, name, schema, logger=logger, metric_collector=metric_collector)
+                 executor, logger=None, metric_collector=None, waiter=None):
+        ActionNodesPods.__init__(self, name, schema, logger=logger,
+            metric_collector=metric_collector, waiter=waiter)
         self.inventory = inventory
         self.driver = driver
         self.executor = executor
@@ -41,64 +43,74 @@ class ActionNodes(ActionNodesPods):
         """
         self.inventory.sync()
         selected_nodes = set()
-        criteria = self.schema.get("matches", [])
+        matchers = [
+            compile_property(criterion.get("property"))
+            for criterion in self.schema.get("matches", [])
+            if criterion.get("property")
+        ]
         for node in self.inventory.find_nodes():
-            for criterion in criteria:
-                match = criterion.get("property")
-                if self.match_property(node, match):
+            for matcher in matchers:
+                if matcher(node):
                     self.logger.debug("Matching %r", node)
                     selected_nodes.add(node)
         if len(selected_nodes) == 0:
             self.metric_collector.add_matched_to_empty_set_metric(NODE_SOURCE)
         return list(selected_nodes)
 
+    def count_match_calls(self):
+        """ Matching nodes syncs the whole inventory once.
+        """
+        return 1
+
     def action_start(self, items, params):
-        """ Action to start a node.
+        """ Action to start nodes, all at once.
         """
-        success = True
         for item in items:
             self.logger.info("Action start on %r", item)
-            try:
-                self.driver.start(item)
-            except:
-                self.logger.exception("Error starting the machine")
+        success = True
+        for item, error in zip(items, self.driver.start_many(items)):
+            if error is not None:
+                self.logger.exception("Error starting the machine %r", item, exc_info=error)
                 success = False
         return success
 
     def action_stop(self, items, params):
-        """ Action to stop a node.
+        """ Action to stop nodes, all at once.
         """
         auto_restart = params.get("autoRestart", True)
-        success = True
         for item in items:
             self.logger.info("Action stop on %r", item)
-            try:
-                self.driver.stop(item)
-                if auto_restart:
-                    schema = dict()
-                    schema["matches"] = self.schema.get("matches", {})
-                    schema["filters"] = [
-                        dict(property=dict(
-                            name="state",
-                            value="DOWN"
-                        ))
-                    ]
-                    schema["actions"] = [
-                        dict(start=dict())
-                    ]
-                    start = ActionNodes(
-                        name=self.name,
-                        schema=schema,
-                        inventory=self.inventory,
-                        driver=self.driver,
-                        executor=self.executor
-                    )
-                    self.cleanup_actions.append(start)
-                self.metric_collector.add_node_stopped_metric(item)
-            except:
+        success = True
+        stopped = False
+        for item, error in zip(items, self.driver.stop_many(items)):
+            if error is not None:
                 self.metric_collector.add_node_stop_failed_metric(item)
-                self.logger.exception("Error stopping the machine")
+                self.logger.exception("Error stopping the machine %r", item, exc_info=error)
                 success = False
+            else:
+                self.metric_collector.add_node_stopped_metric(item)
+                stopped = True
+        # a single cleanup starts all the nodes still down
+        if stopped and auto_restart:
+            schema = dict()
+            schema["matches"] = self.schema.get("matches", {})
+            schema["filters"] = [
+                dict(property=dict(
+                    name="state",
+                    value="DOWN"
+                ))
+            ]
+            schema["actions"] = [
+                dict(start=dict())
+            ]
+            start = ActionNodes(
+                name=self.name,
+                schema=schema,
+                inventory=self.inventory,
+                driver=self.driver,
+                executor=self.executor
+            )
+            self.cleanup_actions.append(start)
         return success
 
     def action_execute(self, items, params):
@@ -14,9 +14,7 @@
 # limitations under the License.
 
 
-import time
 import os
-import re
 from datetime import datetime
 import calendar
 import random
@@ -24,6 +22,8 @@ from powerfulseal import makeLogger
 
 from ..metriccollectors.stdout_collector import StdoutCollector
 from .action_abstract import ActionAbstract
+from .filter_pipeline import compile_filters, compile_property, split_filters, NO_FILTERS
+from .waiter import Waiter
 
 
 class ActionNodesPods(ActionAbstract):
@@ -33,21 +33,30 @@ class ActionNodesPods(ActionAbstract):
         used by itself. It's extended for both node and pod scenarios.
     """
 
-    def __init__(self, name, schema, logger=None, metric_collector=None):
+    def __init__(self, name, schema, logger=None, metric_collector=None, waiter=None):
         self.name = name
         self.schema = schema
         self.logger = logger or makeLogger(__name__, name)
         self.metric_collector = metric_collector or StdoutCollector()
+        self.waiter = waiter or Waiter()
         self.action_mapping = dict()
         self.cleanup_actions = []
+        self.prefiltered = False
 
     def execute(self):
         """ Main entry point to starting a scenario.
 
-            It calls .match() to compute the intial set of items,
-            then goes through all the filters in sequence,
+            It first evaluates the filters which don't depend on the
+            candidates, and stops there if they reject the run.
+            Otherwise it calls .match() to compute the intial set of items,
+            then goes through all the other filters in sequence,
             and finally executes all the actions on all remaining items.
         """
+        if not self.prefilter():
+            saved = self.count_match_calls()
+            self.logger.info("Rejected before matching, saved %d API calls", saved)
+            self.metric_collector.add_api_calls_saved_metric(self.name, saved)
+            return True
         initial_set = self.match()
         self.logger.debug("Initial set: %r", initial_set)
         self.logger.info("Initial set length: %d", len(initial_set))
@@ -70,30 +79,28 @@ class ActionNodesPods(ActionAbstract):
         """
         return [] # pragma: no cover
 
+    def count_match_calls(self):
+        """ The (minimum) number of API calls done by .match().
+        """
+        return len(self.schema.get("matches", []))
+
+    def prefilter(self):
+        """ Evaluates the candidate-independent filters, before matching.
+            Returns False if they reject the run.
+        """
+        filters = split_filters(self.schema.get("filters", NO_FILTERS)).independent
+        if filters and not self.filter_mapping([self], filters, self.get_filter_mapping()):
+            return False
+        self.prefiltered = True
+        return True
+
     def match_property(self, candidate, criterion):
         """ Helper method to match a property following some criterion.
-            Turns the value into a regular expression.
+            Turns the value into a regular expression, compiled only once.
         """
         if not criterion:
             return False
-        name = criterion.get("name")
-        value = getattr(candidate, name)
-        negative = criterion.get("negative", False)
-        expr = re.compile(criterion.get("value"), re.IGNORECASE)
-        # support single values or list of values
-        if type(value) is not list:
-            value = [value]
-        # if negative, reverse the condition
-        if negative:
-            return all([
-                not expr.match(str(v))
-                for v in value
-            ])
-        # otherwise do match for any values in the list
-        return any([
-            expr.match(str(v))
-            for v in value
-        ])
+        return compile_property(criterion)(candidate)
 
     def dont_self_destruct(self, items):
         """ Don't kill its own pod or node """
@@ -117,25 +124,38 @@ class ActionNodesPods(ActionAbstract):
             if item not in matches
         ]
 
+    def get_filters(self):
+        """ The filters to apply to the matched items.
+        """
+        return self.schema.get("filters", NO_FILTERS)
+
     def filter(self, items):
         """ Applies various filters based on the given policy.
         """
-        filters = self.schema.get("filters", [])
-        mapping = {
+        filters = self.get_filters()
+        # already evaluated by .prefilter()
+        if self.prefiltered:
+            filters = split_filters(filters).dependent
+        items = self.dont_self_destruct(items)
+        return self.filter_mapping(items, filters, self.get_filter_mapping())
+
+    def get_filter_mapping(self):
+        return {
             "property": self.filter_property,
             "dayTime": self.filter_day_time,
             "randomSample": self.filter_random_sample,
             "probability": self.filter_probability,
         }
-        items = self.dont_self_destruct(items)
-        return self.filter_mapping(items, filters, mapping)
 
     def filter_property(self, candidates, criterion):
         """ Filters out things which don't match their property filters.
         """
+        if not criterion:
+            return []
+        matcher = compile_property(criterion)
         return [
             candidate for candidate in candidates
-            if self.match_property(candidate, criterion)
+            if matcher(candidate)
         ]
 
     def filter_day_time(self, candidates, criterion, now=None):
@@ -206,11 +226,11 @@ class ActionNodesPods(ActionAbstract):
     def filter_mapping(self, items, filters, mapping):
         """ Executes filters mapped to methods, based on policy keywords.
         """
-        for criterion in filters:
+        for criterion, filter_types in compile_filters(filters).stages:
             filter_method = None
             filter_params = None
             for filter_type in mapping.keys():
-                if filter_type in criterion:
+                if filter_type in filter_types:
                     filter_method = mapping.get(filter_type)
                     filter_params = criterion.get(filter_type)
                     len_before = len(items)
@@ -232,7 +252,7 @@ class ActionNodesPods(ActionAbstract):
         """
         sleep_time = params.get("seconds", 0)
         self.logger.info("Action sleep for %s seconds", sleep_time)
-        time.sleep(sleep_time)
+        self.waiter.sleep(sleep_time)
         return True
 
     def act(self, items):
@@ -19,22 +19,25 @@ import re
 from powerfulseal import makeLogger
 from powerfulseal.metriccollectors.collector import POD_SOURCE
 from .action_nodes_pods import ActionNodesPods
+from .filter_pipeline import compile_property, compile_pod_query, NO_FILTERS
+from ..k8s.selector import join_selectors
 
 class StartHostAction():
     """ A little helper class to start hosts in cleanup """
-    def __init__(self, driver, host, logger=None):
+    def __init__(self, driver, hosts, logger=None):
         self.driver = driver
-        self.host = host
+        self.hosts = hosts
         self.logger = logger or makeLogger(__name__)
 
     def execute(self):
-        try:
-            self.driver.start(self.host)
-            self.logger.info("Restarted node %s", self.host)
-        except:
-            self.logger.exception("Exception restarting node %s", self.host)
-            return False
-        return True
+        success = True
+        for host, error in zip(self.hosts, self.driver.start_many(self.hosts)):
+            if error is not None:
+                self.logger.exception("Exception restarting node %s", host, exc_info=error)
+                success = False
+            else:
+                self.logger.info("Restarted node %s", host)
+        return success
 
 
 class ActionPods(ActionNodesPods):
@@ -44,11 +47,13 @@ class ActionPods(ActionNodesPods):
     """
 
     def __init__(self, name, schema, inventory, k8s_inventory, executor,
-                 logger=None, metric_collector=None):
-        ActionNodesPods.__init__(self, name, schema, logger=logger, metric_collector=metric_collector)
+                 logger=None, metric_collector=None, waiter=None):
+        ActionNodesPods.__init__(self, name, schema, logger=logger,
+            metric_collector=metric_collector, waiter=waiter)
         self.inventory = inventory
         self.k8s_inventory = k8s_inventory
         self.executor = executor
+        self.plan = None
         self.action_mapping = {
             "wait": self.action_wait,
             "kill": self.action_kill,
@@ -65,6 +70,8 @@ class ActionPods(ActionNodesPods):
             "deployment": self.match_deployment,
             "labels": self.match_labels,
         }
+        self.plan = compile_pod_query(self.schema.get("filters", NO_FILTERS))
+        self.logger.info("Query plan: %s", self.plan)
         selected = set()
         criteria = self.schema.get("matches", [])
         self.logger.debug("Criteria %r ",criteria)
@@ -80,11 +87,29 @@ class ActionPods(ActionNodesPods):
             self.metric_collector.add_matched_to_empty_set_metric(POD_SOURCE)
         return list(selected)
 
+    def get_filters(self):
+        """ Only the filters that weren't pushed down to the API server.
+        """
+        if self.plan is None:
+            return ActionNodesPods.get_filters(self)
+        return self.plan.filters
+
+    def find_pods(self, selector=None, **kwargs):
+        """ Finds pods, adding the selectors from the query plan.
+        """
+        if self.plan is not None:
+            selector = join_selectors(selector, self.plan.label_selector)
+            if self.plan.field_selector:
+                kwargs["field_selector"] = self.plan.field_selector
+        if selector:
+            kwargs["selector"] = selector
+        return self.k8s_inventory.find_pods(**kwargs)
+
     def match_namespace(self, param):
         """ Matches pods for a namespace
         """
         namespace = param
-        pods = self.k8s_inventory.find_pods(
+        pods = self.find_pods(
             namespace=namespace,
         )
         self.logger.info("Matched %d pods in namespace %s", len(pods), namespace)
@@ -95,7 +120,7 @@ class ActionPods(ActionNodesPods):
         """
         namespace = params.get("namespace")
         deployment_name = params.get("name")
-        pods = self.k8s_inventory.find_pods(
+        pods = self.find_pods(
             namespace=namespace,
             deployment_name=deployment_name,
         )
@@ -109,7 +134,7 @@ class ActionPods(ActionNodesPods):
         """
         namespace = params.get("namespace")
         selector = params.get("selector")
-        pods = self.k8s_inventory.find_pods(
+        pods = self.find_pods(
             namespace=namespace,
             selector=selector,
         )
@@ -160,24 +185,20 @@ class ActionPods(ActionNodesPods):
             Checks that all the pods are in desired state.
         """
         state = params.get("state")
+        matcher = compile_property(dict(name="state", value=state))
         success = True
         for pod in pods:
-            if not self.match_property(
-                candidate=pod,
-                criterion=dict(
-                    name="state",
-                    value=state,
-                )
-            ):
+            if not matcher(pod):
                 self.logger.error("Expected pod in state '%s', got '%s' (%r)", state, pod.state, pod)
                 success = False
         return success
 
     def action_stop_host(self, pods, params):
-        """ Action to stop a node.
+        """ Action to stop the nodes of pods, all at once.
         """
         self.inventory.sync()
         host_ips = list(set([p.host_ip for p in pods]))
+        hosts = []
         for host_ip in host_ips:
             host = self.inventory.get_node_by_ip(host_ip)
             if host is None:
@@ -187,15 +208,21 @@ class ActionPods(ActionNodesPods):
             if len(self.dont_self_destruct([host])) == 0:
                 continue
             self.logger.info("Action stop on host %r (pods %s)", host, pods)
-            try:
-                self.inventory.driver.stop(host)
-                if params.get("autoRestart", True):
-                    self.cleanup_actions.append(
-                        StartHostAction(driver=self.inventory.driver, host=host, logger=self.logger)
-                    )
-                self.metric_collector.add_node_stopped_metric(host)
-            except:
+            hosts.append(host)
+        if not hosts:
+            return True
+        success = True
+        stopped = []
+        for host, error in zip(hosts, self.inventory.driver.stop_many(hosts)):
+            if error is not None:
                 self.metric_collector.add_node_stop_failed_metric(host)
-                self.logger.exception("Error stopping the machine")
-                return False
-        return True
+                self.logger.exception("Error stopping the machine %r", host, exc_info=error)
+                success = False
+            else:
+                self.metric_collector.add_node_stopped_metric(host)
+                stopped.append(host)
+        if stopped and params.get("autoRestart", True):
+            self.cleanup_actions.append(
+                StartHostAction(driver=self.inventory.driver, hosts=stopped, logger=self.logger)
+            )
+        return success
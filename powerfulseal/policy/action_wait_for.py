@@ -0,0 +1,200 @@
+# Copyright 2017 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import functools
+import time
+
+from kubernetes.client.rest import ApiException
+
+from powerfulseal import makeLogger
+
+from ..k8s.informer import Informer, HTTP_STATUS_GONE
+from ..metriccollectors.stdout_collector import StdoutCollector
+from .action_abstract import ActionAbstract
+from .waiter import Waiter
+
+DEFAULT_TIMEOUT = 300
+# watches are restarted at least that often, to notice being stopped
+WATCH_CHUNK_SECONDS = 10
+# delay before listing again after an error
+RETRY_DELAY = 5
+
+
+class ConditionWatch(Informer):
+    """ Lists and watches a set of objects, checking a condition on all of
+        them every time they change. Stops watching once it holds.
+    """
+
+    def __init__(self, list_fn, check, **kwargs):
+        Informer.__init__(self, list_fn, **kwargs)
+        self.check = check
+        self.met = False
+
+    def evaluate(self):
+        self.met = bool(self.check(self.list()))
+        if self.met:
+            self._stopped.set()
+
+    def resync(self, reason):
+        Informer.resync(self, reason)
+        self.evaluate()
+
+    def handle_event(self, event):
+        Informer.handle_event(self, event)
+        self.evaluate()
+
+
+def is_terminating(pod):
+    return pod.metadata.deletion_timestamp is not None
+
+
+def is_deployment_available(deployment):
+    """ Like `kubectl rollout status`: the latest spec was seen, and all the
+        replicas are updated and available, with no old ones left.
+    """
+    replicas = deployment.spec.replicas if deployment.spec.replicas is not None else 1
+    status = deployment.status
+    if status is None:
+        return False
+    return (
+        (status.observed_generation or 0) >= (deployment.metadata.generation or 0)
+        and (status.updated_replicas or 0) >= replicas
+        and (status.available_replicas or 0) >= replicas
+        and (status.replicas or 0) <= replicas
+    )
+
+
+def is_pod_running(pod):
+    """ Running, with all its containers ready, and not being deleted.
+    """
+    if is_terminating(pod) or pod.status is None or pod.status.phase != "Running":
+        return False
+    return all(container.ready for container in pod.status.container_statuses or [])
+
+
+class ActionWaitFor(ActionAbstract):
+    """ Waits until a condition holds on Kubernetes objects, or a timeout.
+        The objects are listed once, and then watched, so it returns as
+        soon as the condition holds.
+    """
+
+    def __init__(self, name, schema, k8s_inventory, logger=None,
+                 metric_collector=None, waiter=None):
+        self.name = name
+        self.schema = schema
+        self.k8s_inventory = k8s_inventory
+        self.logger = logger or makeLogger(__name__, name)
+        self.metric_collector = metric_collector or StdoutCollector()
+        self.waiter = waiter or Waiter()
+        self.condition_mapping = dict(
+            deploymentAvailable=self.deployment_available,
+            podCount=self.pod_count,
+            podsRunning=self.pods_running,
+        )
+
+    def deployment_available(self, params):
+        """ Returns the list function and the check of `deploymentAvailable`.
+        """
+        api = self.k8s_inventory.k8s_client.client_appsv1api
+        list_fn = functools.partial(
+            api.list_namespaced_deployment,
+            params.get("namespace"),
+            field_selector="metadata.name=" + params.get("name"),
+        )
+        def check(deployments):
+            return len(deployments) == 1 and is_deployment_available(deployments[0])
+        return list_fn, check
+
+    def list_pods_fn(self, params):
+        api = self.k8s_inventory.k8s_client.client_corev1api
+        kwargs = dict()
+        if params.get("selector"):
+            kwargs["label_selector"] = params.get("selector")
+        return functools.partial(api.list_namespaced_pod, params.get("namespace"), **kwargs)
+
+    def pod_count(self, params):
+        """ Returns the list function and the check of `podCount`: the
+            number of pods (not being deleted, and in a state if given).
+        """
+        state = params.get("state")
+        def check(pods):
+            return params.get("count") == len([
+                pod for pod in pods
+                if not is_terminating(pod)
+                and (state is None or (pod.status and pod.status.phase == state))
+            ])
+        return self.list_pods_fn(params), check
+
+    def pods_running(self, params):
+        """ Returns the list function and the check of `podsRunning`.
+        """
+        def check(pods):
+            return len(pods) > 0 and all(is_pod_running(pod) for pod in pods)
+        return self.list_pods_fn(params), check
+
+    def wait(self, watch, deadline):
+        """ Watches until the condition holds, or the deadline passes.
+            Returns whether the condition held.
+        """
+        needs_resync = True
+        while True:
+            remaining = deadline - time.monotonic()
+            if needs_resync:
+                try:
+                    watch.resync(reason="initial")
+                    needs_resync = False
+                except Exception:
+                    self.logger.exception("Error listing %s", watch.kind)
+                    self.waiter.sleep(max(min(RETRY_DELAY, remaining), 0))
+                    remaining = deadline - time.monotonic()
+            if watch.met:
+                return True
+            if remaining <= 0 or self.waiter.stopped:
+                return False
+            if needs_resync:
+                continue
+            watch.watch_timeout = max(int(min(remaining, WATCH_CHUNK_SECONDS)), 1)
+            try:
+                watch.watch()
+            except ApiException as e:
+                if e.status != HTTP_STATUS_GONE:
+                    self.logger.exception("Error watching %s", watch.kind)
+                    self.waiter.sleep(max(min(RETRY_DELAY, remaining), 0))
+                needs_resync = True
+            except Exception:
+                self.logger.exception("Error watching %s", watch.kind)
+                self.waiter.sleep(max(min(RETRY_DELAY, remaining), 0))
+                needs_resync = True
+
+    def execute(self):
+        timeout = self.schema.get("timeout", DEFAULT_TIMEOUT)
+        for condition, condition_method in self.condition_mapping.items():
+            if condition in self.schema:
+                break
+        else:
+            self.logger.error("No condition to wait for in %r", self.schema)
+            return False
+        params = self.schema.get(condition)
+        list_fn, check = condition_method(params)
+        watch = ConditionWatch(list_fn, check, kind=condition, logger=self.logger)
+        self.logger.info("Waiting up to %ss for %s %r", timeout, condition, params)
+        start = time.monotonic()
+        met = self.wait(watch, start + timeout)
+        elapsed = time.monotonic() - start
+        self.metric_collector.add_wait_for_metric(self.name, condition, elapsed, met)
+        if not met:
+            self.logger.error("Condition %s not met after %.1fs", condition, elapsed)
+            return False
+        self.logger.info("Condition %s met after %.1fs", condition, elapsed)
+        return True
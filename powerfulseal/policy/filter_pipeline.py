@@ -0,0 +1,170 @@
+# Copyright 2017 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import re
+import threading
+from collections import namedtuple
+from operator import attrgetter
+
+from .query_planner import LABEL_PROPERTY_PREFIX, plan_pod_filters
+
+# compiled objects are shared by all the scenarios and loops, and only
+# dropped when too many different ones were compiled (the policy changed)
+MAX_CACHE_SIZE = 1024
+
+# filters which accept or reject all the candidates at once, regardless of
+# what they are, and can be evaluated before matching
+CANDIDATE_INDEPENDENT_FILTERS = ("dayTime", "probability")
+
+# the filters of scenarios without any, shared so that it's always the same
+# object in the caches
+NO_FILTERS = ()
+
+# a list of filters, split into the candidate-independent ones and the rest
+SplitFilters = namedtuple("SplitFilters", ["independent", "dependent"])
+
+
+class CompileCache():
+    """ Caches objects compiled from policy fragments (dicts and lists).
+
+        Lookups by identity are tried first, so that the same fragment
+        isn't serialized again on every call; otherwise fragments with the
+        same content share the same compiled object.
+    """
+
+    def __init__(self, compile_fn, max_size=MAX_CACHE_SIZE):
+        self.compile_fn = compile_fn
+        self.max_size = max_size
+        # id -> (fragment, compiled); keeping the fragment pins its id
+        self.by_id = dict()
+        self.by_content = dict()
+        self.lock = threading.Lock()
+
+    def get(self, fragment):
+        entry = self.by_id.get(id(fragment))
+        if entry is not None and entry[0] is fragment:
+            return entry[1]
+        key = json.dumps(fragment, sort_keys=True, default=str)
+        compiled = self.by_content.get(key)
+        if compiled is None:
+            compiled = self.compile_fn(fragment)
+        with self.lock:
+            if len(self.by_content) >= self.max_size:
+                self.by_content.clear()
+            compiled = self.by_content.setdefault(key, compiled)
+            if len(self.by_id) >= self.max_size:
+                self.by_id.clear()
+            self.by_id[id(fragment)] = (fragment, compiled)
+        return compiled
+
+    def clear(self):
+        with self.lock:
+            self.by_id.clear()
+            self.by_content.clear()
+
+
+def make_getter(name):
+    """ Builds a function reading a property of a candidate. Supports
+        `labels.<key>`, which is an empty list if the label is missing.
+    """
+    if name.startswith(LABEL_PROPERTY_PREFIX):
+        key = name[len(LABEL_PROPERTY_PREFIX):]
+        def get_label(candidate):
+            labels = getattr(candidate, "labels", None) or {}
+            return [labels[key]] if key in labels else []
+        return get_label
+    return attrgetter(name)
+
+
+def make_property_matcher(criterion):
+    """ Compiles a property criterion into a function of a candidate,
+        returning whether it matches. The value is a regular expression,
+        matched against the property, or any of its values for lists.
+    """
+    get = make_getter(criterion.get("name"))
+    match = re.compile(criterion.get("value"), re.IGNORECASE).match
+    if criterion.get("negative", False):
+        def matcher(candidate):
+            value = get(candidate)
+            if type(value) is not list:
+                return not match(str(value))
+            return not any(match(str(v)) for v in value)
+    else:
+        def matcher(candidate):
+            value = get(candidate)
+            if type(value) is not list:
+                return match(str(value)) is not None
+            return any(match(str(v)) for v in value)
+    return matcher
+
+
+def is_candidate_independent(criterion):
+    return any(key in criterion for key in CANDIDATE_INDEPENDENT_FILTERS)
+
+
+def make_split_filters(filters):
+    return SplitFilters(
+        [criterion for criterion in filters if is_candidate_independent(criterion)],
+        [criterion for criterion in filters if not is_candidate_independent(criterion)],
+    )
+
+
+class FilterPipeline():
+    """ A scenario's list of filters, compiled: every stage is a
+        (criterion, filter keywords) pair, and the matchers of property
+        filters are built up front.
+    """
+
+    def __init__(self, filters):
+        self.stages = []
+        for criterion in filters:
+            if criterion.get("property"):
+                compile_property(criterion["property"])
+            self.stages.append((criterion, frozenset(criterion)))
+
+    def __len__(self):
+        return len(self.stages)
+
+
+_property_matchers = CompileCache(make_property_matcher)
+_pipelines = CompileCache(FilterPipeline)
+_query_plans = CompileCache(plan_pod_filters)
+_split_filters = CompileCache(make_split_filters)
+
+
+def compile_property(criterion):
+    """ Returns the (cached) matcher for a property criterion.
+    """
+    return _property_matchers.get(criterion)
+
+
+def compile_filters(filters):
+    """ Returns the (cached) pipeline for a list of filters.
+    """
+    return _pipelines.get(filters)
+
+
+def split_filters(filters):
+    """ Returns the (cached) split of a list of filters. The lists returned
+        are the same on every call, so their pipelines are looked up by
+        identity too.
+    """
+    return _split_filters.get(filters)
+
+
+def compile_pod_query(filters):
+    """ Returns the (cached) query plan of a pod scenario's filters.
+    """
+    return _query_plans.get(filters)
@@ -14,9 +14,10 @@
 from powerfulseal import makeLogger
 import random
 
-import time
 from datetime import datetime
 
+from .waiter import Waiter
+
 
 class LabelRunner:
     """
@@ -42,7 +43,7 @@ class LabelRunner:
 
     def __init__(self, inventory, k8s_inventory, driver, executor,
                  min_seconds_between_runs=0, max_seconds_between_runs=300, logger=None,
-                 namespace=None, metric_collector=None):
+                 namespace=None, metric_collector=None, waiter=None):
         self.inventory = inventory
         self.k8s_inventory = k8s_inventory
         self.driver = driver
@@ -52,9 +53,10 @@ class LabelRunner:
         self.logger = logger or makeLogger(__name__)
         self.namespace = namespace
         self.metric_collector = metric_collector
+        self.waiter = waiter or Waiter()
 
     def run(self):
-        while True:
+        while not self.waiter.stopped:
             # Filter
             app_pods_in_namespace = self.k8s_inventory.find_pods(self.namespace)
             self.logger.info("Found %d pods" % len(app_pods_in_namespace))
@@ -68,8 +70,11 @@ class LabelRunner:
             # Sleep and sync
             sleep_time = int(random.uniform(self.min_seconds_between_runs, self.max_seconds_between_runs))
             self.logger.info("Sleeping for %s seconds", sleep_time)
-            time.sleep(sleep_time)
+            if not self.waiter.wait_for_trigger(sleep_time) and self.waiter.stopped:
+                break
+            self.waiter.consume_trigger()
             self.inventory.sync()
+        self.logger.info("Stopping")
 
     def kill_pod(self, pod):
         # prep the arguments
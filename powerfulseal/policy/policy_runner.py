@@ -13,19 +13,61 @@
 # limitations under the License.
 
 
+import os
 import random
+import threading
 import time
 import sys
 import copy
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 import jsonschema
 import yaml
 import pkgutil
 from powerfulseal import makeLogger
-from .scenario import Scenario
+from .scenario import Scenario, CLEANUP_TIMEOUT, CLEANUP_ACTION_TIMEOUT, CLEANUP_MAX_CONCURRENT
+from .scenario_plan import compile_scenario
+from .scheduler import Scheduler, ScenarioSchedule
+from .waiter import Waiter
 
 logger = makeLogger(__name__)
 
+# with the scheduled strategy, how often the policy is read again while
+# nothing is due
+POLICY_POLL_SECONDS = 30
+# how often the policy file (and watched scenarios) are checked for changes
+POLICY_WATCH_SECONDS = 1
+
+# the C loader is much faster, but only there if PyYAML was built with libyaml
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def load_schema():
+    """ Parses the policy schema shipped with the package.
+    """
+    data = pkgutil.get_data(__name__, "ps-schema.yaml")
+    return yaml.load(data, Loader=YAML_LOADER)
+
+
+def compile_validator(schema):
+    """ Checks a schema and builds a validator for it, which can be
+        reused for any number of policies.
+    """
+    cls = jsonschema.validators.validator_for(schema)
+    cls.check_schema(schema)
+    return cls(schema)
+
+
+SCHEMA = load_schema()
+VALIDATOR = compile_validator(SCHEMA)
+SCENARIO_VALIDATOR = compile_validator({
+    "$ref": "#/definitions/scenario",
+    "definitions": SCHEMA["definitions"],
+})
+# the validator's $ref resolver keeps a stack of scopes, so it can only
+# validate one policy at a time
+VALIDATOR_LOCK = threading.Lock()
+
 
 class PolicyRunner():
     """ Reads, validates and executes a JSON schema-compliant policy
@@ -34,60 +76,424 @@ class PolicyRunner():
         "scenarios": []
     }
 
-    def __init__(self, policy_config, k8s_client, logger=None):
+    def __init__(self, policy_config, k8s_client, logger=None,
+                 metric_collector=None, scenario_informer=None, waiter=None):
         self.policy_config = policy_config
         self.k8s_client = k8s_client
         self.logger = logger or makeLogger(__name__)
+        self.metric_collector = metric_collector
+        self.scenario_informer = scenario_informer
+        self.waiter = waiter or Waiter()
+        # the policy version the watch last woke the runner up for
+        self.watched_key = None
+        self.cache_key = None
+        self.cache_policy = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.file_key = None
+        self.file_policy = None
+        # (uid, resourceVersion) -> whether the scenario custom resource is valid
+        self.scenario_validity = dict()
+        # the UI server reads the policy too
+        self.lock = threading.Lock()
 
-    def read_policy(self):
-        """
-            Read configuration
+    def get_config_key(self):
+        """ Identifies the current version of the policy config: the file's
+            mtime, inode and size, or the config object itself.
         """
+        if isinstance(self.policy_config, str):
+            stat = os.stat(self.policy_config)
+            return (self.policy_config, stat.st_mtime_ns, stat.st_ino, stat.st_size)
+        return id(self.policy_config)
+
+    def load_config(self):
         if isinstance(self.policy_config, str):
             policy = PolicyRunner.load_file(self.policy_config)
         elif isinstance(self.policy_config, dict):
-            policy = self.policy_config
+            policy = copy.copy(self.policy_config)
         else: #  is None or unsupported
             policy = copy.deepcopy(PolicyRunner.DEFAULT_POLICY)
-
-        # Load scenarios from K8S crd extending file scenarios
-        scenarios = self.k8s_client.get_scenarios()
-        policy['scenarios'].extend(scenarios)
-        if not PolicyRunner.is_policy_valid(policy):
-            self.logger.error("Policy not valid. See log output above.")
-            return sys.exit(1)
         return policy
 
+    def read_scenario_objects(self):
+        """ Reads the scenario custom resources, from the watch if there is
+            one, or with a LIST otherwise.
+        """
+        if self.scenario_informer is not None and self.scenario_informer.has_synced():
+            return self.scenario_informer.list_scenarios()
+        return self.k8s_client.list_scenarios()
+
+    @staticmethod
+    def get_object_version(obj):
+        metadata = obj.get("metadata", {})
+        return (metadata.get("uid"), metadata.get("resourceVersion"))
+
+    def record_cache(self, hit):
+        if hit:
+            self.cache_hits += 1
+        else:
+            self.cache_misses += 1
+        if self.metric_collector is not None:
+            self.metric_collector.add_policy_cache_metric(hit)
+
+    def get_watched_key(self):
+        """ The version of the policy, as far as it can be known without
+            calling the API: the policy file, and the scenario custom
+            resources if they're watched.
+        """
+        crs = None
+        if self.scenario_informer is not None and self.scenario_informer.has_synced():
+            crs = tuple(
+                PolicyRunner.get_object_version(cr)
+                for cr in self.scenario_informer.list_scenarios()
+            )
+        return (self.get_config_key(), crs)
+
+    def has_policy_changed(self):
+        """ Whether the policy changed since it was last read.
+        """
+        if self.cache_key is None:
+            return False
+        config_key, crs = self.get_watched_key()
+        if config_key != self.cache_key[0]:
+            return True
+        return crs is not None and crs != self.cache_key[1]
+
+    def watch_policy(self, interval=POLICY_WATCH_SECONDS):
+        """ Wakes the runner up as soon as the policy changes, until stopped.
+        """
+        while self.waiter.sleep(interval):
+            try:
+                if not self.has_policy_changed():
+                    continue
+                key = self.get_watched_key()
+            except Exception:
+                self.logger.exception("Error checking the policy for changes")
+                continue
+            if key != self.watched_key:
+                self.logger.info("Policy changed, waking up")
+                self.watched_key = key
+                self.waiter.wake()
+
+    def start_policy_watch(self, interval=POLICY_WATCH_SECONDS):
+        threading.Thread(target=self.watch_policy, args=(interval,), daemon=True).start()
+
+    def read_config(self, key):
+        """ Reads and validates the policy config, unless it didn't change.
+        """
+        if key != self.file_key:
+            policy = self.load_config()
+            if not PolicyRunner.is_policy_valid(policy):
+                self.logger.error("Policy not valid. See log output above.")
+                return sys.exit(1)
+            self.file_key, self.file_policy = key, policy
+        return self.file_policy
+
+    def read_scenarios(self, crs):
+        """ Returns the scenarios of the valid custom resources. Each one is
+            validated on its own, once per version, and invalid ones are
+            skipped.
+        """
+        validity = dict()
+        scenarios = []
+        for cr in crs:
+            version = PolicyRunner.get_object_version(cr)
+            valid = self.scenario_validity.get(version)
+            if valid is None:
+                valid = PolicyRunner.is_scenario_valid(cr.get("spec"))
+                if not valid:
+                    metadata = cr.get("metadata", {})
+                    self.logger.error("Skipping invalid scenario %s/%s",
+                        metadata.get("namespace"), metadata.get("name"))
+            validity[version] = valid
+            if valid:
+                scenarios.append(cr["spec"])
+        # forget about the versions that are gone
+        self.scenario_validity = validity
+        invalid = sum(1 for valid in validity.values() if not valid)
+        if self.metric_collector is not None:
+            self.metric_collector.add_invalid_scenarios_metric(invalid)
+        return scenarios
+
+    def read_policy(self):
+        """
+            Read configuration.
+            The validated policy is cached, and only read and validated again
+            when the config file or one of the scenario custom resources
+            changed. Invalid scenario custom resources are skipped.
+        """
+        with self.lock:
+            # Load scenarios from K8S crd extending file scenarios
+            crs = self.read_scenario_objects()
+            key = (
+                self.get_config_key(),
+                tuple(PolicyRunner.get_object_version(cr) for cr in crs),
+            )
+            if self.cache_key is not None and key == self.cache_key:
+                self.record_cache(True)
+                return self.cache_policy
+            self.record_cache(False)
+            self.logger.info("Policy changed, reading and validating it")
+            policy = copy.copy(self.read_config(key[0]))
+            policy['scenarios'] = list(policy.get('scenarios') or []) + self.read_scenarios(crs)
+            # compile the scenarios now, rather than in their first run
+            for scenario in policy['scenarios']:
+                compile_scenario(scenario)
+            self.cache_key, self.cache_policy = key, policy
+            return policy
+
     @classmethod
     def get_schema(cls):
-        """ Reads the schema from the file
+        """ Returns the schema, parsed once when the module is imported.
+            It's shared, so it must not be modified.
         """
-        data = pkgutil.get_data(__name__, "ps-schema.yaml")
-        return yaml.safe_load(data)
+        return SCHEMA
 
     @classmethod
     def load_file(cls, filename):
         with open(filename, "r") as f:
-            return yaml.safe_load(f.read())
+            return yaml.load(f.read(), Loader=YAML_LOADER)
 
     @classmethod
     def is_policy_valid(cls, policy, schema=None):
-        schema = schema or cls.get_schema()
-        try:
-            jsonschema.validate(policy, schema)
-        except jsonschema.ValidationError as error:
+        if schema is None or schema is SCHEMA:
+            with VALIDATOR_LOCK:
+                error = jsonschema.exceptions.best_match(VALIDATOR.iter_errors(policy))
+        else:
+            error = jsonschema.exceptions.best_match(
+                compile_validator(schema).iter_errors(policy))
+        if error is not None:
             logger.error(policy)
             logger.error(error)
             return False
         return True
 
+    @classmethod
+    def is_scenario_valid(cls, scenario):
+        with VALIDATOR_LOCK:
+            error = jsonschema.exceptions.best_match(SCENARIO_VALIDATOR.iter_errors(scenario))
+        if error is not None:
+            logger.error(scenario)
+            logger.error(error)
+            return False
+        return True
+
+    def run_scenarios(self, scenarios, exit_strategy, max_concurrent=1):
+        """ Executes the scenarios, up to max_concurrent at a time.
+            Returns False if a scenario failed and the exit strategy
+            is fail-fast, True otherwise.
+        """
+        if max_concurrent <= 1:
+            for scenario in scenarios:
+                if self.waiter.stopped:
+                    break
+                if not self.check_result(scenario.execute(), exit_strategy):
+                    return False
+            return True
+        self.logger.info("Running %d scenarios, up to %d at a time",
+            len(scenarios), max_concurrent)
+        executor = ThreadPoolExecutor(max_workers=max_concurrent)
+        pending = [executor.submit(scenario.execute) for scenario in scenarios]
+        try:
+            while pending:
+                done, not_done = wait(pending, return_when=FIRST_COMPLETED)
+                pending = list(not_done)
+                for future in done:
+                    if not self.check_result(future.result(), exit_strategy):
+                        return False
+            return True
+        finally:
+            # scenarios that haven't started are dropped, the running ones
+            # are waited for, so that they get to clean up after themselves
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def check_result(self, ret, exit_strategy):
+        """ Returns False if the run needs to stop after a scenario's result.
+        """
+        if ret:
+            return True
+        if exit_strategy == "fail-fast":
+            return False
+        logger.error("Scenario failed, reporting and carrying on")
+        return True
+
+    def make_scenario(self, item, inventory, k8s_inventory, driver, executor,
+            metric_collector=None):
+        config = (self.cache_policy or {}).get("config", {}).get("cleanup", {})
+        return Scenario(
+            name=item.get("name"),
+            schema=item,
+            inventory=inventory,
+            k8s_inventory=k8s_inventory,
+            driver=driver,
+            executor=executor,
+            metric_collector=metric_collector,
+            waiter=self.waiter,
+            cleanup_timeout=config.get("timeoutSeconds", CLEANUP_TIMEOUT),
+            cleanup_action_timeout=config.get("actionTimeoutSeconds", CLEANUP_ACTION_TIMEOUT),
+            cleanup_max_concurrent=config.get("maxConcurrentActions", CLEANUP_MAX_CONCURRENT),
+        )
+
+    @staticmethod
+    def get_schedules(policy, now):
+        """ Returns the schedule, schema and first run time of every
+            scenario, keyed by name (and position, for scenarios with the
+            same name). Scenarios with an invalid schedule, or a cron
+            expression that never matches, are skipped.
+        """
+        config = policy.get("config", {}).get("runStrategy", {})
+        wait_min = config.get("minSecondsBetweenRuns", 0)
+        wait_max = config.get("maxSecondsBetweenRuns", 300)
+        schedules = dict()
+        for item in policy.get("scenarios", []):
+            key = (item.get("name"), 0)
+            while key in schedules:
+                key = (key[0], key[1] + 1)
+            try:
+                schedule = ScenarioSchedule(item.get("schedule"), wait_min, wait_max)
+                first_run = schedule.first_run(now)
+            except ValueError as error:
+                logger.error("Skipping scenario %r: %s", key[0], error)
+                continue
+            schedules[key] = (schedule, item, first_run)
+        return schedules
+
+    @staticmethod
+    def get_next_run(key, schedule, now):
+        """ Returns the next run time of a scenario, or None if there's
+            none (its cron expression doesn't match anymore).
+        """
+        try:
+            return schedule.next_run(now)
+        except ValueError as error:
+            logger.error("Not scheduling scenario %r anymore: %s", key[0], error)
+            return None
+
+    def wait_for(self, timeout):
+        """ Waits up to timeout seconds, or until woken up.
+        """
+        return self.waiter.wait_for_trigger(timeout)
+
+    def run_scheduled(self, inventory, k8s_inventory, driver, executor,
+            metric_collector=None):
+        """ Runs every scenario on its own schedule: the scenarios that are
+            due are started (up to maxConcurrentScenarios at a time), and
+            scheduled again when they finish. With `runs`, stops once every
+            scenario ran that many times.
+        """
+        scheduler = Scheduler()
+        schedules = dict()
+        runs_left = dict()
+        # key -> (future, planned time)
+        running = dict()
+        policy = None
+        pool = None
+        pool_size = None
+        success = True
+        try:
+            while not self.waiter.stopped:
+                new_policy = self.read_policy()
+                now = time.time()
+                if new_policy is not policy:
+                    policy = new_policy
+                    config = policy.get("config", {}).get("runStrategy", {})
+                    exitStrategy = policy.get("config", {}).get(
+                        "exitStrategy", {}).get("strategy", "report")
+                    max_concurrent = config.get("maxConcurrentScenarios", 1)
+                    if max_concurrent != pool_size:
+                        if pool is not None:
+                            # the running scenarios carry on in the old pool
+                            pool.shutdown(wait=False)
+                        pool = ThreadPoolExecutor(max_workers=max_concurrent)
+                        pool_size = max_concurrent
+                    previous, schedules = schedules, PolicyRunner.get_schedules(policy, now)
+                    for key in previous:
+                        if key not in schedules:
+                            scheduler.remove(key)
+                    for key, (schedule, item, first_run) in schedules.items():
+                        old = previous.get(key)
+                        if old is not None and old[1].get("schedule") == item.get("schedule"):
+                            continue
+                        runs_left.setdefault(key, config.get("runs"))
+                        if key not in running and runs_left[key] != 0:
+                            scheduler.schedule(key, first_run)
+                if self.waiter.consume_trigger():
+                    logger.info("Run triggered, starting all the idle scenarios")
+                    for key in schedules:
+                        if key in scheduler:
+                            scheduler.schedule(key, now)
+
+                for key, (future, planned) in list(running.items()):
+                    if not future.done():
+                        continue
+                    del running[key]
+                    try:
+                        ret = future.result()
+                    except Exception:
+                        logger.exception("Scenario %r raised an exception", key[0])
+                        if self.metric_collector is not None:
+                            self.metric_collector.add_scenario_counter_metric(key[0], False)
+                        ret = False
+                    if not self.check_result(ret, exitStrategy):
+                        success = False
+                    if runs_left.get(key) is not None:
+                        runs_left[key] -= 1
+                    if key in schedules and runs_left.get(key) != 0:
+                        next_run = PolicyRunner.get_next_run(key, schedules[key][0], now)
+                        if next_run is not None:
+                            scheduler.schedule(key, next_run)
+                if not success:
+                    logger.error("Exiting early")
+                    return False
+
+                for planned, key in scheduler.pop_due(now):
+                    scenario = self.make_scenario(schedules[key][1], inventory,
+                        k8s_inventory, driver, executor, metric_collector)
+                    future = pool.submit(self.execute_scheduled, key, planned, scenario)
+                    future.add_done_callback(lambda _: self.waiter.wake())
+                    running[key] = (future, planned)
+
+                if not running and not len(scheduler):
+                    break
+                next_time = scheduler.next_time()
+                timeout = POLICY_POLL_SECONDS
+                if next_time is not None:
+                    timeout = min(max(next_time - time.time(), 0), timeout)
+                self.wait_for(timeout)
+        finally:
+            # the running scenarios get to clean up after themselves
+            if pool is not None:
+                pool.shutdown(wait=True)
+        logger.info("All done here!")
+        return True
+
+    def execute_scheduled(self, key, planned, scenario):
+        """ Runs a scheduled scenario, once it got a slot in the pool,
+            reporting how late it actually started.
+        """
+        drift = time.time() - planned
+        logger.info("Starting scenario %r, %.3fs after its planned time",
+            key[0], drift)
+        if self.metric_collector is not None:
+            self.metric_collector.add_scheduling_drift_metric(key[0], drift)
+        return scenario.execute()
+
     def run(self, inventory, k8s_inventory, driver, executor,
             metric_collector=None):
         """ Runs a policy forever
         """
+        self.metric_collector = metric_collector or self.metric_collector
         policy = self.read_policy()
+        if policy.get("config", {}).get("runStrategy", {}).get("strategy") == "scheduled":
+            return self.run_scheduled(inventory, k8s_inventory, driver, executor,
+                metric_collector)
         loops = policy.get("config", {}).get("runStrategy", {}).get("runs", None)
         while loops is None or loops > 0:
+            if self.waiter.stopped:
+                logger.info("Stopping")
+                break
             policy = self.read_policy()
             config = policy.get("config", {}).get("runStrategy", {})
             should_randomize = config.get("strategy") == "random"
@@ -95,35 +501,25 @@ class PolicyRunner():
             wait_max = config.get("maxSecondsBetweenRuns", 300)
             exitConfig = policy.get("config", {}).get("exitStrategy", {})
             exitStrategy = exitConfig.get("strategy", "report")
+            max_concurrent = config.get("maxConcurrentScenarios", 1)
             scenarios = [
-                Scenario(
-                    name=item.get("name"),
-                    schema=item,
-                    inventory=inventory,
-                    k8s_inventory=k8s_inventory,
-                    driver=driver,
-                    executor=executor,
-                    metric_collector=metric_collector
-                )
+                self.make_scenario(item, inventory, k8s_inventory, driver,
+                    executor, metric_collector)
                 for item in policy.get("scenarios", [])
             ]
 
             if should_randomize:
                 random.shuffle(scenarios)
-            for scenario in scenarios:
-                ret = scenario.execute()
-                if not ret:
-                    if exitStrategy == "fail-fast":
-                        logger.error("Exiting early")
-                        return False
-                    else:
-                        logger.error("Scenario failed, reporting and carrying on")
+            if not self.run_scenarios(scenarios, exitStrategy, max_concurrent):
+                logger.error("Exiting early")
+                return False
             sleep_time = int(random.uniform(wait_min, wait_max))
             if loops is not None:
                 loops -= 1
                 if loops < 1:
                     break
             logger.info("Sleeping for %s seconds", sleep_time)
-            time.sleep(sleep_time)
+            self.wait_for(sleep_time)
+            self.waiter.consume_trigger()
         logger.info("All done here!")
         return True
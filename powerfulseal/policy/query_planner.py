@@ -0,0 +1,140 @@
+# Copyright 2017 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+
+from ..k8s.selector import join_selectors
+
+LABEL_PROPERTY_PREFIX = "labels."
+POD_PHASES = ["Pending", "Running", "Succeeded", "Failed", "Unknown"]
+
+# a regex matching a single string, like ^my-pod$ or my\.pod$
+EXACT_LITERAL = re.compile(r"^\^?((?:[A-Za-z0-9_\-]|\\[.\-])*)\$$")
+# a regex matching a string or anything it prefixes, like Running or ^Running
+PREFIX_LITERAL = re.compile(r"^\^?([A-Za-z]+)\$?$")
+
+# properties whose values are lowercase, where an exact, case-insensitive
+# match is the same as a field selector
+EXACT_FIELDS = {
+    "name": "metadata.name",
+    "node_name": "spec.nodeName",
+}
+
+
+def parse_exact_literal(value):
+    """ Returns the only string a regex matches (with re.match),
+        or None if it could match more than one.
+    """
+    match = EXACT_LITERAL.match(value or "")
+    if match is None:
+        return None
+    return match.group(1).replace("\\.", ".").replace("\\-", "-")
+
+
+def parse_phase(value):
+    """ Returns the pod phase a state regex is looking for, if any.
+    """
+    match = PREFIX_LITERAL.match(value or "")
+    if match is None:
+        return None
+    for phase in POD_PHASES:
+        if phase.lower() == match.group(1).lower():
+            return phase
+    return None
+
+
+class QueryPlan():
+    """ The outcome of planning a pod scenario's filters: the label and
+        field selectors to send to the API server with every pod LIST,
+        and the filters still to be applied client-side.
+    """
+
+    def __init__(self, filters):
+        self.label_selectors = []
+        self.field_selectors = []
+        self.filters = filters
+
+    @property
+    def label_selector(self):
+        return join_selectors(*self.label_selectors) or None
+
+    @property
+    def field_selector(self):
+        return join_selectors(*self.field_selectors) or None
+
+    def __str__(self):
+        return "labels=%r fields=%r client-side filters=%r" % (
+            self.label_selector, self.field_selector, self.filters)
+
+
+def push_property(criterion):
+    """ Translates a property filter into (kind, clause, exact), where kind
+        is "label" or "field", and exact says whether the clause selects
+        exactly the pods the filter would keep, or a superset of them.
+        Returns None if the filter can't be pushed down.
+    """
+    name = criterion.get("name")
+    value = criterion.get("value")
+    negative = criterion.get("negative", False)
+    op = "!=" if negative else "="
+    if name in EXACT_FIELDS:
+        literal = parse_exact_literal(value)
+        if literal:
+            return "field", "%s%s%s" % (EXACT_FIELDS[name], op, literal.lower()), True
+    elif name == "state" and not negative:
+        # the state is the phase, unless containers are waiting; a phase
+        # is only a superset of the pods in that state
+        phase = parse_phase(value)
+        if phase:
+            return "field", "status.phase=%s" % phase, False
+    elif name and name.startswith(LABEL_PROPERTY_PREFIX):
+        key = name[len(LABEL_PROPERTY_PREFIX):]
+        literal = parse_exact_literal(value)
+        if literal is None:
+            return None
+        # label values are case-sensitive, unlike the filter
+        if literal.lower() == literal.upper():
+            return "label", "%s%s%s" % (key, op, literal), True
+        if not negative:
+            return "label", key, False
+    return None
+
+
+def plan_pod_filters(filters):
+    """ Works out which of a pod scenario's filters can be pushed down to
+        the API server, as label and field selectors.
+
+        Property filters are pushed until the first randomSample, which
+        depends on the number of candidates. Filters translated exactly are
+        dropped from the client-side filters, the others are kept.
+    """
+    plan = QueryPlan(filters=[])
+    pushable = True
+    for criterion in filters:
+        if "randomSample" in criterion:
+            pushable = False
+        pushed = None
+        if pushable and "property" in criterion:
+            pushed = push_property(criterion.get("property") or {})
+        if pushed is None:
+            plan.filters.append(criterion)
+            continue
+        kind, clause, exact = pushed
+        if kind == "label":
+            plan.label_selectors.append(clause)
+        else:
+            plan.field_selectors.append(clause)
+        if not exact:
+            plan.filters.append(criterion)
+    return plan
@@ -0,0 +1,111 @@
+# Copyright 2017 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+import time
+from collections import namedtuple
+
+RETRIES_TIMEOUT = "retriesTimeout"
+RETRIES_COUNT = "retriesCount"
+
+BACKOFF_CONSTANT = "constant"
+BACKOFF_EXPONENTIAL = "exponential"
+BACKOFF_DECORRELATED = "decorrelated"
+
+DEFAULT_SLEEP = 30
+DEFAULT_MAX_SLEEP = 300
+
+# kind is RETRIES_TIMEOUT (limit in seconds), RETRIES_COUNT (limit in
+# attempts) or None (no attempt at all); sleep is the base delay between
+# attempts, growing with the backoff up to max_sleep
+RetryPolicy = namedtuple("RetryPolicy", ["kind", "limit", "sleep", "backoff", "max_sleep"])
+
+
+def parse_retries(schema):
+    """ Reads the retry policy of an action, None if it's not retried.
+    """
+    if "retries" not in schema:
+        return None
+    retries = schema["retries"]
+    for kind, limit_name, default_limit in [
+        (RETRIES_TIMEOUT, "timeout", 60),
+        (RETRIES_COUNT, "count", 1),
+    ]:
+        if kind in retries:
+            params = retries.get(kind, {})
+            return RetryPolicy(
+                kind,
+                params.get(limit_name, default_limit),
+                params.get("sleep", DEFAULT_SLEEP),
+                params.get("backoff", BACKOFF_CONSTANT),
+                params.get("maxSleep", DEFAULT_MAX_SLEEP),
+            )
+    return RetryPolicy(None, 0, 0, BACKOFF_CONSTANT, 0)
+
+
+def iter_delays(policy):
+    """ Yields the delays between attempts:
+        - constant: always `sleep`
+        - exponential: `sleep`, doubling after every attempt
+        - decorrelated: random, between `sleep` and three times the
+          previous delay ("decorrelated jitter"), so that many clients
+          retrying at once spread out
+        all capped to `max_sleep`.
+    """
+    delay = policy.sleep
+    while True:
+        if policy.backoff == BACKOFF_EXPONENTIAL:
+            yield min(delay, policy.max_sleep)
+            delay *= 2
+        elif policy.backoff == BACKOFF_DECORRELATED:
+            delay = min(policy.max_sleep, random.uniform(policy.sleep, delay * 3))
+            yield delay
+        else:
+            yield min(delay, policy.max_sleep)
+
+
+def call_with_retries(fn, policy, logger, sleep=time.sleep, clock=time.monotonic):
+    """ Calls fn until it returns a truthy value, following a retry policy.
+        With RETRIES_TIMEOUT, the deadline includes the time spent in fn,
+        and there's no new attempt when the next one would start after it.
+        Returns the last value returned, and the number of attempts.
+    """
+    if policy.kind is None:
+        return False, 0
+    if policy.limit <= 0:
+        logger.error("No retries allowed. Failing step")
+        return False, 0
+    deadline = None
+    if policy.kind == RETRIES_TIMEOUT:
+        deadline = clock() + policy.limit
+    delays = iter_delays(policy)
+    attempts = 0
+    while True:
+        ret = fn()
+        attempts += 1
+        if ret:
+            return ret, attempts
+        delay = next(delays)
+        if deadline is not None:
+            if clock() + delay >= deadline:
+                break
+        elif attempts >= policy.limit:
+            break
+        logger.warning("Failure in action. Sleeping %.1f and retrying", delay)
+        #  wait a little, unless interrupted (sleep returns False)
+        if sleep(delay) is False:
+            logger.warning("Interrupted, not retrying")
+            break
+    logger.error("No more retries allowed. Failing step after %d attempts", attempts)
+    return False, attempts
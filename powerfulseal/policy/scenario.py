@@ -13,7 +13,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from powerfulseal import makeLogger
 
 from ..metriccollectors.stdout_collector import StdoutCollector
@@ -23,6 +25,47 @@ from .action_kubectl import ActionKubectl
 from .action_probe_http import ActionProbeHTTP
 from .action_clone import ActionClone
 from .action_alertmanager import ActionAlertManager
+from .action_wait_for import ActionWaitFor
+from .scenario_plan import compile_scenario, compile_steps
+from .retry import call_with_retries
+from .waiter import Waiter
+
+# defaults for the cleanup (see the `cleanup` config of the policy)
+CLEANUP_TIMEOUT = 600
+CLEANUP_ACTION_TIMEOUT = 300
+CLEANUP_MAX_CONCURRENT = 8
+
+CLEANUP_SUCCESS = "success"
+CLEANUP_FAILURE = "failure"
+CLEANUP_TIMED_OUT = "timeout"
+
+
+def run_with_timeout(fn, timeout, logger, name):
+    """ Calls fn in a daemon thread, and waits up to timeout seconds for it.
+        Returns whether it finished, and what it returned (False if it
+        raised, logged). A call that doesn't finish keeps running in the
+        background, and its end is logged when it eventually finishes.
+    """
+    result = []
+    abandoned = threading.Event()
+    def target():
+        try:
+            ret = fn()
+        except Exception:
+            logger.exception("Cleanup %s raised an exception", name)
+            ret = False
+        result.append(ret)
+        if abandoned.is_set():
+            logger.warning("Cleanup %s finished after it was given up on (returned %r)",
+                name, ret)
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(max(timeout, 0))
+    if not result:
+        abandoned.set()
+        return False, None
+    return True, result[0]
+
 
 class Scenario():
     """
@@ -30,7 +73,9 @@ class Scenario():
     """
 
     def __init__(self, name, schema, inventory, k8s_inventory,
-        driver, executor, logger=None, metric_collector=None):
+        driver, executor, logger=None, metric_collector=None, waiter=None,
+        cleanup_timeout=CLEANUP_TIMEOUT, cleanup_action_timeout=CLEANUP_ACTION_TIMEOUT,
+        cleanup_max_concurrent=CLEANUP_MAX_CONCURRENT):
         self.name = name
         self.schema = schema
         self.inventory = inventory
@@ -39,94 +84,179 @@ class Scenario():
         self.driver = driver
         self.logger = logger or makeLogger(__name__, name)
         self.metric_collector = metric_collector or StdoutCollector()
+        self.waiter = waiter or Waiter()
         self.action_mapping = dict(
             nodeAction=self.action_nodes,
             podAction=self.action_pods,
             kubectl=self.action_kubectl,
             probeHTTP=self.action_probe_http,
             wait=self.action_wait,
+            waitFor=self.action_wait_for,
             clone=self.action_clone,
-            alertManagerAction=self.action_alertmanager
+            alertManagerAction=self.action_alertmanager,
+            parallel=self.action_parallel,
         )
+        self.cleanup_timeout = cleanup_timeout
+        self.cleanup_action_timeout = cleanup_action_timeout
+        self.cleanup_max_concurrent = cleanup_max_concurrent
+        # a chain of cleanup actions for every action that needs cleanup
         self.cleanup_list = []
+        # steps running in a parallel group collect their cleanup separately
+        self.local = threading.local()
 
     def execute(self):
         """
             Main entry point to starting a scenario.
         """
-        steps = self.schema.get("steps", [])
+        steps = compile_scenario(self.schema).steps
         self.logger.info("Starting scenario '%s' (%d steps)", self.name, len(steps))
-        for step in steps:
-            for action_name, action_method in self.action_mapping.items():
-                if action_name in step:
-                    step_action = step.get(action_name)
-                    ret = self.retry(step_action, action_method)
-                    if not ret:
-                        self.logger.warning("Step returned failure %s. Finishing scenario early", step)
-                        self.metric_collector.add_scenario_counter_metric(self.name, False)
-                        self.cleanup()
-                        return False
+        for step_plan in steps:
+            if self.waiter.stopped:
+                self.logger.warning("Interrupted, skipping the remaining steps")
+                self.metric_collector.add_scenario_counter_metric(self.name, False)
+                self.cleanup()
+                return False
+            ret = self.execute_step(step_plan)
+            if not ret:
+                self.logger.warning("Step returned failure %s. Finishing scenario early",
+                    step_plan.step)
+                self.metric_collector.add_scenario_counter_metric(self.name, False)
+                self.cleanup()
+                return False
         self.logger.info("Scenario finished")
         self.metric_collector.add_scenario_counter_metric(self.name, True)
         self.cleanup()
         return True
 
-    def retry(self, step_action, action_method):
-        ret = False
-        if "retries" in step_action.keys():
-            step_retry = step_action['retries']
-            if "retriesTimeout" in step_retry.keys():
-                final_timeout = step_retry.get('retriesTimeout', {}).get('timeout', 60)
-                retry_sleep = step_retry.get('retriesTimeout', {}).get('sleep', 30)
-                timer = 0
-                while timer < final_timeout:
-                    ret = action_method(schema=step_action)
-                    if ret:
-                        return ret
-                    else:
-                        self.logger.warning("Failure in action. Sleeping %s and retrying", retry_sleep)
-                        #  wait a little
-                        time.sleep(retry_sleep)
-                        timer += retry_sleep
-                self.logger.error("No more retries allowed. Failing step")
-                return False
-
-            elif 'retriesCount' in step_retry.keys():
-                final_count = step_retry.get('retriesCount', {}).get('count', 1)
-                retry_sleep = step_retry.get('retriesCount', {}).get('sleep', 30)
-                counter = 0
-                while counter < final_count:
-                    ret = action_method(schema=step_action)
-                    if ret:
-                        return ret
-                    else:
-                        self.logger.warning("Failure in action. Sleeping %s and retrying", retry_sleep)
-                        #  wait a little
-                        time.sleep(retry_sleep)
-                        counter += 1
-                self.logger.error("No more retries allowed. Failing step")
-                return False
+    def execute_step(self, step_plan):
+        """ Executes a single (compiled) step, with its retries.
+        """
+        ret = True
+        for action_plan in step_plan.actions:
+            action_method = self.action_mapping.get(action_plan.name)
+            if action_method is None:
+                continue
+            ret = self.retry(action_plan, action_method)
+            if not ret:
+                return ret
+        return ret
 
-        else:
-            ret = action_method(schema=step_action)
+    def retry(self, action_plan, action_method):
+        if action_plan.retries is None:
+            return action_method(schema=action_plan.schema)
+        ret, attempts = call_with_retries(
+            lambda: action_method(schema=action_plan.schema),
+            action_plan.retries,
+            logger=self.logger,
+            sleep=self.waiter.sleep,
+        )
+        self.metric_collector.add_step_attempts_metric(self.name, action_plan.name, attempts)
         return ret
 
     def cleanup(self):
+        """ Runs the cleanup chains concurrently (up to cleanup_max_concurrent
+            at a time), each action of a chain after the previous one. Every
+            action gets up to cleanup_action_timeout seconds, and the whole
+            cleanup up to cleanup_timeout seconds.
+        """
         if not self.cleanup_list:
             self.logger.debug("No cleanup needed")
             return
-        self.logger.info("Cleanup started (%d items)", len(self.cleanup_list))
-        for action in self.cleanup_list:
-            action.execute()
-        self.cleanup_list = []
-        self.logger.info("Cleanup done")
+        chains, self.cleanup_list = self.cleanup_list, []
+        self.logger.info("Cleanup started (%d chains, %d items)",
+            len(chains), sum(len(chain) for chain in chains))
+        deadline = time.monotonic() + self.cleanup_timeout
+        semaphore = threading.Semaphore(self.cleanup_max_concurrent)
+        threads = []
+        for chain in chains:
+            thread = threading.Thread(
+                target=self.run_cleanup_chain,
+                args=(chain, deadline, semaphore),
+                daemon=True,
+            )
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join(max(deadline - time.monotonic(), 0))
+        unfinished = len([thread for thread in threads if thread.is_alive()])
+        if unfinished:
+            self.logger.error("Cleanup timed out after %ss, %d chains unfinished",
+                self.cleanup_timeout, unfinished)
+        else:
+            self.logger.info("Cleanup done")
+
+    def run_cleanup_chain(self, chain, deadline, semaphore):
+        """ Runs cleanup actions that depend on each other, in order. A
+            failure doesn't stop the chain, but a timeout does, as the
+            action might still be running.
+        """
+        with semaphore:
+            for i, action in enumerate(chain):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.logger.error("No time left to clean up, skipping %d actions",
+                        len(chain) - i)
+                    return
+                start = time.monotonic()
+                name = type(action).__name__
+                done, ret = run_with_timeout(action.execute,
+                    min(self.cleanup_action_timeout, remaining), self.logger, name)
+                seconds = time.monotonic() - start
+                if not done:
+                    self.logger.error(
+                        "Cleanup %s timed out after %.1fs, giving up on it (it may still "
+                        "be running in the background), skipping %d actions",
+                        name, seconds, len(chain) - i - 1)
+                    self.metric_collector.add_cleanup_metric(self.name, name, seconds,
+                        CLEANUP_TIMED_OUT)
+                    return
+                if ret is False:
+                    self.logger.warning("Cleanup %s failed", name)
+                self.metric_collector.add_cleanup_metric(self.name, name, seconds,
+                    CLEANUP_FAILURE if ret is False else CLEANUP_SUCCESS)
+
+    def get_cleanup_list(self):
+        return getattr(self.local, "cleanup_list", self.cleanup_list)
 
     def execute_action(self, action):
         ret_val = action.execute()
-        for action in action.get_cleanup_actions():
-            self.cleanup_list.append(action)
+        cleanup_actions = list(action.get_cleanup_actions())
+        if cleanup_actions:
+            self.get_cleanup_list().append(cleanup_actions)
         return ret_val
 
+    def execute_branch(self, step_plan):
+        """ Executes one of the steps of a parallel group.
+            Returns its result, and its cleanup actions.
+        """
+        self.local.cleanup_list = []
+        try:
+            ret = self.execute_step(step_plan)
+        except Exception:
+            self.logger.exception("Exception in parallel step %s", step_plan.step)
+            ret = False
+        finally:
+            cleanup_list = self.local.cleanup_list
+            del self.local.cleanup_list
+        return ret, cleanup_list
+
+    def action_parallel(self, schema):
+        """ Runs steps concurrently, and waits for all of them.
+            Cleanup actions are merged in the order of the steps.
+        """
+        steps = compile_steps(schema.get("steps", []))
+        self.logger.info("Running %d steps in parallel", len(steps))
+        with ThreadPoolExecutor(max_workers=max(len(steps), 1)) as executor:
+            results = list(executor.map(self.execute_branch, steps))
+        success = True
+        cleanup_list = self.get_cleanup_list()
+        for step_plan, (ret, branch_cleanup_list) in zip(steps, results):
+            cleanup_list.extend(branch_cleanup_list)
+            if not ret:
+                self.logger.warning("Parallel step returned failure %s", step_plan.step)
+                success = False
+        return success
+
     def action_nodes(self, schema):
         action = ActionNodes(
             schema=schema,
@@ -134,6 +264,8 @@ class Scenario():
             inventory=self.inventory,
             driver=self.driver,
             executor=self.executor,
+            metric_collector=self.metric_collector,
+            waiter=self.waiter,
         )
         return self.execute_action(action)
 
@@ -144,6 +276,8 @@ class Scenario():
             inventory=self.inventory,
             k8s_inventory=self.k8s_inventory,
             executor=self.executor,
+            metric_collector=self.metric_collector,
+            waiter=self.waiter,
         )
         return self.execute_action(action)
 
@@ -168,9 +302,19 @@ class Scenario():
         """
         sleep_time = schema.get("seconds", 0.0)
         self.logger.info("Sleeping for %r seconds", sleep_time)
-        time.sleep(sleep_time)
+        self.waiter.sleep(sleep_time)
         return True
 
+    def action_wait_for(self, schema):
+        action = ActionWaitFor(
+            schema=schema,
+            name=self.name,
+            k8s_inventory=self.k8s_inventory,
+            metric_collector=self.metric_collector,
+            waiter=self.waiter,
+        )
+        return self.execute_action(action)
+
     def action_clone(self, schema):
         action = ActionClone(
             schema=schema,
@@ -0,0 +1,58 @@
+# Copyright 2017 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import namedtuple
+
+from .filter_pipeline import CompileCache
+from .retry import parse_retries
+
+# large policies have one plan per scenario, and one per group of steps
+MAX_PLANS = 8192
+
+# an action of a step (in a valid policy, there's exactly one per step)
+ActionPlan = namedtuple("ActionPlan", ["name", "schema", "retries"])
+StepPlan = namedtuple("StepPlan", ["step", "actions"])
+ScenarioPlan = namedtuple("ScenarioPlan", ["name", "steps"])
+
+
+def compile_step(step):
+    return StepPlan(step, tuple(
+        ActionPlan(name, schema, parse_retries(schema))
+        for name, schema in step.items()
+    ))
+
+
+def make_steps_plan(steps):
+    return tuple(compile_step(step) for step in steps)
+
+
+def make_scenario_plan(schema):
+    return ScenarioPlan(schema.get("name"), compile_steps(schema.get("steps", [])))
+
+
+_steps_plans = CompileCache(make_steps_plan, max_size=MAX_PLANS)
+_scenario_plans = CompileCache(make_scenario_plan, max_size=MAX_PLANS)
+
+
+def compile_steps(steps):
+    """ Returns the (cached) plans of a list of steps.
+    """
+    return _steps_plans.get(steps)
+
+
+def compile_scenario(schema):
+    """ Returns the (cached) plan of a scenario, which only changes with
+        the scenario's content.
+    """
+    return _scenario_plans.get(schema)
@@ -0,0 +1,187 @@
+# Copyright 2017 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import heapq
+import itertools
+import random
+import threading
+from datetime import datetime, timedelta
+
+# minute, hour, day of month, month, day of week (0 and 7 are Sunday)
+CRON_FIELDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+# give up looking for the next match after that many years (e.g. 30 2 31 2 *)
+CRON_MAX_YEARS = 5
+
+
+def parse_cron_field(field, low, high):
+    """ Parses a field of a cron expression into the set of values it
+        allows. Supports `*`, values, ranges (`a-b`), steps (`*/n`, `a-b/n`)
+        and lists of them.
+    """
+    values = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, step = part.split("/", 1)
+            step = int(step)
+            if step < 1:
+                raise ValueError("Invalid step in cron field %r" % field)
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(value) for value in part.split("-", 1))
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end:
+            raise ValueError("Invalid cron field %r" % field)
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule():
+    """ A standard, 5-field cron expression, in local time. Like cron,
+        when both the day of month and the day of week are restricted,
+        a day matching either of them matches.
+    """
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != len(CRON_FIELDS):
+            raise ValueError("Expected 5 fields in cron expression %r" % expression)
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = [
+            parse_cron_field(field, low, high)
+            for field, (low, high) in zip(fields, CRON_FIELDS)
+        ]
+        # cron counts from Sunday, datetime from Monday
+        self.weekdays = {(day - 1) % 7 for day in weekdays}
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    def match_day(self, date):
+        day = date.day in self.days
+        weekday = date.weekday() in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, timestamp):
+        """ Returns the first time after a timestamp matching the expression.
+        """
+        date = datetime.fromtimestamp(timestamp).replace(second=0, microsecond=0)
+        date += timedelta(minutes=1)
+        limit = date + timedelta(days=366 * CRON_MAX_YEARS)
+        while date < limit:
+            if date.month not in self.months:
+                date = (date.replace(day=1) + timedelta(days=32)).replace(
+                    day=1, hour=0, minute=0)
+            elif not self.match_day(date):
+                date = (date + timedelta(days=1)).replace(hour=0, minute=0)
+            elif date.hour not in self.hours:
+                date = (date + timedelta(hours=1)).replace(minute=0)
+            elif date.minute not in self.minutes:
+                date += timedelta(minutes=1)
+            else:
+                return date.timestamp()
+        raise ValueError("Cron expression %r never matches" % self.expression)
+
+
+class ScenarioSchedule():
+    """ When a scenario runs: every `intervalSeconds`, or following a
+        `cron` expression, plus a random delay of up to `jitterSeconds`.
+        Without either, it waits a random time between the policy's
+        `minSecondsBetweenRuns` and `maxSecondsBetweenRuns`.
+    """
+
+    def __init__(self, schema=None, wait_min=0, wait_max=300):
+        schema = schema or {}
+        self.interval = schema.get("intervalSeconds")
+        self.jitter = schema.get("jitterSeconds", 0)
+        self.cron = CronSchedule(schema["cron"]) if "cron" in schema else None
+        self.wait_min = wait_min
+        self.wait_max = wait_max
+
+    def first_run(self, now):
+        """ The time of the first run: straight away (plus the jitter),
+            unless it follows a cron expression.
+        """
+        if self.cron is not None:
+            return self.next_run(now)
+        return now + random.uniform(0, self.jitter)
+
+    def next_run(self, now):
+        """ The time of the next run, for a run that finished at `now`.
+        """
+        if self.cron is not None:
+            planned = self.cron.next_after(now)
+        elif self.interval is not None:
+            planned = now + self.interval
+        else:
+            planned = now + random.uniform(self.wait_min, self.wait_max)
+        return planned + random.uniform(0, self.jitter)
+
+
+class Scheduler():
+    """ A priority queue of the next run time of every scenario.
+        Rescheduling a scenario replaces its previous time.
+    """
+
+    def __init__(self):
+        self.heap = []
+        # key -> (planned time, sequence) of its current entry
+        self.entries = dict()
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+
+    def schedule(self, key, planned):
+        with self.lock:
+            entry = (planned, next(self.counter))
+            self.entries[key] = entry
+            heapq.heappush(self.heap, (entry[0], entry[1], key))
+
+    def remove(self, key):
+        with self.lock:
+            # its entry in the heap is skipped when it comes up
+            self.entries.pop(key, None)
+
+    def is_current(self, planned, sequence, key):
+        return self.entries.get(key) == (planned, sequence)
+
+    def next_time(self):
+        """ The next planned time, or None if nothing is scheduled.
+        """
+        with self.lock:
+            while self.heap and not self.is_current(*self.heap[0]):
+                heapq.heappop(self.heap)
+            return self.heap[0][0] if self.heap else None
+
+    def pop_due(self, now):
+        """ Returns the (planned time, key) of every scenario due at `now`,
+            earliest first, and unschedules them.
+        """
+        due = []
+        with self.lock:
+            while self.heap and self.heap[0][0] <= now:
+                planned, sequence, key = heapq.heappop(self.heap)
+                if self.is_current(planned, sequence, key):
+                    del self.entries[key]
+                    due.append((planned, key))
+        return due
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,84 @@
+# Copyright 2017 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+
+
+class Waiter():
+    """ Waits that can be cut short, shared by the runners, scenarios and
+        actions.
+
+        sleep() is only interrupted by stop() (on SIGTERM), so that
+        scenarios wrap up and clean up quickly. wait_for_trigger(), used
+        between runs, is also interrupted by wake() (the policy changed)
+        and trigger() (a run was requested over HTTP). A wake-up that comes
+        while nobody is waiting isn't lost: the next wait returns straight
+        away.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.stopped = False
+        self.woken = False
+        self.triggered = False
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+
+    def wake(self):
+        with self.condition:
+            self.woken = True
+            self.condition.notify_all()
+
+    def trigger(self):
+        with self.condition:
+            self.triggered = True
+            self.woken = True
+            self.condition.notify_all()
+
+    def consume_trigger(self):
+        """ Returns whether a run was triggered since the last call.
+        """
+        with self.condition:
+            triggered, self.triggered = self.triggered, False
+            return triggered
+
+    def wait(self, seconds, interrupted, consume_wakeup=False):
+        """ Waits until interrupted() (called with the lock held) is true,
+            up to a number of seconds. Returns False if it was cut short.
+        """
+        deadline = time.monotonic() + seconds
+        with self.condition:
+            while not interrupted():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return True
+                self.condition.wait(remaining)
+            if consume_wakeup:
+                self.woken = False
+            return False
+
+    def sleep(self, seconds):
+        """ Sleeps, unless stopped. Returns False if it was cut short.
+        """
+        return self.wait(seconds, lambda: self.stopped)
+
+    def wait_for_trigger(self, seconds):
+        """ Waits until the next run, unless stopped, woken up or
+            triggered. Returns False if it was cut short.
+        """
+        return self.wait(seconds, lambda: self.stopped or self.woken, consume_wakeup=True)
@@ -53,11 +53,27 @@ def index(path):
         policy=yaml.dump(policy),
     )
 
-def start_server(host, port, read_policy_fn, accept_proxy_headers=False, logger=None):
+def trigger():
+    """ Starts the next run now, instead of waiting for it.
+    """
+    config["trigger"]()
+    return jsonify(dict(triggered=True))
+
+def enable_trigger(flask_app, trigger_fn):
+    """ Registers POST /api/trigger. It has no authentication, so it's only
+        registered when explicitly enabled (--enable-trigger).
+    """
+    config["trigger"] = trigger_fn
+    flask_app.add_url_rule('/api/trigger', 'trigger', trigger, methods=['POST'])
+
+def start_server(host, port, read_policy_fn, accept_proxy_headers=False, logger=None,
+        trigger_fn=None):
     if accept_proxy_headers:
         app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_port=1, x_prefix=1)
     config["read_policy"] = read_policy_fn
     config["logger"] = logger
+    if trigger_fn is not None:
+        enable_trigger(app, trigger_fn)
     threading.Thread(target=app.run, args=(host, port), daemon=True).start()
 
 
@@ -1,4 +1,6 @@
+import boto3
 import pytest
+from botocore.stub import Stubber
 from mock import patch, MagicMock
 from powerfulseal.clouddrivers import aws_driver
 from powerfulseal.node import Node
@@ -49,3 +51,98 @@ def test_get_by_ip_no_nodes(create_connection_from_config, ec2_instances):
     driver.remote_servers = ec2_instances
     nodes = driver.get_by_ip(INVALID_IP)
     assert nodes is None
+
+def make_resource(region):
+    return boto3.resource(
+        "ec2", region_name=region,
+        aws_access_key_id="key", aws_secret_access_key="secret",
+    )
+
+def make_reservations(*ids):
+    return [{"Instances": [{
+        "InstanceId": id,
+        "PrivateIpAddress": "10.0.0.%d" % i,
+        "Placement": {"AvailabilityZone": "us-east-1a"},
+        "State": {"Name": "running"},
+    } for i, id in enumerate(ids)]}]
+
+def test_parse_filter():
+    assert aws_driver.parse_filter("tag:team=a,b") == dict(Name="tag:team", Values=["a", "b"])
+    for text in ["vpc-id", "=vpc-1", "vpc-id="]:
+        with pytest.raises(ValueError):
+            aws_driver.parse_filter(text)
+
+def test_make_filters():
+    vpc = dict(Name="vpc-id", Values=["vpc-1"])
+    assert aws_driver.make_filters() == []
+    assert aws_driver.make_filters([vpc], "chaos") == [
+        vpc, dict(Name="tag-key", Values=["kubernetes.io/cluster/chaos"]),
+    ]
+
+@patch('powerfulseal.clouddrivers.aws_driver.create_connection_from_config')
+def test_sync_lists_all_the_pages_once(create_connection_from_config):
+    conn = make_resource("us-east-1")
+    create_connection_from_config.return_value = conn
+    filters = [dict(Name="vpc-id", Values=["vpc-1"])]
+    driver = aws_driver.AWSDriver(filters=filters)
+    with Stubber(conn.meta.client) as stubber:
+        stubber.add_response(
+            "describe_instances",
+            {"Reservations": make_reservations("i-1", "i-2"), "NextToken": "page2"},
+            {"Filters": filters},
+        )
+        stubber.add_response(
+            "describe_instances",
+            {"Reservations": make_reservations("i-3")},
+            {"Filters": filters, "NextToken": "page2"},
+        )
+        driver.sync()
+        assert [node.id for node in driver.remote_servers] == ["i-1", "i-2", "i-3"]
+        # looking nodes up doesn't list the instances again
+        assert driver.get_by_ip("10.0.0.1").id == "i-2"
+        assert driver.get_by_ip("10.0.0.9") is None
+        stubber.assert_no_pending_responses()
+
+@patch('powerfulseal.clouddrivers.aws_driver.create_connection_from_config')
+def test_sync_fetches_every_region(create_connection_from_config):
+    conns = dict(eu=MagicMock(), us=MagicMock())
+    create_connection_from_config.side_effect = lambda region: conns[region]
+    conns["eu"].instances.all.return_value = [EC2instance(
+        id="i-eu", private_ip_address="10.0.0.1", zone="eu-west-1a",
+        public_ip_address=None, state="Running")]
+    conns["us"].instances.all.return_value = [EC2instance(
+        id="i-us", private_ip_address="10.0.0.2", zone="us-east-1a",
+        public_ip_address=None, state="Running")]
+    driver = aws_driver.AWSDriver(regions=["eu", "us"])
+    driver.sync()
+    assert [server.id for server in driver.remote_servers] == ["i-eu", "i-us"]
+    node = driver.get_by_ip("10.0.0.2")
+    driver.stop(node)
+    conns["us"].instances.filter.assert_called_once_with(InstanceIds=["i-us"])
+    conns["us"].instances.filter.return_value.stop.assert_called_once_with()
+    conns["eu"].instances.filter.assert_not_called()
+
+@patch('powerfulseal.clouddrivers.aws_driver.create_connection_from_config')
+def test_stop_many_stops_the_nodes_in_one_call(create_connection_from_config):
+    conn = make_resource("us-east-1")
+    create_connection_from_config.return_value = conn
+    driver = aws_driver.AWSDriver()
+    nodes = [Node(id="i-%d" % i) for i in range(50)]
+    with Stubber(conn.meta.client) as stubber:
+        stubber.add_response(
+            "stop_instances", {}, {"InstanceIds": [node.id for node in nodes]})
+        assert driver.stop_many(nodes) == [None] * 50
+        stubber.assert_no_pending_responses()
+
+@patch('powerfulseal.clouddrivers.aws_driver.create_connection_from_config')
+def test_start_many_calls_every_region(create_connection_from_config):
+    conns = dict(eu=MagicMock(), us=MagicMock())
+    create_connection_from_config.side_effect = lambda region: conns[region]
+    driver = aws_driver.AWSDriver(regions=["eu", "us"])
+    driver.instance_regions = {"i-1": "eu", "i-2": "us", "i-3": "eu"}
+    error = Exception("something bad")
+    conns["us"].meta.client.start_instances.side_effect = error
+    nodes = [Node(id="i-1"), Node(id="i-2"), Node(id="i-3")]
+    assert driver.start_many(nodes) == [None, error, None]
+    conns["eu"].meta.client.start_instances.assert_called_once_with(InstanceIds=["i-1", "i-3"])
+    conns["us"].meta.client.start_instances.assert_called_once_with(InstanceIds=["i-2"])
@@ -126,3 +126,76 @@ def test_get_by_ip_no_nodes(create_connection_from_config, vm_instances):
     driver.network_client = vm_instances[2].network_stuff
     nodes = driver.get_by_ip(INVALID_IP)
     assert nodes is None
+
+def make_nic(vm, rg, ifname):
+    ipconfigs = vm.network_stuff.network_interfaces.theif.ip_configurations
+    return MagicMock(
+        id=VMNetID(rg.lower(), ifname).id,
+        ip_configurations=ipconfigs,
+    )
+
+@patch('powerfulseal.clouddrivers.azure_driver.create_connection_from_config')
+def test_sync_lists_the_network_once(create_connection_from_config, vm_instances):
+    resource_client, compute_client, network_client = MagicMock(), MagicMock(), MagicMock()
+    create_connection_from_config.return_value = (resource_client, compute_client, network_client)
+    rg = "MC_test-rg-2_westus"
+    compute_client.virtual_machines.list.return_value = vm_instances
+    network_client.network_interfaces.list.return_value = [
+        make_nic(vm, rg, ifname) for vm, ifname in zip(vm_instances, ["two", "four", "six"])
+    ]
+    network_client.public_ip_addresses.list.return_value = [
+        vm.network_stuff.public_ip_addresses.theIP for vm in vm_instances[:2]
+    ]
+    driver = azure_driver.AzureDriver(cluster_node_rg_name=rg)
+    driver.sync()
+    for private_ip, public_ip in zip(PRIVATE_IPS, PUBLIC_IPS + [None]):
+        node = driver.get_by_ip(private_ip)
+        assert node.ip == private_ip
+        assert node.extIp == (public_ip or private_ip)
+    assert driver.get_by_ip(PUBLIC_IPS[1]).name == "aks-workers-67219403-1"
+    network_client.network_interfaces.list.assert_called_once_with(rg.lower())
+    network_client.public_ip_addresses.list.assert_called_once_with(rg.lower())
+    network_client.network_interfaces.get.assert_not_called()
+    network_client.public_ip_addresses.get.assert_not_called()
+
+@patch('powerfulseal.clouddrivers.azure_driver.create_connection_from_config')
+def test_get_resource_groups_is_memoized(create_connection_from_config):
+    resource_client = MagicMock()
+    create_connection_from_config.return_value = (resource_client, MagicMock(), MagicMock())
+    resource_client.resource_groups.get.return_value.id = "/subscriptions/1/resourceGroups/cluster"
+    other_rg = MagicMock(managed_by=None)
+    node_rg = MagicMock(managed_by="/subscriptions/1/resourceGroups/cluster/providers/aks")
+    node_rg.name = "MC_cluster"
+    driver = azure_driver.AzureDriver(cluster_rg_name="cluster")
+    # not found: not looked for again straight away
+    resource_client.resource_groups.list.return_value = [other_rg]
+    driver.getResourceGroups()
+    driver.getResourceGroups()
+    assert driver.cluster_node_rg is None
+    assert resource_client.resource_groups.list.call_count == 1
+    # found: kept
+    driver.cluster_node_rg_checked -= azure_driver.RESOURCE_GROUP_RETRY_SECONDS
+    resource_client.resource_groups.list.return_value = [other_rg, node_rg]
+    driver.getResourceGroups()
+    driver.getResourceGroups()
+    assert driver.cluster_node_rg == "MC_cluster"
+    assert resource_client.resource_groups.list.call_count == 2
+
+@patch('powerfulseal.clouddrivers.azure_driver.create_connection_from_config')
+def test_stop_many_begins_all_the_operations_first(create_connection_from_config):
+    compute_client = MagicMock()
+    create_connection_from_config.return_value = (MagicMock(), compute_client, MagicMock())
+    calls = []
+    error = Exception("something bad")
+    def begin_power_off(rg, name):
+        calls.append(("begin", name))
+        if name == "b":
+            raise error
+        poller = MagicMock()
+        poller.wait.side_effect = lambda: calls.append(("wait", name))
+        return poller
+    compute_client.virtual_machines.begin_power_off.side_effect = begin_power_off
+    driver = azure_driver.AzureDriver(cluster_node_rg_name="rg")
+    nodes = [Node(id=name, name=name) for name in ["a", "b", "c"]]
+    assert driver.stop_many(nodes) == [None, error, None]
+    assert calls == [("begin", "a"), ("begin", "b"), ("begin", "c"), ("wait", "a"), ("wait", "c")]
@@ -15,10 +15,102 @@
 
 
 import pytest
-from powerfulseal.clouddrivers import AbstractDriver
+from mock import MagicMock
+from powerfulseal.clouddrivers import AbstractDriver, NoCloudDriver
 
 def test_driver_is_abstract():
     class TestDriver(AbstractDriver):
         pass
     with pytest.raises(TypeError):
         TestDriver(driver=None)
+
+
+def test_driver_requires_the_ip_index_hooks():
+    class TestDriver(AbstractDriver):
+        def sync(self):
+            pass
+        def stop(self, node):
+            pass
+        def start(self, node):
+            pass
+        def delete(self, node):
+            pass
+    with pytest.raises(TypeError):
+        TestDriver()
+
+
+class ListDriver(AbstractDriver):
+    """ Servers are (id, [ips]) tuples.
+    """
+
+    def __init__(self, logger=None):
+        self.logger = logger or MagicMock()
+        self.calls = 0
+
+    def sync(self):
+        pass
+
+    def get_server_addresses(self, server):
+        self.calls += 1
+        return server[1]
+
+    def create_node(self, server, address):
+        return server[0]
+
+    def stop(self, node):
+        pass
+
+    def start(self, node):
+        pass
+
+    def delete(self, node):
+        pass
+
+
+def test_get_by_ip_indexes_the_servers_once():
+    driver = ListDriver()
+    driver.remote_servers = [
+        ("a", ["10.0.0.1", None]),
+        ("b", ["10.0.0.2", "1.2.3.4"]),
+        ("c", ["10.0.0.2"]),
+        ("d", []),
+    ]
+    assert driver.get_by_ip("10.0.0.1") == "a"
+    assert driver.get_by_ip("1.2.3.4") == "b"
+    # the first server with an IP wins
+    assert driver.get_by_ip("10.0.0.2") == "b"
+    assert driver.get_by_ip("10.0.0.3") is None
+    assert driver.get_by_ip(None) is None
+    assert driver.calls == 4
+    driver.logger.warning.assert_called_once()
+
+
+def test_get_by_ip_reindexes_after_a_sync():
+    driver = ListDriver()
+    driver.remote_servers = [("a", ["10.0.0.1"])]
+    assert driver.get_by_ip("10.0.0.1") == "a"
+    driver.remote_servers = [("b", ["10.0.0.1"])]
+    assert driver.get_by_ip("10.0.0.1") == "b"
+    assert driver.calls == 2
+
+
+def test_no_cloud_driver_makes_up_nodes():
+    driver = NoCloudDriver(logger=MagicMock())
+    node = driver.get_by_ip("10.0.0.1")
+    assert node.ip == "10.0.0.1"
+    assert node.id == "fake-10.0.0.1"
+    assert driver.get_server_addresses(None) == []
+
+
+def test_stop_many_stops_every_node():
+    driver = ListDriver()
+    error = Exception("something bad")
+    stopped = []
+    def stop(node):
+        if node == "b":
+            raise error
+        stopped.append(node)
+    driver.stop = stop
+    assert driver.stop_many(["a", "b", "c", "d"]) == [None, error, None, None]
+    assert sorted(stopped) == ["a", "c", "d"]
+    assert driver.stop_many([]) == []
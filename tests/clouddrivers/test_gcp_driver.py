@@ -1,5 +1,8 @@
+import json
 import pytest
 import os
+import googleapiclient.discovery
+from googleapiclient.http import HttpMockSequence
 from mock import patch, MagicMock
 from powerfulseal.clouddrivers import gcp_driver
 from powerfulseal.node import Node
@@ -87,3 +90,96 @@ def test_get_by_ip_no_nodes(create_connection_from_config, compute_instances):
     driver.remote_servers = compute_instances
     nodes = driver.get_by_ip(INVALID_IP)
     assert nodes is None
+
+
+def make_compute(*responses):
+    """ A compute API client answering requests with responses, in order.
+    """
+    http = HttpMockSequence([
+        ({'status': '200'}, json.dumps(response)) for response in responses
+    ])
+    return googleapiclient.discovery.build(
+        'compute', 'v1', http=http, static_discovery=True)
+
+
+def make_scoped_list(zone, *instances):
+    return {'zones/' + zone: {'instances': [
+        Computeinstance(
+            id=id, private_ip_address=ip, zone=zone, public_ip_address=None,
+            state="RUNNING", name=id,
+        ).show_as_dict()
+        for id, ip in instances
+    ]}}
+
+
+def test_list_all_instances_follows_the_pages():
+    items = make_scoped_list("us-central1-a", ("a", "10.0.0.1"))
+    items.update(make_scoped_list("europe-west1-b", ("b", "10.0.0.2")))
+    items.update({'zones/us-central1-c': {'warning': {'code': 'NO_RESULTS_ON_PAGE'}}})
+    compute = make_compute(
+        {'items': items, 'nextPageToken': 'page2'},
+        {'items': make_scoped_list("us-central1-f", ("c", "10.0.0.3"))},
+    )
+    instances = gcp_driver.list_all_instances(compute, "project", ["us-central1"])
+    assert [instance['id'] for instance in instances] == ["a", "c"]
+    # one request per page, whatever the number of zones
+    assert compute._http._iterable == []
+
+
+@patch('powerfulseal.clouddrivers.gcp_driver.create_connection_from_config')
+def test_sync_fetches_every_project(create_connection_from_config):
+    create_connection_from_config.side_effect = [
+        make_compute({'items': make_scoped_list("us-central1-a", ("a", "10.0.0.1"))}),
+        make_compute({'items': make_scoped_list("europe-west1-b", ("b", "10.0.0.2"))}),
+    ]
+    driver = gcp_driver.GCPDriver(
+        config=GCLOUD_CONFIG,
+        regions=["us-central1", "europe-west1"],
+        projects=["one", "two"],
+    )
+    driver.sync()
+    assert [server['id'] for server in driver.remote_servers] == ["a", "b"]
+    node = driver.get_by_ip("10.0.0.2")
+    assert node.az == "europe-west1-b"
+    assert driver.get_project(node) == "two"
+
+
+class Batch():
+    """ A batch request, calling its callback with the result of every
+        request, raising if its id is in `failing`.
+    """
+
+    def __init__(self, callback, failing=()):
+        self.callback = callback
+        self.failing = failing
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        for request_id, request in self.requests:
+            if request_id in self.failing:
+                self.callback(request_id, None, Exception(request_id))
+            else:
+                self.callback(request_id, request, None)
+
+
+@patch('powerfulseal.clouddrivers.gcp_driver.create_connection_from_config')
+def test_stop_many_stops_the_nodes_in_one_batch(create_connection_from_config):
+    conn = MagicMock()
+    batches = []
+    def new_batch_http_request(callback):
+        batches.append(Batch(callback, failing=["1"]))
+        return batches[-1]
+    conn.new_batch_http_request.side_effect = new_batch_http_request
+    create_connection_from_config.return_value = conn
+    driver = gcp_driver.GCPDriver(config=GCLOUD_CONFIG)
+    nodes = [Node(id=str(i), name="node-%d" % i, az="us-central1-a") for i in range(3)]
+    errors = driver.stop_many(nodes)
+    assert [str(error) if error else None for error in errors] == [None, "1", None]
+    assert len(batches) == 1
+    assert len(batches[0].requests) == 3
+    conn.instances.return_value.stop.assert_any_call(
+        project="marine-foundry-184612", zone="us-central1-a", instance="node-2")
+    conn.instances.return_value.stop.return_value.execute.assert_not_called()
@@ -11,9 +11,12 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import functools
+
 import pytest
 from mock import MagicMock
 
+from powerfulseal.clouddrivers import AbstractDriver
 from powerfulseal.policy.action_kubectl import ActionKubectl
 from powerfulseal.policy.action_probe_http import ActionProbeHTTP
 from powerfulseal.policy.action_nodes import ActionNodes
@@ -30,6 +33,16 @@ class Dummy():
 def make_dummy_object():
     return Dummy()
 
+def make_driver():
+    """ A mock driver, acting on many nodes with the default, one node at a
+        time implementation of the *_many methods.
+    """
+    driver = MagicMock()
+    for name in ["stop", "start", "delete"]:
+        getattr(driver, name + "_many").side_effect = functools.partial(
+            AbstractDriver.run_many, driver, getattr(driver, name))
+    return driver
+
 @pytest.fixture
 def dummy_object():
     return make_dummy_object()
@@ -104,7 +117,7 @@ EXAMPLE_NODE_SCHEMA = {
 @pytest.fixture
 def node_scenario():
     inventory = MagicMock()
-    driver = MagicMock()
+    driver = make_driver()
     executor = MagicMock()
     return ActionNodes(
         name="test scenario",
@@ -0,0 +1,113 @@
+# Copyright 2017 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from mock import MagicMock, patch
+from kubernetes.client.rest import ApiException
+from kubernetes.client import (
+    V1Deployment, V1DeploymentSpec, V1DeploymentList, V1LabelSelector, V1ObjectMeta, V1ListMeta,
+    V1PodTemplateSpec,
+)
+
+from powerfulseal.k8s import K8sClient, DeploymentInformer
+
+
+def make_deployment(name, labels, resource_version="1"):
+    return V1Deployment(
+        metadata=V1ObjectMeta(name=name, namespace="default", resource_version=resource_version),
+        spec=V1DeploymentSpec(selector=V1LabelSelector(match_labels=labels), template=V1PodTemplateSpec()),
+    )
+
+
+@pytest.fixture
+def k8s_client():
+    with patch("kubernetes.config.load_incluster_config"):
+        client = K8sClient()
+    client.client_appsv1api = MagicMock()
+    client.client_appsv1api.read_namespaced_deployment.return_value = make_deployment(
+        "app", {"app": "x"})
+    return client
+
+
+def test_selector_is_read_once_within_ttl(k8s_client):
+    assert k8s_client.get_deployment_selector("default", "app") == "app=x"
+    assert k8s_client.get_deployment_selector("default", "app") == "app=x"
+    assert k8s_client.client_appsv1api.read_namespaced_deployment.call_count == 1
+
+
+def test_selector_is_read_again_after_ttl(k8s_client):
+    k8s_client.deployment_selectors.ttl = -1
+    k8s_client.get_deployment_selector("default", "app")
+    k8s_client.get_deployment_selector("default", "app")
+    assert k8s_client.client_appsv1api.read_namespaced_deployment.call_count == 2
+
+
+def test_selector_from_informer_follows_resource_version(k8s_client):
+    k8s_client.client_appsv1api.list_deployment_for_all_namespaces.return_value = V1DeploymentList(
+        metadata=V1ListMeta(resource_version="1"),
+        items=[make_deployment("app", {"app": "x"})],
+    )
+    informer = DeploymentInformer(k8s_client)
+    informer.resync(reason="initial")
+    k8s_client.deployment_selectors.informer = informer
+    assert k8s_client.get_deployment_selector("default", "app") == "app=x"
+    informer.handle_event(dict(type="MODIFIED",
+        object=make_deployment("app", {"app": "y"}, resource_version="2")))
+    assert k8s_client.get_deployment_selector("default", "app") == "app=y"
+    with pytest.raises(ApiException):
+        k8s_client.get_deployment_selector("default", "missing")
+    k8s_client.client_appsv1api.read_namespaced_deployment.assert_not_called()
+
+
+def make_informer(k8s_client, *deployments):
+    k8s_client.client_appsv1api.list_deployment_for_all_namespaces.return_value = V1DeploymentList(
+        metadata=V1ListMeta(resource_version="1"),
+        items=list(deployments),
+    )
+    informer = DeploymentInformer(k8s_client)
+    informer.resync(reason="initial")
+    k8s_client.deployment_selectors.informer = informer
+    return informer
+
+
+def test_selector_from_api_when_informer_is_stale(k8s_client):
+    informer = make_informer(k8s_client, make_deployment("app", {"app": "old"}))
+    informer.max_staleness = -1
+    assert k8s_client.get_deployment_selector("default", "app") == "app=x"
+    k8s_client.client_appsv1api.read_namespaced_deployment.assert_called_once()
+
+
+def test_selector_from_api_when_informer_is_disabled(k8s_client):
+    informer = make_informer(k8s_client, make_deployment("app", {"app": "old"}))
+    informer.disable(ApiException(status=403, reason="Forbidden"))
+    assert k8s_client.get_deployment_selector("default", "app") == "app=x"
+    k8s_client.client_appsv1api.read_namespaced_deployment.assert_called_once()
+
+
+def test_deleted_deployments_are_dropped(k8s_client):
+    informer = make_informer(k8s_client,
+        make_deployment("app", {"app": "x"}), make_deployment("other", {"app": "z"}))
+    cache = k8s_client.deployment_selectors
+    assert k8s_client.get_deployment_selector("default", "app") == "app=x"
+    assert k8s_client.get_deployment_selector("default", "other") == "app=z"
+    informer.handle_event(dict(type="DELETED", object=make_deployment("app", {"app": "x"})))
+    informer.handle_event(dict(type="DELETED", object=make_deployment("other", {"app": "z"})))
+    # looked up: dropped straight away
+    with pytest.raises(ApiException):
+        k8s_client.get_deployment_selector("default", "app")
+    assert ("default", "app") not in cache.entries
+    # not looked up: dropped when another selector is cached
+    informer.handle_event(dict(type="ADDED", object=make_deployment("new", {"app": "n"}, "3")))
+    assert k8s_client.get_deployment_selector("default", "new") == "app=n"
+    assert set(cache.entries) == {("default", "new")}
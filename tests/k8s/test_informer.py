@@ -0,0 +1,161 @@
+# Copyright 2017 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from mock import MagicMock
+from kubernetes.client.rest import ApiException
+from kubernetes.client import V1Pod, V1ObjectMeta, V1PodStatus, V1PodList, V1ListMeta
+
+from powerfulseal.k8s import K8sInventory, PodInformer
+from powerfulseal.k8s.selector import match_selector
+
+
+def make_v1pod(name, namespace="default", labels=None, resource_version="1"):
+    return V1Pod(
+        metadata=V1ObjectMeta(
+            name=name,
+            namespace=namespace,
+            uid=namespace + "/" + name,
+            labels=labels or {},
+            resource_version=resource_version,
+        ),
+        status=V1PodStatus(phase="Running"),
+    )
+
+
+@pytest.fixture
+def informer():
+    k8s_client = MagicMock()
+    k8s_client.client_corev1api.list_pod_for_all_namespaces.return_value = V1PodList(
+        metadata=V1ListMeta(resource_version="10"),
+        items=[
+            make_v1pod("a", labels={"app": "x"}),
+            make_v1pod("b", labels={"app": "y"}),
+            make_v1pod("c", namespace="other", labels={"app": "x"}),
+        ]
+    )
+    informer = PodInformer(k8s_client, metric_collector=MagicMock())
+    informer.resync(reason="initial")
+    return informer
+
+
+@pytest.mark.parametrize("selector,labels,expected", [
+    ("app=x", {"app": "x"}, True),
+    ("app==x", {"app": "y"}, False),
+    ("app!=x", {"app": "y"}, True),
+    ("app!=x", {}, True),
+    ("app", {"app": "x"}, True),
+    ("!app", {"app": "x"}, False),
+    ("app in (x, y),tier notin (db)", {"app": "y", "tier": "web"}, True),
+    ("app in (x, y),tier notin (db)", {"app": "y", "tier": "db"}, False),
+    ("", {"app": "x"}, True),
+])
+def test_match_selector(selector, labels, expected):
+    assert match_selector(selector, labels) == expected
+
+
+def test_informer_lists_by_namespace_and_selector(informer):
+    names = lambda pods: [p.metadata.name for p in pods]
+    assert names(informer.list_pods()) == ["a", "b", "c"]
+    assert names(informer.list_pods(namespace="default")) == ["a", "b"]
+    assert names(informer.list_pods(selector="app=x")) == ["a", "c"]
+    assert informer.resource_version == "10"
+    informer.metric_collector.add_pod_cache_resync_metric.assert_called_once_with("initial")
+
+
+def test_informer_applies_watch_events(informer):
+    informer.handle_event(dict(type="ADDED", object=make_v1pod("d", resource_version="11")))
+    informer.handle_event(dict(type="DELETED", object=make_v1pod("a", resource_version="12")))
+    informer.handle_event(dict(type="BOOKMARK", raw_object=dict(metadata=dict(resourceVersion="13"))))
+    assert [p.metadata.name for p in informer.list_pods(namespace="default")] == ["b", "d"]
+    assert informer.resource_version == "13"
+
+
+def test_informer_resyncs_on_gone(informer):
+    def watch():
+        if informer.watch.call_count == 1:
+            raise ApiException(status=410)
+        informer.stop()
+    informer.watch = MagicMock(side_effect=watch)
+    informer.resync = MagicMock()
+    informer.run()
+    informer.resync.assert_called_once_with(reason="gone")
+
+
+def test_informer_backs_off_on_errors_without_resyncing(informer):
+    informer._stopped = MagicMock()
+    informer._stopped.is_set.side_effect = [False] * 4 + [True]
+    informer.watch = MagicMock(side_effect=[
+        ApiException(status=500), ApiException(status=500), Exception("boom"), None,
+    ])
+    informer.resync = MagicMock()
+    informer.run()
+    informer.resync.assert_not_called()
+    delays = [c[0][0] for c in informer._stopped.wait.call_args_list]
+    assert delays == [5, 10, 20]
+    assert informer.get_retry_delay(10) == 300
+
+
+def test_informer_goes_stale_when_the_watch_keeps_failing(informer):
+    informer.max_staleness = 60
+    informer._last_heard -= 120
+    informer._stopped = MagicMock()
+    informer._stopped.is_set.side_effect = [False, True]
+    informer.watch = MagicMock(side_effect=ApiException(status=500))
+    informer.run()
+    assert not informer.is_usable()
+
+
+def test_informer_disables_itself_when_forbidden(informer):
+    informer.watch = MagicMock(side_effect=ApiException(status=403, reason="Forbidden"))
+    informer.resync = MagicMock()
+    informer.run()
+    assert informer.disabled
+    assert not informer.has_synced()
+    assert not informer.is_usable()
+    assert informer.watch.call_count == 1
+    informer.resync.assert_not_called()
+
+
+def test_informer_start_disables_itself_when_forbidden():
+    k8s_client = MagicMock()
+    k8s_client.client_corev1api.list_pod_for_all_namespaces.side_effect = ApiException(status=403)
+    informer = PodInformer(k8s_client)
+    informer.start()
+    assert informer.disabled
+    assert informer._thread is None
+    assert not informer.is_usable()
+
+
+def test_inventory_uses_informer(informer):
+    k8s_client = MagicMock()
+    inventory = K8sInventory(k8s_client, pod_informer=informer)
+    pods = inventory.find_pods("default", selector="app=x")
+    assert [p.name for p in pods] == ["a"]
+    k8s_client.list_pods_raw.assert_not_called()
+
+
+def test_inventory_falls_back_when_informer_stale(informer):
+    k8s_client = MagicMock()
+    k8s_client.list_pods_raw.return_value = [(dict(metadata=dict(name="z")), None)]
+    informer.max_staleness = -1
+    inventory = K8sInventory(k8s_client, pod_informer=informer)
+    pods = inventory.find_pods("default")
+    assert [p.name for p in pods] == ["z"]
+
+
+def test_informer_applies_field_selector(informer):
+    pods = informer.list_pods(field_selector="metadata.name!=a,status.phase=Running")
+    assert [p.metadata.name for p in pods] == ["b", "c"]
+    assert informer.list_pods(field_selector="status.phase=Pending") == []
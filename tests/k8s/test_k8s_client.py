@@ -0,0 +1,158 @@
+# Copyright 2017 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+import pytest
+from mock import MagicMock, patch
+from kubernetes.client.rest import ApiException
+from kubernetes.client import V1Namespace, V1NamespaceList, V1ObjectMeta, V1ListMeta
+
+from powerfulseal.k8s import K8sClient
+
+NAMES = ["ns-%d" % i for i in range(5)]
+
+
+@pytest.fixture
+def k8s_client():
+    with patch("kubernetes.config.load_incluster_config"):
+        client = K8sClient(page_size=2)
+    client.client_corev1api = MagicMock()
+    return client
+
+
+def make_page(names, token):
+    return V1NamespaceList(
+        metadata=V1ListMeta(_continue=token),
+        items=[V1Namespace(metadata=V1ObjectMeta(name=name)) for name in names],
+    )
+
+
+def make_gone(token=None):
+    e = ApiException(status=410)
+    e.body = json.dumps(dict(metadata=({"continue": token} if token else {})))
+    return e
+
+
+def names(items):
+    return [item.metadata.name for item in items]
+
+
+def test_list_namespaces_fetches_pages(k8s_client):
+    list_namespace = k8s_client.client_corev1api.list_namespace
+    list_namespace.side_effect = [
+        make_page(NAMES[0:2], "a"),
+        make_page(NAMES[2:4], "b"),
+        make_page(NAMES[4:5], None),
+    ]
+    assert names(k8s_client.list_namespaces()) == NAMES
+    assert [c[1]["_continue"] for c in list_namespace.call_args_list] == [None, "a", "b"]
+    assert all(c[1]["limit"] == 2 for c in list_namespace.call_args_list)
+
+
+def test_list_namespaces_returns_a_list(k8s_client):
+    list_namespace = k8s_client.client_corev1api.list_namespace
+    list_namespace.side_effect = [make_page(NAMES[0:2], "a"), make_page(NAMES[2:4], None)]
+    items = k8s_client.list_namespaces()
+    assert names(items) == NAMES[0:4]
+    assert items[0].metadata.name == NAMES[0]
+
+
+def test_list_namespaces_raises_straight_away(k8s_client):
+    k8s_client.client_corev1api.list_namespace.side_effect = make_gone()
+    with pytest.raises(ApiException):
+        k8s_client.list_namespaces()
+
+
+def test_iter_namespaces_is_lazy(k8s_client):
+    list_namespace = k8s_client.client_corev1api.list_namespace
+    list_namespace.side_effect = [make_page(NAMES[0:2], "a"), make_page(NAMES[2:4], None)]
+    items = k8s_client.iter_namespaces()
+    assert next(items).metadata.name == NAMES[0]
+    assert list_namespace.call_count == 1
+
+
+def test_list_continues_with_inconsistent_token(k8s_client):
+    list_namespace = k8s_client.client_corev1api.list_namespace
+    list_namespace.side_effect = [
+        make_page(NAMES[0:2], "a"),
+        make_gone("c"),
+        make_page(NAMES[2:5], None),
+    ]
+    assert names(k8s_client.list_namespaces()) == NAMES
+    assert list_namespace.call_args_list[2][1]["_continue"] == "c"
+
+
+def test_list_restarts_when_token_expires(k8s_client):
+    list_namespace = k8s_client.client_corev1api.list_namespace
+    list_namespace.side_effect = [
+        make_page(NAMES[0:2], "a"),
+        make_gone(),
+        make_page(NAMES[0:2], "b"),
+        make_page(NAMES[2:5], None),
+    ]
+    assert names(k8s_client.list_namespaces()) == NAMES
+    assert list_namespace.call_args_list[2][1]["_continue"] is None
+
+
+def test_list_raises_gone_on_first_page(k8s_client):
+    k8s_client.client_corev1api.list_namespace.side_effect = make_gone()
+    with pytest.raises(ApiException):
+        list(k8s_client.list_namespaces())
+
+
+def test_list_pods_raw_streams_pages(k8s_client):
+    def make_response(names, token):
+        resp = MagicMock()
+        resp.stream.return_value = [json.dumps(dict(
+            metadata={"continue": token},
+            items=[dict(metadata=dict(name=name, namespace="default")) for name in names],
+        )).encode("utf-8")]
+        return resp
+    responses = [make_response(["a", "b"], "x"), make_response(["c"], "")]
+    list_namespaced_pod = k8s_client.client_corev1api.list_namespaced_pod
+    list_namespaced_pod.side_effect = responses
+    pods = list(k8s_client.list_pods_raw("default"))
+    assert [item["metadata"]["name"] for item, _ in pods] == ["a", "b", "c"]
+    assert list_namespaced_pod.call_args_list[1][1]["_continue"] == "x"
+    for resp in responses:
+        resp.release_conn.assert_called_once_with()
+
+
+def test_list_pods_returns_models_from_all_pages(k8s_client):
+    list_namespaced_pod = k8s_client.client_corev1api.list_namespaced_pod
+    list_namespaced_pod.side_effect = [make_page(NAMES[0:2], "a"), make_page(NAMES[2:5], None)]
+    pods = k8s_client.list_pods("default", selector="app=x")
+    assert isinstance(pods, list)
+    assert names(pods) == NAMES
+    assert list_namespaced_pod.call_args_list[0][1]["label_selector"] == "app=x"
+
+
+def test_scenarios_crd_check_is_cached(k8s_client):
+    k8s_client.client_extensionsApi = MagicMock()
+    k8s_client.client_customObjectsApi = MagicMock()
+    k8s_client.client_customObjectsApi.list_namespaced_custom_object.return_value = dict(
+        metadata={}, items=[dict(metadata=dict(name="a"), spec=dict(name="scenario a"))])
+    assert k8s_client.get_scenarios() == [dict(name="scenario a")]
+    assert k8s_client.get_scenarios() == [dict(name="scenario a")]
+    k8s_client.client_extensionsApi.read_custom_resource_definition.assert_called_once_with(
+        "scenarios.powerfulseal.io")
+
+
+def test_no_scenarios_without_crd(k8s_client):
+    k8s_client.client_extensionsApi = MagicMock()
+    k8s_client.client_extensionsApi.read_custom_resource_definition.side_effect = ApiException(status=404)
+    k8s_client.client_customObjectsApi = MagicMock()
+    assert k8s_client.list_scenarios() == []
+    k8s_client.client_customObjectsApi.list_namespaced_custom_object.assert_not_called()
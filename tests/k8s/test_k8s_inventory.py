@@ -35,4 +35,49 @@ def test_get_pod_metrics():
         assert "openshift-test" in result
         assert "openshift-two" in result
         assert "openshift-three" in result
-        assert "openshift-four" not in result
\ No newline at end of file
+        assert "openshift-four" not in result
+
+def make_raw_pod(name, namespace):
+    return dict(metadata=dict(name=name, namespace=namespace)), None
+
+
+def test_find_pods_lists_namespaces_concurrently_in_order():
+    k8s_client = mock.MagicMock()
+    def list_pods_raw(namespace, **kwargs):
+        if namespace == "broken":
+            raise Exception("boom")
+        return [make_raw_pod(namespace + "-pod", namespace)]
+    k8s_client.list_pods_raw.side_effect = list_pods_raw
+    k8s_inventory = K8sInventory(k8s_client, all_namespaces_threshold=10)
+    pods = k8s_inventory.find_pods("c,broken,a,b")
+    assert [p.name for p in pods] == ["a-pod", "b-pod", "c-pod"]
+    assert [p.num for p in pods] == [0, 1, 2]
+    assert k8s_client.list_pods_raw.call_count == 4
+
+
+def test_find_pods_uses_single_list_above_threshold():
+    k8s_client = mock.MagicMock()
+    k8s_client.list_pods_raw.return_value = [
+        make_raw_pod("x", "a"), make_raw_pod("y", "b"),
+        make_raw_pod("z", "c"), make_raw_pod("w", "d"),
+    ]
+    k8s_inventory = K8sInventory(k8s_client, all_namespaces_threshold=2)
+    pods = k8s_inventory.find_pods("c,a,d")
+    assert [p.name for p in pods] == ["x", "z", "w"]
+    k8s_client.list_pods_raw.assert_called_once_with(
+        namespace="", selector=None, deployment_name=None, field_selector=None)
+
+
+def test_find_deployments_uses_single_list_above_threshold():
+    k8s_client = mock.MagicMock()
+    def make_deployment(name, namespace):
+        item = mock.MagicMock()
+        item.metadata.name = name
+        item.metadata.namespace = namespace
+        return item
+    k8s_client.list_deployments.return_value = [
+        make_deployment("x", "a"), make_deployment("y", "b"), make_deployment("z", "c"),
+    ]
+    k8s_inventory = K8sInventory(k8s_client, all_namespaces_threshold=1)
+    assert k8s_inventory.find_deployments("a,c") == ["x", "z"]
+    k8s_client.list_deployments.assert_called_once_with(namespace="", labels=None)
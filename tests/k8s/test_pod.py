@@ -1,3 +1,5 @@
+import pytest
+
 from powerfulseal.k8s import Pod
 
 EXAMPLE_POD_ARGS1 = dict(
@@ -22,3 +24,15 @@ def test_pods_are_deduplicated_without_uids():
     collection.add(Pod(**EXAMPLE_POD_ARGS2))
     collection.add(Pod(**EXAMPLE_POD_ARGS2))
     assert len(collection) == 1
+
+def test_pods_share_identical_label_maps():
+    pod1 = Pod(labels={"app": "x", "tier": "web"}, **EXAMPLE_POD_ARGS1)
+    pod2 = Pod(labels={"tier": "web", "app": "x"}, **EXAMPLE_POD_ARGS2)
+    assert pod1.labels is pod2.labels
+    assert pod1.labels == {"app": "x", "tier": "web"}
+    assert pod1.annotations is pod2.annotations
+
+def test_pod_labels_are_read_only():
+    pod = Pod(labels={"app": "x"}, **EXAMPLE_POD_ARGS1)
+    with pytest.raises(TypeError):
+        pod.labels["app"] = "y"
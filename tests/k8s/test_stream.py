@@ -0,0 +1,96 @@
+# Copyright 2017 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+import pytest
+from mock import MagicMock
+
+from powerfulseal.k8s import K8sInventory
+from powerfulseal.k8s.stream import ListStream
+
+POD_LIST = {
+    "kind": "PodList",
+    "apiVersion": "v1",
+    "metadata": {"resourceVersion": "123", "continue": ""},
+    "items": [
+        {
+            "metadata": {
+                "name": "pod-é",
+                "namespace": "default",
+                "uid": "uid-1",
+                "labels": {"app": "test"},
+            },
+            "spec": {"nodeName": "node-1", "containers": [{"name": "a"}, {"name": "b"}]},
+            "status": {
+                "phase": "Running",
+                "hostIP": "10.0.0.1",
+                "podIP": "172.16.0.1",
+                "containerStatuses": [
+                    {"name": "a", "containerID": "docker://a", "restartCount": 2,
+                     "image": "a", "imageID": "a", "ready": True, "state": {"running": {}}},
+                    {"name": "b", "containerID": "docker://b", "restartCount": 1,
+                     "image": "b", "imageID": "b", "ready": True, "state": {"running": {}}},
+                ],
+            },
+        },
+        {
+            "metadata": {"name": "pod-2", "namespace": "default", "uid": "uid-2"},
+            "status": {
+                "phase": "Pending",
+                "containerStatuses": [
+                    {"name": "a", "restartCount": 0, "image": "a", "imageID": "a", "ready": False,
+                     "state": {"waiting": {"reason": "CrashLoopBackOff"}}},
+                ],
+            },
+        },
+    ],
+}
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 100000])
+def test_list_stream_decodes_items_across_chunks(chunk_size):
+    data = json.dumps(POD_LIST, indent=2, ensure_ascii=False).encode("utf-8")
+    stream = ListStream(chunked(data, chunk_size))
+    items = list(stream)
+    assert [item for item, _ in items] == POD_LIST["items"]
+    assert [json.loads(raw) for _, raw in items] == POD_LIST["items"]
+    assert stream.metadata["resourceVersion"] == "123"
+
+
+def test_list_stream_empty_list():
+    assert list(ListStream([b'{"metadata": {}, "items": []}'])) == []
+
+
+def test_inventory_builds_slim_pods_and_lazy_meta():
+    k8s_client = MagicMock()
+    k8s_client.list_pods_raw.return_value = list(
+        ListStream([json.dumps(POD_LIST).encode("utf-8")]))
+    inventory = K8sInventory(k8s_client)
+    pod1, pod2 = inventory.find_pods("default")
+    assert pod1.name == "pod-é"
+    assert pod1.container_ids == ["docker://a", "docker://b"]
+    assert pod1.restart_count == 3
+    assert pod1.state == "Running"
+    assert pod1.host_ip == "10.0.0.1"
+    assert pod1.labels == {"app": "test"}
+    assert pod2.state == "CrashLoopBackOff"
+    assert pod2.num == 1
+    assert pod1.raw is not None
+    assert pod1.meta.spec.node_name == "node-1"
+    assert pod1.raw is None
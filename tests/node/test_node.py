@@ -34,8 +34,7 @@ def node():
 
 def test_node_passthrough(node):
     for key, val in EXAMPLE_NODE_ARGS.items():
-        assert key in node.__dict__
-        assert val == node.__dict__.get(key)
+        assert val == getattr(node, key)
 
 def test_node_str(node):
     rep = str(node)
@@ -204,3 +204,20 @@ def test_doesnt_stop_itself(node_scenario):
         args, kwargs = call
         assert args == ([mock_item2, mock_item3],)
         assert kwargs == {}
+
+
+def test_action_stop_stops_the_nodes_at_once(node_scenario):
+    node_scenario.schema["actions"] = [dict(stop=dict())]
+    items = [MagicMock(), MagicMock(), MagicMock()]
+    node_scenario.driver.stop_many.side_effect = None
+    node_scenario.driver.stop_many.return_value = [None, Exception("something bad"), None]
+    node_scenario.metric_collector = MagicMock()
+    node_scenario.logger = MagicMock()
+    assert node_scenario.act(items) is False
+    node_scenario.driver.stop_many.assert_called_once_with(items)
+    node_scenario.driver.stop.assert_not_called()
+    assert node_scenario.metric_collector.add_node_stopped_metric.call_count == 2
+    node_scenario.metric_collector.add_node_stop_failed_metric.assert_called_once_with(items[1])
+    node_scenario.logger.exception.assert_called_once()
+    # a single cleanup starts all the nodes still down
+    assert len(node_scenario.get_cleanup_actions()) == 1
@@ -192,7 +192,7 @@ def test_filter_probability(noop_scenario, proba):
 ])
 def test_action_wait(monkeypatch, noop_scenario, sleep_time):
     sleep_mock = MagicMock()
-    monkeypatch.setattr("time.sleep", sleep_mock)
+    noop_scenario.waiter.sleep = sleep_mock
     criterion = {
         "seconds": sleep_time
     }
@@ -194,3 +194,86 @@ def test_doesnt_kill_itself(pod_scenario):
         args, kwargs = call
         assert args == ([mock_item2],)
         assert kwargs == {}
+
+
+def test_matching_pushes_down_filters(pod_scenario):
+    a = make_dummy_object()
+    a.state = "CrashLoopBackOff"
+    pod_scenario.schema = {
+        "matches": [
+            {
+                "labels": {
+                    "namespace": "something",
+                    "selector": "yes=true",
+                },
+            },
+        ],
+        "filters": [
+            {"property": {"name": "labels.version", "value": "^2$"}},
+            {"property": {"name": "state", "value": "Running"}},
+        ],
+    }
+    pod_scenario.k8s_inventory.find_pods = MagicMock(return_value=[a])
+    matched = pod_scenario.match()
+    assert pod_scenario.k8s_inventory.find_pods.call_args[1] == {
+        "selector": "yes=true,version=2",
+        "field_selector": "status.phase=Running",
+        "namespace": "something",
+    }
+    assert pod_scenario.filter(matched) == []
+
+
+def test_rejecting_probability_skips_matching(pod_scenario):
+    pod_scenario.schema = {
+        "matches": [{"namespace": "a"}, {"namespace": "b"}],
+        "filters": [{"probability": {"probabilityPassAll": 0.5}}],
+    }
+    pod_scenario.metric_collector = MagicMock()
+    pod_scenario.k8s_inventory.find_pods = MagicMock(return_value=[])
+    with patch("random.random", return_value=0.9):
+        assert pod_scenario.execute() is True
+    pod_scenario.k8s_inventory.find_pods.assert_not_called()
+    pod_scenario.metric_collector.add_api_calls_saved_metric.assert_called_once_with(
+        "test scenario", 2)
+
+
+def test_passing_probability_is_not_rolled_again(pod_scenario):
+    a = make_dummy_object()
+    pod_scenario.schema = {
+        "matches": [{"namespace": "a"}],
+        "filters": [{"probability": {"probabilityPassAll": 0.5}}],
+    }
+    pod_scenario.k8s_inventory.find_pods = MagicMock(return_value=[a])
+    pod_scenario.act = MagicMock(return_value=True)
+    with patch("random.random", side_effect=[0.1, 0.9]):
+        assert pod_scenario.execute() is True
+    pod_scenario.act.assert_called_once_with([a])
+
+
+def test_stop_host_stops_all_the_hosts_at_once(pod_scenario):
+    hosts = dict(ip1=make_dummy_object(), ip2=make_dummy_object())
+    for ip, host in hosts.items():
+        host.ip = host.extIp = ip
+    pods = [make_dummy_object() for _ in range(3)]
+    for pod, ip in zip(pods, ["ip1", "ip2", "ip2"]):
+        pod.host_ip = ip
+    pod_scenario.inventory.get_node_by_ip = hosts.get
+    driver = pod_scenario.inventory.driver
+    error = Exception("something bad")
+    driver.stop_many.side_effect = lambda nodes: [
+        error if node is hosts["ip2"] else None for node in nodes
+    ]
+    pod_scenario.metric_collector = MagicMock()
+    assert pod_scenario.action_stop_host(pods, {}) is False
+    driver.stop_many.assert_called_once()
+    assert sorted(driver.stop_many.call_args[0][0], key=lambda node: node.ip) == [
+        hosts["ip1"], hosts["ip2"],
+    ]
+    pod_scenario.metric_collector.add_node_stopped_metric.assert_called_once_with(hosts["ip1"])
+    pod_scenario.metric_collector.add_node_stop_failed_metric.assert_called_once_with(hosts["ip2"])
+    # a single cleanup restarts the hosts stopped
+    cleanup = pod_scenario.get_cleanup_actions()
+    assert len(cleanup) == 1
+    driver.start_many.return_value = [None]
+    assert cleanup[0].execute() is True
+    driver.start_many.assert_called_once_with([hosts["ip1"]])
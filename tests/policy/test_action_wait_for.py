@@ -0,0 +1,124 @@
+# Copyright 2017 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from mock import MagicMock, patch
+from kubernetes.client import (
+    V1Pod, V1PodList, V1PodStatus, V1ObjectMeta, V1ListMeta, V1ContainerStatus,
+    V1Deployment, V1DeploymentSpec, V1DeploymentStatus, V1LabelSelector, V1PodTemplateSpec,
+)
+from kubernetes.client.rest import ApiException
+
+from powerfulseal.policy import PolicyRunner
+from powerfulseal.policy.action_wait_for import ActionWaitFor, is_deployment_available
+
+
+def make_pod(name, phase="Running", ready=True, terminating=False, resource_version="1"):
+    return V1Pod(
+        metadata=V1ObjectMeta(name=name, namespace="default", resource_version=resource_version,
+            deletion_timestamp="2020-01-01T00:00:00Z" if terminating else None),
+        status=V1PodStatus(phase=phase, container_statuses=[
+            V1ContainerStatus(name="c", ready=ready, restart_count=0, image="i", image_id="i"),
+        ]),
+    )
+
+
+def make_action(schema, pods):
+    k8s_inventory = MagicMock()
+    k8s_inventory.k8s_client.client_corev1api.list_namespaced_pod.return_value = V1PodList(
+        metadata=V1ListMeta(resource_version="1"), items=pods)
+    return ActionWaitFor("test", schema, k8s_inventory, metric_collector=MagicMock())
+
+
+def test_returns_straight_away_when_the_condition_holds():
+    action = make_action({"podsRunning": {"namespace": "default", "selector": "app=x"}},
+        [make_pod("a"), make_pod("b")])
+    with patch("kubernetes.watch.Watch") as watch:
+        assert action.execute() is True
+    watch.assert_not_called()
+    list_pods = action.k8s_inventory.k8s_client.client_corev1api.list_namespaced_pod
+    list_pods.assert_called_once_with("default", label_selector="app=x")
+    args = action.metric_collector.add_wait_for_metric.call_args[0]
+    assert (args[0], args[1], args[3]) == ("test", "podsRunning", True)
+
+
+def test_returns_as_soon_as_the_watch_shows_the_condition():
+    action = make_action({"podCount": {"namespace": "default", "count": 2, "state": "Running"}},
+        [make_pod("a"), make_pod("b", terminating=True)])
+    events = [
+        dict(type="ADDED", object=make_pod("c", phase="Pending", resource_version="2")),
+        dict(type="MODIFIED", object=make_pod("c", resource_version="3")),
+        dict(type="MODIFIED", object=make_pod("d", resource_version="4")),
+    ]
+    with patch("kubernetes.watch.Watch") as watch:
+        watch.return_value.stream.return_value = iter(events)
+        assert action.execute() is True
+    # stops watching once the condition holds, without reading the last event
+    assert len(list(watch.return_value.stream.return_value)) == 1
+    assert watch.return_value.stream.call_args[1]["resource_version"] == "1"
+
+
+def test_lists_again_when_the_watch_expires():
+    action = make_action({"podsRunning": {"namespace": "default"}},
+        [make_pod("a", ready=False)])
+    list_pods = action.k8s_inventory.k8s_client.client_corev1api.list_namespaced_pod
+    with patch("kubernetes.watch.Watch") as watch:
+        def stream(*args, **kwargs):
+            list_pods.return_value = V1PodList(
+                metadata=V1ListMeta(resource_version="5"), items=[make_pod("a")])
+            raise ApiException(status=410)
+        watch.return_value.stream.side_effect = stream
+        assert action.execute() is True
+    assert list_pods.call_count == 2
+
+
+def test_fails_after_the_timeout():
+    action = make_action({"timeout": 0, "podsRunning": {"namespace": "default"}}, [])
+    with patch("kubernetes.watch.Watch") as watch:
+        assert action.execute() is False
+    watch.assert_not_called()
+    args = action.metric_collector.add_wait_for_metric.call_args[0]
+    assert (args[1], args[3]) == ("podsRunning", False)
+
+
+def make_deployment(replicas=3, updated=3, available=3, total=3, generation=2, observed=2):
+    return V1Deployment(
+        metadata=V1ObjectMeta(name="d", namespace="default", generation=generation),
+        spec=V1DeploymentSpec(replicas=replicas, selector=V1LabelSelector(),
+            template=V1PodTemplateSpec()),
+        status=V1DeploymentStatus(replicas=total, updated_replicas=updated,
+            available_replicas=available, observed_generation=observed),
+    )
+
+
+@pytest.mark.parametrize("deployment,expected", [
+    (make_deployment(), True),
+    (make_deployment(available=2), False),
+    (make_deployment(updated=2), False),
+    (make_deployment(total=4), False),
+    (make_deployment(observed=1), False),
+])
+def test_is_deployment_available(deployment, expected):
+    assert is_deployment_available(deployment) is expected
+
+
+@pytest.mark.parametrize("wait_for,valid", [
+    ({"deploymentAvailable": {"name": "d", "namespace": "default"}}, True),
+    ({"timeout": 60, "podCount": {"namespace": "default", "count": 3}}, True),
+    ({"podsRunning": {"namespace": "default"}, "podCount": {"namespace": "default", "count": 3}}, False),
+    ({"timeout": 60}, False),
+])
+def test_wait_for_schema(wait_for, valid):
+    policy = {"scenarios": [{"name": "wait for", "steps": [{"waitFor": wait_for}]}]}
+    assert PolicyRunner.is_policy_valid(policy) is valid
@@ -0,0 +1,69 @@
+# Copyright 2017 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from mock import patch
+
+from powerfulseal.k8s import Pod
+from powerfulseal.policy.filter_pipeline import compile_filters, compile_property, split_filters, _pipelines
+
+
+@pytest.mark.parametrize("criterion,expected", [
+    ({"name": "name", "value": "POD"}, True),
+    ({"name": "name", "value": "pod", "negative": True}, False),
+    ({"name": "container_ids", "value": "b"}, True),
+    ({"name": "container_ids", "value": "c", "negative": True}, True),
+    ({"name": "labels.app", "value": "^web$"}, True),
+    ({"name": "labels.tier", "value": ".*"}, False),
+    ({"name": "labels.tier", "value": ".*", "negative": True}, True),
+])
+def test_compiled_property_matches(criterion, expected):
+    pod = Pod(name="pod-1", namespace="default", container_ids=["a", "b"],
+        labels={"app": "web"})
+    assert compile_property(criterion)(pod) == expected
+
+
+def test_regexes_are_compiled_once_per_content():
+    with patch("re.compile", wraps=__import__("re").compile) as compile_mock:
+        first = compile_property({"name": "name", "value": "compiled-once"})
+        second = compile_property({"value": "compiled-once", "name": "name"})
+        assert first is second
+        assert compile_mock.call_count == 1
+
+
+def test_pipeline_is_reused_for_the_same_filters():
+    filters = [{"property": {"name": "name", "value": "x"}}, {"randomSample": {"size": 1}}]
+    pipeline = compile_filters(filters)
+    assert compile_filters(filters) is pipeline
+    assert compile_filters([dict(f) for f in filters]) is pipeline
+    assert [keys for _, keys in pipeline.stages] == [{"property"}, {"randomSample"}]
+
+
+def test_split_filters_are_the_same_lists_every_time():
+    filters = [
+        {"probability": {"probabilityPassAll": 0.5}},
+        {"property": {"name": "name", "value": "split"}},
+        {"dayTime": {"onlyDays": ["monday"]}},
+    ]
+    split = split_filters(filters)
+    assert [list(f) for f in split.independent] == [["probability"], ["dayTime"]]
+    assert [list(f) for f in split.dependent] == [["property"]]
+    assert split_filters(filters).independent is split.independent
+    assert split_filters(filters).dependent is split.dependent
+    # the pipelines of the halves are found by identity, and not pinned again
+    compile_filters(split.dependent)
+    pinned = len(_pipelines.by_id)
+    for _ in range(10):
+        compile_filters(split_filters(filters).dependent)
+    assert len(_pipelines.by_id) == pinned
@@ -204,3 +204,38 @@ def test_process_time_label():
         label_runner.process_time_label("24-00-00")
 
     assert (1, 22, 21) == label_runner.process_time_label("01-22-21")
+
+
+def test_run_stops_when_stopped():
+    waiter = MagicMock(stopped=False)
+    def stop(seconds):
+        waiter.stopped = True
+        return False
+    waiter.wait_for_trigger.side_effect = stop
+    k8s_inventory = MagicMock()
+    k8s_inventory.find_pods.return_value = []
+    inventory = MagicMock()
+    label_runner = LabelRunner(inventory, k8s_inventory, None, None,
+        min_seconds_between_runs=77, max_seconds_between_runs=77, waiter=waiter)
+    label_runner.run()
+    assert k8s_inventory.find_pods.call_count == 1
+    waiter.wait_for_trigger.assert_called_once_with(77)
+    assert inventory.sync.call_count == 0
+
+
+def test_triggered_run_starts_straight_away():
+    waiter = MagicMock(stopped=False)
+    waiter.wait_for_trigger.return_value = False
+    k8s_inventory = MagicMock()
+    def find_pods(namespace):
+        if k8s_inventory.find_pods.call_count == 2:
+            waiter.stopped = True
+        return []
+    k8s_inventory.find_pods.side_effect = find_pods
+    inventory = MagicMock()
+    label_runner = LabelRunner(inventory, k8s_inventory, None, None, waiter=waiter)
+    label_runner.run()
+    # the first wait was cut short by the trigger, the second by the stop
+    assert k8s_inventory.find_pods.call_count == 2
+    assert waiter.consume_trigger.call_count == 1
+    assert inventory.sync.call_count == 1
@@ -14,12 +14,15 @@
 # limitations under the License.
 
 
+import time
+
 import pytest
 import pkg_resources
 from mock import MagicMock
 import mock
 
 from powerfulseal.policy import PolicyRunner
+from tests.policy.util import make_executable as make_scenario
 
 
 def test_default_policy_validates():
@@ -31,8 +34,24 @@ def test_example_config_validates():
     policy = PolicyRunner.load_file(filename)
     assert PolicyRunner.is_policy_valid(policy)
 
+
+def test_invalid_policy_does_not_validate():
+    assert not PolicyRunner.is_policy_valid({"scenarios": [{"steps": []}]})
+    assert not PolicyRunner.is_policy_valid({"scenarios": []}, schema={"required": ["config"]})
+
+
+def test_schema_is_not_parsed_again():
+    with mock.patch("pkgutil.get_data") as get_data:
+        assert PolicyRunner.is_policy_valid(PolicyRunner.DEFAULT_POLICY)
+        assert PolicyRunner.get_schema() is PolicyRunner.get_schema()
+    get_data.assert_not_called()
+
 crd_scenario_name = "test"
 
+def list_scenarios_mock():
+    return [{"metadata": {"uid": "uid-1", "resourceVersion": "1"}, "spec": spec}
+        for spec in get_scenarios_mock()]
+
 def get_scenarios_mock():
     return [{
         "name": crd_scenario_name,
@@ -46,12 +65,12 @@ def get_scenarios_mock():
 
 def test_parses_config_correctly(monkeypatch):
     with mock.patch('powerfulseal.k8s.k8s_client') as k8s_client:
-        k8s_client.get_scenarios = get_scenarios_mock
+        k8s_client.list_scenarios = list_scenarios_mock
         sleep_mock = MagicMock()
-        monkeypatch.setattr("time.sleep", sleep_mock)
         filename = pkg_resources.resource_filename(
             "tests.policy", "example_config2.yml")
         runner = PolicyRunner(filename, k8s_client)
+        runner.waiter.wait_for_trigger = sleep_mock
         policy = runner.read_policy()
         inventory = MagicMock()
         k8s_inventory = MagicMock()
@@ -64,3 +83,243 @@ def test_parses_config_correctly(monkeypatch):
         for call in sleep_mock.call_args_list:
             args, _ = call
             assert 77 <= args[0] <= 78
+
+
+def test_runs_scenarios_concurrently():
+    import threading
+    started = threading.Event()
+    # the first scenario only finishes once the second one started
+    first = make_scenario(True, release=started)
+    second = make_scenario(True, started=started)
+    runner = PolicyRunner({}, MagicMock())
+    assert runner.run_scenarios([first, second], "report", max_concurrent=2) is True
+
+
+def test_concurrent_fail_fast_skips_pending_scenarios():
+    failing = make_scenario(False)
+    pending = make_scenario(True)
+    runner = PolicyRunner({}, MagicMock())
+    assert runner.run_scenarios([failing, pending], "fail-fast", max_concurrent=1) is False
+    pending.execute.assert_not_called()
+    failing, others = make_scenario(False), [make_scenario(True) for _ in range(3)]
+    assert runner.run_scenarios([failing] + others, "fail-fast", max_concurrent=2) is False
+
+
+def test_concurrent_report_runs_everything():
+    scenarios = [make_scenario(i % 2 == 0) for i in range(6)]
+    runner = PolicyRunner({}, MagicMock())
+    assert runner.run_scenarios(scenarios, "report", max_concurrent=3) is True
+    for scenario in scenarios:
+        scenario.execute.assert_called_once_with()
+
+
+def test_scheduled_scenarios_run_on_their_own_schedule():
+    policy = {
+        "config": {"runStrategy": {"strategy": "scheduled", "runs": 3,
+            "maxConcurrentScenarios": 2}},
+        "scenarios": [
+            {"name": "fast", "schedule": {"intervalSeconds": 0}, "steps": []},
+            {"name": "slow", "schedule": {"intervalSeconds": 600}, "steps": []},
+        ],
+    }
+    k8s_client = MagicMock()
+    k8s_client.list_scenarios.return_value = []
+    metric_collector = MagicMock()
+    runner = PolicyRunner(policy, k8s_client)
+    def make(item, *args):
+        return make_scenario(True)
+    runner.make_scenario = MagicMock(side_effect=make)
+    # the slow scenario is due in 10 minutes, so fast-forward the clock
+    now = [1000.0]
+    def wait_for(timeout):
+        # let the running scenarios finish, then fast-forward
+        time.sleep(0.01)
+        now[0] += timeout
+    runner.wait_for = wait_for
+    with mock.patch("time.time", side_effect=lambda: now[0]):
+        assert runner.run(None, None, None, None, metric_collector) is True
+    names = [c[0][0]["name"] for c in runner.make_scenario.call_args_list]
+    assert names.count("fast") == 3
+    assert names.count("slow") == 3
+    metric_collector.add_scheduling_drift_metric.assert_any_call("slow", 0)
+
+
+def test_scheduling_drift_is_measured_when_the_scenario_starts():
+    runner = PolicyRunner({}, MagicMock())
+    runner.metric_collector = MagicMock()
+    scenario = make_scenario(True)
+    # planned at 1000, but waited for a slot in the pool until 1005
+    with mock.patch("time.time", return_value=1005.0):
+        assert runner.execute_scheduled(("queued", 0), 1000.0, scenario) is True
+    runner.metric_collector.add_scheduling_drift_metric.assert_called_once_with("queued", 5.0)
+    scenario.execute.assert_called_once_with()
+
+
+def test_scheduled_scenario_raising_counts_as_failed():
+    policy = {
+        "config": {"runStrategy": {"strategy": "scheduled", "runs": 2}},
+        "scenarios": [{"name": "raising", "schedule": {"intervalSeconds": 0}, "steps": []}],
+    }
+    k8s_client = MagicMock()
+    k8s_client.list_scenarios.return_value = []
+    metric_collector = MagicMock()
+    runner = PolicyRunner(policy, k8s_client)
+    def make(*args):
+        scenario = MagicMock()
+        scenario.execute.side_effect = Exception("something bad")
+        return scenario
+    runner.make_scenario = MagicMock(side_effect=make)
+    runner.wait_for = lambda timeout: time.sleep(0.01)
+    assert runner.run(None, None, None, None, metric_collector) is True
+    assert runner.make_scenario.call_count == 2
+    metric_collector.add_scenario_counter_metric.assert_called_with("raising", False)
+
+
+def test_scheduled_skips_cron_that_never_fires():
+    policy = {
+        "config": {"runStrategy": {"strategy": "scheduled", "runs": 2}},
+        "scenarios": [
+            {"name": "never", "schedule": {"cron": "0 0 31 2 *"}, "steps": []},
+            {"name": "fast", "schedule": {"intervalSeconds": 0}, "steps": []},
+        ],
+    }
+    k8s_client = MagicMock()
+    k8s_client.list_scenarios.return_value = []
+    runner = PolicyRunner(policy, k8s_client)
+    runner.make_scenario = MagicMock(side_effect=lambda *args: make_scenario(True))
+    runner.wait_for = lambda timeout: time.sleep(0.01)
+    assert runner.run(None, None, None, None) is True
+    names = [c[0][0]["name"] for c in runner.make_scenario.call_args_list]
+    assert names == ["fast", "fast"]
+
+
+def test_get_next_run_stops_when_cron_never_fires():
+    schedule = MagicMock()
+    schedule.next_run.side_effect = ValueError("never matches")
+    assert PolicyRunner.get_next_run(("never", 0), schedule, 1000) is None
+
+
+def test_scheduled_fail_fast_stops():
+    policy = {
+        "config": {"runStrategy": {"strategy": "scheduled"},
+            "exitStrategy": {"strategy": "fail-fast"}},
+        "scenarios": [{"name": "failing", "schedule": {"intervalSeconds": 0}, "steps": []}],
+    }
+    k8s_client = MagicMock()
+    k8s_client.list_scenarios.return_value = []
+    runner = PolicyRunner(policy, k8s_client)
+    runner.make_scenario = MagicMock(return_value=make_scenario(False))
+    assert runner.run(None, None, None, None) is False
+    assert runner.make_scenario.call_count == 1
+
+
+def test_read_policy_uses_cache_until_something_changes(tmpdir):
+    policy_file = tmpdir.join("policy.yml")
+    policy_file.write("scenarios: []\n")
+    k8s_client = MagicMock()
+    crs = list_scenarios_mock()
+    k8s_client.list_scenarios = MagicMock(side_effect=lambda: crs)
+    metric_collector = MagicMock()
+    runner = PolicyRunner(str(policy_file), k8s_client, metric_collector=metric_collector)
+    with mock.patch.object(PolicyRunner, "is_policy_valid", wraps=PolicyRunner.is_policy_valid) as validate, \
+            mock.patch.object(PolicyRunner, "is_scenario_valid", wraps=PolicyRunner.is_scenario_valid) as validate_scenario:
+        first = runner.read_policy()
+        assert runner.read_policy() is first
+        assert (validate.call_count, validate_scenario.call_count) == (1, 1)
+        assert [s["name"] for s in first["scenarios"]] == [crd_scenario_name]
+
+        # a scenario custom resource changed: only it is validated again
+        crs[0]["metadata"]["resourceVersion"] = "2"
+        assert runner.read_policy() is not first
+        assert (validate.call_count, validate_scenario.call_count) == (1, 2)
+
+        # the file changed
+        policy_file.write("scenarios: []\nconfig: {}\n")
+        assert "config" in runner.read_policy()
+        assert (validate.call_count, validate_scenario.call_count) == (2, 2)
+    assert (runner.cache_hits, runner.cache_misses) == (1, 3)
+    metric_collector.add_policy_cache_metric.assert_any_call(True)
+
+
+def test_read_policy_skips_invalid_scenarios():
+    k8s_client = MagicMock()
+    crs = list_scenarios_mock() + [
+        {"metadata": {"uid": "uid-2", "resourceVersion": "1"}, "spec": {"name": "x"}},
+    ]
+    k8s_client.list_scenarios = MagicMock(side_effect=lambda: list(crs))
+    metric_collector = MagicMock()
+    runner = PolicyRunner(None, k8s_client, metric_collector=metric_collector)
+    with mock.patch.object(PolicyRunner, "is_scenario_valid", wraps=PolicyRunner.is_scenario_valid) as validate:
+        policy = runner.read_policy()
+        assert [s["name"] for s in policy["scenarios"]] == [crd_scenario_name]
+        metric_collector.add_invalid_scenarios_metric.assert_called_with(1)
+
+        # a new scenario only validates that one
+        crs.append({"metadata": {"uid": "uid-3", "resourceVersion": "1"},
+            "spec": dict(get_scenarios_mock()[0], name="another")})
+        policy = runner.read_policy()
+        assert [s["name"] for s in policy["scenarios"]] == [crd_scenario_name, "another"]
+        assert validate.call_count == 3
+
+        # the invalid one is fixed
+        crs[1] = {"metadata": {"uid": "uid-2", "resourceVersion": "2"},
+            "spec": dict(get_scenarios_mock()[0], name="fixed")}
+        assert len(runner.read_policy()["scenarios"]) == 3
+        assert validate.call_count == 4
+    metric_collector.add_invalid_scenarios_metric.assert_called_with(0)
+
+
+def test_read_policy_does_not_grow_dict_config():
+    k8s_client = MagicMock()
+    k8s_client.list_scenarios = list_scenarios_mock
+    config = {"scenarios": []}
+    runner = PolicyRunner(config, k8s_client)
+    assert len(runner.read_policy()["scenarios"]) == 1
+    assert config == {"scenarios": []}
+
+
+def test_read_policy_uses_the_scenario_informer():
+    k8s_client = MagicMock()
+    informer = MagicMock()
+    informer.has_synced.return_value = True
+    informer.list_scenarios.return_value = list_scenarios_mock()
+    runner = PolicyRunner(None, k8s_client, scenario_informer=informer)
+    runner.read_policy()
+    runner.read_policy()
+    k8s_client.list_scenarios.assert_not_called()
+    assert runner.cache_hits == 1
+
+
+def test_policy_watch_wakes_the_runner_up_on_changes():
+    informer = MagicMock()
+    informer.has_synced.return_value = True
+    crs = list_scenarios_mock()
+    informer.list_scenarios.side_effect = lambda: crs
+    waiter = MagicMock()
+    runner = PolicyRunner(None, MagicMock(), scenario_informer=informer, waiter=waiter)
+    runner.read_policy()
+    def sleep(seconds):
+        # the scenario changes after the first check
+        if waiter.sleep.call_count == 2:
+            crs[0]["metadata"]["resourceVersion"] = "2"
+        return waiter.sleep.call_count <= 3
+    waiter.sleep.side_effect = sleep
+    runner.watch_policy(interval=5)
+    waiter.sleep.assert_called_with(5)
+    # only woken up once for the change
+    assert waiter.wake.call_count == 1
+
+
+def test_make_scenario_uses_the_cleanup_config():
+    policy = {
+        "config": {"cleanup": {"timeoutSeconds": 60, "maxConcurrentActions": 2}},
+        "scenarios": [],
+    }
+    k8s_client = MagicMock()
+    k8s_client.list_scenarios.return_value = []
+    runner = PolicyRunner(policy, k8s_client)
+    runner.read_policy()
+    scenario = runner.make_scenario({"name": "test"}, None, None, None, None)
+    assert scenario.cleanup_timeout == 60
+    assert scenario.cleanup_action_timeout == 300
+    assert scenario.cleanup_max_concurrent == 2
@@ -0,0 +1,54 @@
+# Copyright 2017 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from powerfulseal.policy.query_planner import plan_pod_filters
+
+
+def prop(name, value, negative=False):
+    return {"property": {"name": name, "value": value, "negative": negative}}
+
+
+@pytest.mark.parametrize("criterion,labels,fields,kept", [
+    (prop("name", "^My-Pod$"), None, "metadata.name=my-pod", False),
+    (prop("name", "my\\.pod$", negative=True), None, "metadata.name!=my.pod", False),
+    (prop("name", "my-pod"), None, None, True),
+    (prop("name", "my-.*$"), None, None, True),
+    (prop("node_name", "^node-1$"), None, "spec.nodeName=node-1", False),
+    (prop("state", "running"), None, "status.phase=Running", True),
+    (prop("state", "Running", negative=True), None, None, True),
+    (prop("state", "Run"), None, None, True),
+    (prop("labels.version", "^2$"), "version=2", None, False),
+    (prop("labels.version", "^2$", negative=True), "version!=2", None, False),
+    (prop("labels.app", "^web$"), "app", None, True),
+    (prop("labels.app", "^web$", negative=True), None, None, True),
+    ({"probability": {"probabilityPassAll": 0.5}}, None, None, True),
+])
+def test_plan_single_filter(criterion, labels, fields, kept):
+    plan = plan_pod_filters([criterion])
+    assert plan.label_selector == labels
+    assert plan.field_selector == fields
+    assert plan.filters == ([criterion] if kept else [])
+
+
+def test_plan_stops_pushing_after_random_sample():
+    filters = [
+        prop("name", "^a$"),
+        {"randomSample": {"size": 1}},
+        prop("node_name", "^node-1$"),
+    ]
+    plan = plan_pod_filters(filters)
+    assert plan.field_selector == "metadata.name=a"
+    assert plan.filters == filters[1:]
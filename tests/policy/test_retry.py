@@ -0,0 +1,92 @@
+# Copyright 2017 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import itertools
+
+from mock import MagicMock
+
+from powerfulseal.policy.retry import RetryPolicy, iter_delays, call_with_retries
+
+
+def delays(policy, count):
+    return list(itertools.islice(iter_delays(policy), count))
+
+
+def test_constant_and_exponential_delays():
+    assert delays(RetryPolicy("retriesCount", 5, 2, "constant", 300), 3) == [2, 2, 2]
+    assert delays(RetryPolicy("retriesCount", 5, 2, "exponential", 10), 5) == [2, 4, 8, 10, 10]
+
+
+def test_decorrelated_delays_stay_within_bounds():
+    previous = 1
+    for delay in delays(RetryPolicy("retriesCount", 5, 1, "decorrelated", 20), 100):
+        assert 1 <= delay <= min(20, previous * 3)
+        previous = delay
+
+
+class FakeClock():
+
+    def __init__(self, action_time):
+        self.now = 0
+        self.action_time = action_time
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+    def action(self):
+        self.now += self.action_time
+        return False
+
+
+def test_timeout_includes_the_time_spent_in_the_action():
+    clock = FakeClock(action_time=25)
+    policy = RetryPolicy("retriesTimeout", 60, 10, "constant", 300)
+    ret, attempts = call_with_retries(clock.action, policy, MagicMock(),
+        sleep=clock.sleep, clock=clock)
+    # attempts at 0 and 35, the next one would start after the deadline
+    assert (ret, attempts) == (False, 2)
+    assert clock.now == 60
+
+
+def test_count_does_not_sleep_after_the_last_attempt():
+    fn = MagicMock(side_effect=[False, False, "ok"])
+    sleep = MagicMock()
+    policy = RetryPolicy("retriesCount", 3, 5, "exponential", 300)
+    assert call_with_retries(fn, policy, MagicMock(), sleep=sleep) == ("ok", 3)
+    assert [c[0][0] for c in sleep.call_args_list] == [5, 10]
+
+    fn = MagicMock(return_value=False)
+    sleep = MagicMock()
+    assert call_with_retries(fn, policy, MagicMock(), sleep=sleep) == (False, 3)
+    assert sleep.call_count == 2
+
+
+def test_no_attempt_without_retries_allowed():
+    fn = MagicMock()
+    policy = RetryPolicy("retriesCount", 0, 5, "constant", 300)
+    assert call_with_retries(fn, policy, MagicMock()) == (False, 0)
+    fn.assert_not_called()
+
+
+def test_interrupted_sleep_stops_retrying():
+    fn = MagicMock(return_value=False)
+    sleep = MagicMock(return_value=False)
+    ret, attempts = call_with_retries(
+        fn, RetryPolicy("retriesCount", 5, 10, "constant", 300), MagicMock(), sleep=sleep)
+    assert ret is False
+    assert attempts == 1
+    assert sleep.call_count == 1
@@ -0,0 +1,199 @@
+# Copyright 2017 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import copy
+import threading
+import time
+
+import mock
+import pytest
+from mock import MagicMock
+
+from powerfulseal.policy.scenario import Scenario
+from powerfulseal.policy.scenario_plan import compile_scenario
+from powerfulseal.policy.retry import RetryPolicy
+from tests.policy.util import make_executable
+
+
+@pytest.fixture
+def scenario():
+    scenario = Scenario(
+        name="test scenario",
+        schema={},
+        inventory=MagicMock(),
+        k8s_inventory=MagicMock(),
+        driver=MagicMock(),
+        executor=MagicMock(),
+        metric_collector=MagicMock(),
+    )
+    return scenario
+
+
+def make_action(ret, cleanup, started=None, release=None):
+    action = make_executable(ret, started=started, release=release)
+    action.get_cleanup_actions = MagicMock(return_value=cleanup)
+    return action
+
+
+def test_parallel_steps_run_concurrently_and_merge_cleanup(scenario):
+    started = threading.Event()
+    # the first step only finishes once the second one started
+    first = make_action(True, ["cleanup 1"], release=started)
+    second = make_action(True, ["cleanup 2"], started=started)
+    scenario.action_mapping["first"] = lambda schema: scenario.execute_action(first)
+    scenario.action_mapping["second"] = lambda schema: scenario.execute_action(second)
+    scenario.cleanup = MagicMock()
+    scenario.schema = {
+        "steps": [{"parallel": {"steps": [{"first": {}}, {"second": {}}]}}],
+    }
+    assert scenario.execute() is True
+    assert scenario.cleanup_list == [["cleanup 1"], ["cleanup 2"]]
+
+
+def test_parallel_step_fails_if_a_branch_fails(scenario):
+    ok = make_action(True, ["cleanup ok"])
+    failing = make_action(False, ["cleanup failing"])
+    scenario.action_mapping["ok"] = lambda schema: scenario.execute_action(ok)
+    scenario.action_mapping["failing"] = lambda schema: scenario.execute_action(failing)
+    scenario.action_mapping["boom"] = MagicMock(side_effect=Exception("boom"))
+    ret = scenario.action_parallel({"steps": [{"failing": {}}, {"boom": {}}, {"ok": {}}]})
+    assert ret is False
+    ok.execute.assert_called_once_with()
+    assert scenario.cleanup_list == [["cleanup failing"], ["cleanup ok"]]
+
+
+def test_plan_is_reused_until_the_content_changes():
+    schema = {"name": "a", "steps": [{"wait": {"seconds": 1}}]}
+    plan = compile_scenario(schema)
+    assert compile_scenario(schema) is plan
+    assert compile_scenario(copy.deepcopy(schema)) is plan
+    changed = copy.deepcopy(schema)
+    changed["steps"][0]["wait"]["seconds"] = 2
+    assert compile_scenario(changed) is not plan
+
+
+def test_retries_are_parsed_once():
+    plan = compile_scenario({"name": "a", "steps": [
+        {"podAction": {"retries": {"retriesCount": {"count": 3, "sleep": 0}}}},
+        {"podAction": {"retries": {"retriesTimeout": {"timeout": 10, "backoff": "exponential"}}}},
+        {"wait": {}},
+    ]})
+    assert [step.actions[0].retries for step in plan.steps] == [
+        RetryPolicy("retriesCount", 3, 0, "constant", 300),
+        RetryPolicy("retriesTimeout", 10, 30, "exponential", 300),
+        None,
+    ]
+
+
+def test_step_is_retried_count_times(scenario):
+    failing = make_action(False, [])
+    scenario.action_mapping["failing"] = lambda schema: scenario.execute_action(failing)
+    scenario.cleanup = MagicMock()
+    scenario.schema = {"steps": [
+        {"failing": {"retries": {"retriesCount": {"count": 3, "sleep": 0}}}},
+    ]}
+    assert scenario.execute() is False
+    assert failing.execute.call_count == 3
+    scenario.metric_collector.add_step_attempts_metric.assert_called_once_with(
+        "test scenario", "failing", 3)
+
+
+def make_cleanup(calls, name, ret=True, started=None, release=None):
+    def execute():
+        calls.append(name)
+        if started is not None:
+            started.set()
+        if release is not None:
+            release.wait(5)
+        return ret
+    return MagicMock(execute=MagicMock(side_effect=execute))
+
+
+def test_cleanup_chains_run_concurrently_and_in_order(scenario):
+    calls = []
+    started = threading.Event()
+    # the first chain only finishes once the second one started
+    scenario.cleanup_list = [
+        [make_cleanup(calls, "restore service", ret=False, release=started),
+         make_cleanup(calls, "delete clone")],
+        [make_cleanup(calls, "start node", started=started)],
+    ]
+    scenario.cleanup()
+    assert scenario.cleanup_list == []
+    # a failure doesn't stop its chain
+    assert calls.index("restore service") < calls.index("delete clone")
+    assert "start node" in calls
+    results = [c[0][3] for c in scenario.metric_collector.add_cleanup_metric.call_args_list]
+    assert sorted(results) == ["failure", "success", "success"]
+
+
+def test_cleanup_action_timeout_stops_its_chain_only(scenario):
+    calls = []
+    hanging = threading.Event()
+    scenario.cleanup_action_timeout = 0.05
+    scenario.cleanup_list = [
+        [make_cleanup(calls, "hanging", release=hanging), make_cleanup(calls, "after hanging")],
+        [make_cleanup(calls, "other")],
+    ]
+    scenario.cleanup()
+    hanging.set()
+    assert sorted(calls) == ["hanging", "other"]
+    scenario.metric_collector.add_cleanup_metric.assert_any_call(
+        "test scenario", "MagicMock", mock.ANY, "timeout")
+
+
+def test_cleanup_stops_at_the_deadline(scenario):
+    calls = []
+    hanging = threading.Event()
+    scenario.cleanup_timeout = 0.1
+    scenario.cleanup_max_concurrent = 1
+    scenario.cleanup_list = [
+        [make_cleanup(calls, "hanging", release=hanging)],
+        [make_cleanup(calls, "never started")],
+    ]
+    start = time.monotonic()
+    scenario.cleanup()
+    assert time.monotonic() - start < 2
+    hanging.set()
+    assert calls == ["hanging"]
+
+
+def test_cleanup_action_raising_is_logged_as_a_failure(scenario):
+    scenario.logger = MagicMock()
+    action = MagicMock(execute=MagicMock(side_effect=Exception("something bad")))
+    scenario.cleanup_list = [[action]]
+    with mock.patch("threading.excepthook") as excepthook:
+        scenario.cleanup()
+    excepthook.assert_not_called()
+    scenario.logger.exception.assert_called_once_with(
+        "Cleanup %s raised an exception", "MagicMock")
+    scenario.metric_collector.add_cleanup_metric.assert_called_once_with(
+        "test scenario", "MagicMock", mock.ANY, "failure")
+
+
+def test_cleanup_action_finishing_after_its_timeout_is_logged(scenario):
+    scenario.logger = MagicMock()
+    hanging, finished = threading.Event(), threading.Event()
+    def execute():
+        hanging.wait(5)
+        return True
+    action = MagicMock(execute=MagicMock(side_effect=execute))
+    scenario.logger.warning.side_effect = lambda *args: finished.set()
+    scenario.cleanup_action_timeout = 0.05
+    scenario.cleanup_list = [[action]]
+    scenario.cleanup()
+    scenario.logger.warning.assert_not_called()
+    hanging.set()
+    assert finished.wait(5)
+    assert "given up on" in scenario.logger.warning.call_args[0][0]
@@ -0,0 +1,86 @@
+# Copyright 2017 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from datetime import datetime
+
+import pytest
+
+from powerfulseal.policy.scheduler import (
+    CronSchedule, ScenarioSchedule, Scheduler, parse_cron_field,
+)
+
+
+def timestamp(*args):
+    return datetime(*args).timestamp()
+
+
+def test_parse_cron_field():
+    assert parse_cron_field("*/15", 0, 59) == {0, 15, 30, 45}
+    assert parse_cron_field("1-5,7", 0, 7) == {1, 2, 3, 4, 5, 7}
+    assert parse_cron_field("10/20", 0, 59) == {10, 30, 50}
+    for field in ["60", "5-1", "*/0", "a"]:
+        with pytest.raises(ValueError):
+            parse_cron_field(field, 0, 59)
+
+
+@pytest.mark.parametrize("expression,now,expected", [
+    ("*/15 * * * *", (2020, 1, 1, 10, 7, 30), (2020, 1, 1, 10, 15)),
+    ("0 10 * * 1-5", (2020, 1, 3, 10, 0), (2020, 1, 6, 10, 0)),
+    ("30 2 1 * *", (2020, 1, 31, 23, 59), (2020, 2, 1, 2, 30)),
+    ("0 0 29 2 *", (2020, 3, 1), (2024, 2, 29)),
+    # either the day of month or the day of week
+    ("0 0 13 * 5", (2020, 3, 1), (2020, 3, 6)),
+])
+def test_cron_next_after(expression, now, expected):
+    cron = CronSchedule(expression)
+    assert cron.next_after(timestamp(*now)) == timestamp(*expected)
+
+
+def test_cron_that_never_matches():
+    with pytest.raises(ValueError):
+        CronSchedule("0 0 31 2 *").next_after(timestamp(2020, 1, 1))
+    with pytest.raises(ValueError):
+        CronSchedule("0 0 * *")
+
+
+def test_schedule_interval_and_jitter():
+    schedule = ScenarioSchedule({"intervalSeconds": 60, "jitterSeconds": 5})
+    assert 100 <= schedule.first_run(100) <= 105
+    assert 160 <= schedule.next_run(100) <= 165
+    default = ScenarioSchedule(None, wait_min=10, wait_max=20)
+    assert default.first_run(100) == 100
+    assert 110 <= default.next_run(100) <= 120
+
+
+def test_scheduler_pops_due_keys_in_order():
+    scheduler = Scheduler()
+    scheduler.schedule("b", 20)
+    scheduler.schedule("a", 10)
+    scheduler.schedule("c", 30)
+    assert scheduler.next_time() == 10
+    assert scheduler.pop_due(25) == [(10, "a"), (20, "b")]
+    assert scheduler.next_time() == 30
+    assert len(scheduler) == 1
+
+
+def test_scheduler_reschedules_and_removes():
+    scheduler = Scheduler()
+    scheduler.schedule("a", 10)
+    scheduler.schedule("a", 40)
+    scheduler.schedule("b", 20)
+    scheduler.remove("b")
+    assert scheduler.next_time() == 40
+    assert scheduler.pop_due(30) == []
+    assert scheduler.pop_due(40) == [(40, "a")]
+    assert scheduler.next_time() is None
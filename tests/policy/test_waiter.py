@@ -0,0 +1,50 @@
+# Copyright 2017 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+
+from powerfulseal.policy.waiter import Waiter
+
+
+def test_sleep_runs_to_completion():
+    assert Waiter().sleep(0.01) is True
+
+
+def test_stop_interrupts_sleep():
+    waiter = Waiter()
+    threading.Timer(0.05, waiter.stop).start()
+    start = time.monotonic()
+    assert waiter.sleep(10) is False
+    assert time.monotonic() - start < 5
+    # once stopped, it doesn't wait anymore
+    assert waiter.sleep(10) is False
+    assert waiter.wait_for_trigger(10) is False
+
+
+def test_wake_only_interrupts_waits_for_trigger():
+    waiter = Waiter()
+    waiter.wake()
+    assert waiter.sleep(0.01) is True
+    assert waiter.wait_for_trigger(10) is False
+    # the wake-up was consumed
+    assert waiter.wait_for_trigger(0.01) is True
+
+
+def test_trigger_is_consumed_once():
+    waiter = Waiter()
+    threading.Timer(0.05, waiter.trigger).start()
+    assert waiter.wait_for_trigger(10) is False
+    assert waiter.consume_trigger() is True
+    assert waiter.consume_trigger() is False
@@ -0,0 +1,30 @@
+# Copyright 2017 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from mock import MagicMock
+
+
+def make_executable(ret, started=None, release=None):
+    """ A mock with an execute() returning ret. If given, it sets the
+        `started` event, and waits for the `release` event first.
+    """
+    executable = MagicMock()
+    def execute():
+        if started is not None:
+            started.set()
+        if release is not None:
+            assert release.wait(5)
+        return ret
+    executable.execute = MagicMock(side_effect=execute)
+    return executable
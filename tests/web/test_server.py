@@ -0,0 +1,34 @@
+# Copyright 2018 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from flask import Flask
+from mock import MagicMock, patch
+
+from powerfulseal.web.server import app, enable_trigger
+
+
+def test_trigger_starts_the_next_run():
+    trigger = MagicMock()
+    flask_app = Flask(__name__)
+    with patch.dict("powerfulseal.web.server.config"):
+        enable_trigger(flask_app, trigger)
+        response = flask_app.test_client().post("/api/trigger")
+    assert response.status_code == 200
+    assert response.get_json() == {"triggered": True}
+    trigger.assert_called_once_with()
+
+
+def test_trigger_is_not_registered_by_default():
+    response = app.test_client().post("/api/trigger")
+    assert response.status_code == 405